@@ -4,14 +4,10 @@ nettype=("ODDEVEN")
 limit=256
 p=$((2 ** 13))
 for alg in "${nettype[@]}"; do
-    for ((i = 2; i <= limit; i++)); do
-        param="generate $alg $p stagewise 1 - ""\
-include_stages_range 0 $i - ""\
-replace_ff REGISTER_DSP --entity_ff=48 --limit=6840 - ""\
-write - "
-        echo "python netgen.py $param"
-        python netgen.py $param
-    done
+    param="generate $alg $p --stagewise - ""\
+sweep_stages 2 $limit --entity=REGISTER_DSP --entity_ff=48 --limit=6840"
+    echo "python netgen.py $param"
+    python netgen.py $param
 done
 
 for alg in "${nettype[@]}"; do
@@ -13,9 +13,8 @@ for alg in "${nettype[@]}"; do
     for ((i = 2; i <= log_p; i++)); do
         p=$((2 ** i))
         hw=$(((i * (i - 1)) / 2))
-        param="generate $alg $p stagewise 1 - ""\
-includ
-e_stages [$hw]  - ""\
+        param="generate $alg $p --stagewise - ""\
+include_stages [$hw]  - ""\
 replace_ff REGISTER_DSP --entity_ff=48 --limit=6840 - ""\
 write - "
         #python netgen.py $param
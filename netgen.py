@@ -1,41 +1,217 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
+import pandas as pd
 import math
+import os
 import fire
 import time
 
-from scripts import vhdl
+from scripts.batch import BatchRunner, load_spec
 import scripts.network_generators as generators
+from scripts.explorer import Budget, Explorer, pareto_front
+from scripts.model import SorterModel
+from scripts.network_cache import NetworkCache
+from scripts.parse_cache import (
+    LazyVHDLDict,
+    ParseCache,
+    index_entities,
+    index_templates,
+    parse_files,
+    timing_summary,
+)
 from scripts.reporter import Reporter, Report
 from scripts.template_processor import (
     VHDLTemplateProcessor,
     VHDLTemplateProcessorStagewise,
 )
-from scripts.resource_allocator import BlockAllocator, StageAllocator, is_ff
+from scripts.resource_allocator import (
+    BlockAllocator,
+    FFAssignment,
+    FFReplacement,
+    StageAllocator,
+    is_ff,
+)
+from scripts.verifier import Verifier
+from scripts.simulator import simulate, simulate_cycles
 from scripts.plotter import PlotWrapper
 
 
-def get_sources(path=Path()):
+def get_sources(
+    path=Path(), cache: ParseCache = ParseCache(enabled=False), processes: int = 1
+):
     sources = dict()
-    for source in path.glob("./**/*.vhd"):
-        entity = vhdl.parseVHDLEntity(source)
+    files = list(path.glob("./**/*.vhd"))
+    # Later files take precedence over earlier ones with the same entity.
+    for entity in parse_files(files, "entity", cache, processes)[0]:
         if entity:
             sources[entity.name] = entity
     return sources
 
 
-def get_templates(path=Path()):
+def get_templates(
+    path=Path(), cache: ParseCache = ParseCache(enabled=False), processes: int = 1
+):
     templates = dict()
-    for source in path.glob("./**/*.vhd"):
-        template = vhdl.parseVHDLTemplate(source)
+    files = list(path.glob("./**/*.vhd"))
+    for source, template in zip(
+        files, parse_files(files, "template", cache, processes)[0]
+    ):
         if template:
             template.name = source.name
             templates[template.name] = template
     return templates
 
 
+def get_output_set(output_config: str, num_outputs: int, N: int) -> set[int]:
+    """Output indices of the "max", "min" or "median" output configuration
+    with num_outputs elements for a network of N inputs."""
+    if output_config.lower() == "max":
+        return set(range(0, num_outputs))
+    elif output_config.lower() == "min":
+        return set(range(N - num_outputs, N))
+    elif output_config.lower() == "median":
+        lower_bound = N // 2 - num_outputs // 2
+        upper_bound = N // 2 + (num_outputs + 1) // 2
+        return set(range(lower_bound, upper_bound))
+    return set(range(0, N))
+
+
+def network_name(network, stagewise: bool, stage_set: set[int]) -> str:
+    """Name of the sorter generated from network, also used as name of its
+    build directory."""
+    name = network.algorithm
+    name += "_" + str(network.get_N())
+    name += "X" + str(len(network.output_set))
+    if stagewise:
+        name += "_STAGEWISE"
+
+    logp = int(math.ceil((math.log2(network.get_N()))))
+    if network.get_depth() < logp * (logp + 1) // 2:
+        if len(stage_set) == 1:
+            s = set(stage_set)
+            elem = s.pop()
+            name += "_STAGE" + str(elem)
+        else:
+            name += "_S" + str(len(stage_set))
+    if network.output_config:
+        name += "_" + network.output_config.upper()
+    return name
+
+
+def write_vhdl(
+    path: Path,
+    network,
+    name: str,
+    entities: dict,
+    templates: dict,
+    cs: str,
+    W: int,
+    ff_replacements: list,
+    stagewise: bool,
+    processes: int = 1,
+) -> list[str]:
+    """Write Network.vhd, Sorter.vhd and Test_Sorter.vhd of the sorter to
+    path. The CS of Network.vhd are generated on the given number of
+    processes. Returns the names of the files written."""
+    # Templates: Network.vhd, Sorter.vhd, Test_Sorter.vhd
+    template_names = ["Sorter.vhd", "Test_Sorter.vhd"]
+    path.mkdir(parents=True, exist_ok=True)
+    template_processor = None
+    if stagewise:
+        template_processor = VHDLTemplateProcessorStagewise()
+    else:
+        template_processor = VHDLTemplateProcessor()
+
+    network_entities = {
+        "CS": entities[cs],
+        "Signal_Distributor": entities["SIGNAL_DISTRIBUTOR"],
+        "Stage": entities["Stage"],
+    }
+    kwargs = {"W": W, "ff_replacements": ff_replacements, "processes": processes}
+    template_processor.process_network_template(
+        path / "Network.vhd",
+        network,
+        name,
+        templates["Network.vhd"],
+        network_entities,
+        **kwargs,
+    )
+    for temp in template_names:
+        template_processor.process_template(
+            path / temp,
+            network,
+            name,
+            templates[temp],
+            **kwargs,
+        )
+    return ["Network.vhd"] + template_names
+
+
+def slice_ff_replacements(ff_replacements: list, beg: int, end: int) -> list:
+    """Restrict FF replacements allocated on a network to its stages beg to
+    end. Groups without FF left in these stages are dropped."""
+    sliced = []
+    for repl in ff_replacements:
+        groups = []
+        for group in repl.groups:
+            group = [
+                FFAssignment((x, y - beg, z), a.ff_range)
+                for a in group
+                for x, y, z in [a.point]
+                if beg <= y < end
+            ]
+            if group:
+                groups.append(group)
+        sliced.append(FFReplacement(repl.entity, repl.ff_per_entity, groups))
+    return sliced
+
+
+# State shared with the worker processes of sweep_stages.
+_sweep = None
+
+
+def _init_sweep(state):
+    global _sweep
+    _sweep = state
+
+
+def _write_stage_slice(end: int) -> tuple[str, list]:
+    """Write the sorter of the first end stages. Returns its name and its FF
+    replacements."""
+    network, ff_replacements, allocation, entities, templates, cs, W, stagewise = (
+        _sweep
+    )
+    view = generators.NetworkView(network, range(0, end))
+    name = network_name(view, stagewise, range(end))
+    ff_replacements = slice_ff_replacements(ff_replacements, 0, end)
+    if allocation:
+        entity, limit, entity_ff = allocation
+        ralloc = StageAllocator() if stagewise else BlockAllocator()
+        ff_replacements.append(
+            ralloc.reallocate_ff(
+                view,
+                entity=entities[entity],
+                max_entities=limit,
+                ff_per_entity=entity_ff,
+            )
+        )
+    write_vhdl(
+        Path("build/{}/".format(name)),
+        view,
+        name,
+        entities,
+        templates,
+        cs,
+        W,
+        ff_replacements,
+        stagewise,
+    )
+    return name, ff_replacements
+
+
 def print_timestamp(title: str):
     time_str = "[%b %d %H:%M:%S]: "
     print(time.strftime(time_str) + title, end="")
@@ -44,22 +220,33 @@ def print_timestamp(title: str):
 class Interface:
     def __init__(self):
         self.__start_time = time.perf_counter_ns()
-        self.__entities = dict()
-        print_timestamp("Parsing sources...")
-        self.__entities = get_sources(Path("src/"))
+        # Sources and templates are only indexed here and parsed once they
+        # are used. Parsed files are cached, only changed ones are parsed
+        # again. The cache is saved once the interface is deleted.
+        self.__parse_cache = ParseCache()
+        print_timestamp("Indexing sources...")
+        self.__entities = LazyVHDLDict(
+            index_entities(Path("src/")), "entity", self.__parse_cache
+        )
         print(" done.")
-        self.__templates = dict()
-        print_timestamp("Parsing templates...")
-        self.__templates = get_templates(Path("templates/"))
+        print_timestamp("Indexing templates...")
+        self.__templates = LazyVHDLDict(
+            index_templates(Path("templates/")), "template", self.__parse_cache
+        )
         print(" done.")
         self.__generator = None
         self.__network = None
+        self.__network_type = generators.Network
         self.__ffreplacements = []
         self.__reporter = Reporter()
         self.__stagewise = False
         self.__stage_set: set[int] = []
+        self.__cache = NetworkCache(enabled=False)
+        self.__cache_params = dict()
+        self.__transforms = []
 
     def __del__(self):
+        self.__parse_cache.save()
         print_timestamp(
             "Finished after " + str(time.perf_counter_ns() - self.__start_time) + "ns."
         )
@@ -114,14 +301,46 @@ class Interface:
 
         else:
             print("components:")
-            for entity in get_sources(Path("src/")).values():
+            for entity in self.__entities.values():
                 print("\t" + entity.name)
             print("templates:")
-            for template in Path("templates/").glob("**/*.vhd"):
+            for template in self.__templates.values():
                 print("\t" + template.name)
         return self
 
-    def generate(self, algorithm: str, N: int, SW: int = 1, stagewise: bool = False):
+    def parse(self, processes: int = 0, top: int = 10):
+        """Parse all sources and templates at once instead of on first use,
+        distributed over processes, and store them in the parse cache. Prints
+        the parse times of the slowest files.
+
+        Parameters:
+            processes: int
+                Number of processes parsing files. Defaults to the number of
+                CPUs.
+            top: int
+                Number of slowest files listed.
+        """
+        processes = processes or os.cpu_count()
+        for title, mapping in [
+            ("sources", self.__entities),
+            ("templates", self.__templates),
+        ]:
+            print_timestamp("Parsing {}...".format(title))
+            timings = mapping.parse_all(processes)
+            print(" done.")
+            print(timing_summary(timings, len(mapping.index), top))
+        return self
+
+    def generate(
+        self,
+        algorithm: str,
+        N: int,
+        SW: int = 1,
+        stagewise: bool = False,
+        sparse: bool = False,
+        mapped: bool = False,
+        cache: bool = True,
+    ):
         """Generate a Sorting Network based on parameters given.
 
         Parameters:
@@ -140,42 +359,83 @@ class Interface:
                 Instead of a piecewise CS generation, generate a network using
                 a stage element. Becomes a relevant parameter during
                 replacement of FF and writing to VHDL.
+            sparse:
+                Store the network as lists of CS per stage instead of dense
+                matrices. Reduces memory requirements for large or pruned
+                networks.
+            mapped:
+                Keep the network matrices in memory-mapped temporary files
+                under "build/.netmap/" instead of RAM. Allows generation of
+                networks larger than the available memory.
+            cache:
+                Load the network and the results of subsequent transformations
+                from the network cache in "build/.netcache/" if present and
+                store them otherwise. Use --nocache to bypass the cache.
         """
         # Multiple generates withine one call should cause the
         # reporter to commit its aggregated stats to memory.
         if self.__network:
             self.__reporter.commit_report()
 
-        valid_types = ["oddeven", "bitonic", "blank"]
-        if "oddeven" == algorithm.lower():
-            print_timestamp("Generating Odd-Even-Network...")
-            logp = int(math.ceil(math.log2(N)))
-            self.__generator = generators.OddEven()
-            self.__network = self.__generator.create(2**logp)
-            self.__network = self.__generator.reduce(self.__network, N)
-        elif "bitonic" == algorithm.lower():
-            print_timestamp("Generating Bitonic-Network...")
-            logp = int(math.ceil(math.log2(N)))
-            self.__generator = generators.Bitonic()
-            self.__network = self.__generator.create(N)
-            self.__network = self.__generator.reduce(self.__network, N)
-        elif "blank" == algorithm.lower():
-            print_timestamp("Generating blank network...")
-            logp = int(math.ceil(math.log2(N)))
-            depth = logp * (logp + 1) // 2
-            self.__network = generators.Network(N, depth)
-        else:
-            print("Options: oddeven, bitonic, blank")
-
+        try:
+            generator = generators.get_generator(algorithm)
+        except ValueError as e:
+            print(e)
+            return self
+        network_type = generators.Network
+        if sparse:
+            network_type = generators.SparseNetwork
+        elif mapped:
+            network_type = generators.MappedNetwork
+        self.__cache = NetworkCache(enabled=cache)
+        self.__cache_params = {
+            "algorithm": algorithm.lower(),
+            "N": N,
+            "SW": SW,
+            "stagewise": stagewise,
+        }
+        self.__transforms = []
+        self.__network_type = network_type
+        self.__generator = generator
         self.__stagewise = stagewise
-        if stagewise:
-            self.__network = self.__generator.make_stagewise(self.__network)
+        print_timestamp(
+            {
+                "oddeven": "Generating Odd-Even-Network...",
+                "bitonic": "Generating Bitonic-Network...",
+                "blank": "Generating blank network...",
+            }[algorithm.lower()]
+        )
+        key = NetworkCache.key(self.__cache_params, self.__transforms)
+        self.__network = self.__cache.load(key, network_type)
+        if self.__network is None:
+            self.__network = generators.build_network(
+                N, algorithm, stagewise, network_type=network_type
+            )
+            self.__network.signals["STREAM"].bit_width = SW
+            self.__cache.store(key, self.__network)
         self.__stage_set = set(range(self.__network.get_depth()))
-        if algorithm.lower() in valid_types:
-            self.__reporter.report_network(self.__network)
-            print(" done.")
+        self.__reporter.report_network(self.__network)
+        print(" done.")
         return self
 
+    def __transform(self, name: str, args: list, transform):
+        """Apply transform to the network, or load the result from the network
+        cache if the same sequence of transformations was applied before."""
+        self.__transforms.append([name, args])
+        key = NetworkCache.key(self.__cache_params, self.__transforms)
+        network = self.__cache.load(key, self.__network_type)
+        if network is None:
+            self.__materialize()
+            transform()
+            self.__cache.store(key, self.__network)
+        else:
+            self.__network = network
+
+    def __materialize(self):
+        """Replace a view of the network by a copy that can be modified."""
+        if isinstance(self.__network, generators.NetworkView):
+            self.__network = self.__network.materialize()
+
     def distribute_signal(self, signal_name: str, max_fanout: int):
         """Performs signal replication and distribution within the network.
         Primary use is to reduce fanout of shared signals in each stage.
@@ -191,8 +451,14 @@ class Interface:
         """
         print_timestamp("Distributing signal '{}'...".format(signal_name))
         if self.__network:
-            self.__network = self.__generator.distribute_signal(
-                self.__network, signal_name, max_fanout
+
+            def transform():
+                self.__network = self.__generator.distribute_signal(
+                    self.__network, signal_name, max_fanout
+                )
+
+            self.__transform(
+                "distribute_signal", [signal_name, max_fanout], transform
             )
         print(" done.")
         return self
@@ -221,23 +487,72 @@ class Interface:
                 ),
             )
             N = self.__network.get_N()
-            if output_config.lower() == "max":
-                self.__generator.prune(self.__network, set(range(0, num_outputs)))
-                self.__network.output_config = "max"
-            elif output_config.lower() == "min":
-                self.__generator.prune(self.__network, set(range(N - num_outputs, N)))
-                self.__network.output_config = "min"
-            elif output_config.lower() == "median":
-                lower_bound = N // 2 - num_outputs // 2
-                upper_bound = N // 2 + (num_outputs + 1) // 2
+
+            def transform():
                 self.__generator.prune(
-                    self.__network, set(range(lower_bound, upper_bound))
+                    self.__network, get_output_set(output_config, num_outputs, N)
                 )
-                self.__network.output_config = "median"
+                self.__network.output_config = output_config.lower()
+
+            self.__transform(
+                "reshape", [output_config.lower(), num_outputs], transform
+            )
             print(" done.")
             self.__reporter.report_network(self.__network)
         return self
 
+    def reshape_sweep(
+        self,
+        output_configs: list[str] = ["max", "min", "median"],
+        num_outputs: list[int] = [1],
+        cs: str = "SWCS",
+        W: int = 8,
+    ):
+        """Reshape the current network to every combination of output
+        configuration and number of outputs and write each result. All
+        networks are pruned from the network generated once, which stays
+        unchanged. FF replacements are not applied to the written networks.
+
+        Parameters:
+            output_configs: list[str]
+                Names of the output configurations. Valid options are "max",
+                "min" or "median".
+            num_outputs: list[int]
+                Numbers of desired outputs.
+            cs: str
+                Name of the CS element instantiated in the code.
+            W: int
+                Width or length of the words to be sorted.
+        """
+        configs = [
+            (config.lower(), num)
+            for config in output_configs
+            if config.lower() in ["max", "min", "median"]
+            for num in num_outputs
+        ]
+        print_timestamp(
+            "Reshaping Network to {} configurations...".format(len(configs))
+        )
+        self.__materialize()
+        N = self.__network.get_N()
+        networks = self.__generator.prune_batch(
+            self.__network,
+            [get_output_set(config, num, N) for config, num in configs],
+        )
+        print(" done.")
+        base_network = self.__network
+        ffreplacements = self.__ffreplacements
+        self.__ffreplacements = []
+        for (config, num), network in zip(configs, networks):
+            network.output_config = config
+            self.__network = network
+            self.__reporter.report_network(network)
+            self.write(cs=cs, W=W)
+        self.__network = base_network
+        self.__ffreplacements = ffreplacements
+        self.__reporter.report_network(base_network)
+        return self
+
     def prune(self, output_set, name: str = "mixed"):
         """Prune network outputs to only contain CS,FF and stages relevant
         to the sorting of the indices given by the output set.
@@ -254,8 +569,12 @@ class Interface:
         print_timestamp(
             "Pruning Network outputs...",
         )
-        self.__generator.prune(self.__network, set(output_set))
-        self.__network.output_config = name
+
+        def transform():
+            self.__generator.prune(self.__network, set(output_set))
+            self.__network.output_config = name
+
+        self.__transform("prune", [sorted(output_set), name], transform)
         print(" done.")
         self.__reporter.report_network(self.__network)
         return self
@@ -271,19 +590,130 @@ class Interface:
             i for i in stage_indices if i >= 0 and i < self.__network.get_depth()
         ]
         self.__stage_set = self.__stage_set.difference(stage_indices)
-        self.__generator.exclude_stages(self.__network, stage_indices)
+        # Stage selections are views of the network and not cached.
+        self.__transforms.append(["exclude_stages", sorted(stage_indices)])
+        self.__network = self.__generator.exclude_stages(self.__network, stage_indices)
         return self
 
     def include_stages(self, stage_indices: list[int]):
         """Include only stages with indices given by stage_indices list."""
         self.__stage_set = self.__stage_set.intersection(stage_indices)
-        self.__generator.include_stages(self.__network, stage_indices)
+        self.__transforms.append(["include_stages", sorted(stage_indices)])
+        self.__network = self.__generator.include_stages(self.__network, stage_indices)
         return self
 
     def include_stages_range(self, beg: int, end: int):
         """Include only stages to indices given by range between beg and end."""
         self.__stage_set = self.__stage_set.intersection(range(beg, end))
-        self.__generator.include_stages(self.__network, range(beg, end))
+        self.__transforms.append(["include_stages", list(range(beg, end))])
+        self.__network = self.__generator.include_stages(
+            self.__network, range(beg, end)
+        )
+        return self
+
+    def sweep_stages(
+        self,
+        first: int = 1,
+        last: int = 0,
+        step: int = 1,
+        entity: str = "",
+        limit: int = 1500,
+        entity_ff: int = 48,
+        shared_ff: bool = False,
+        cs: str = "SWCS",
+        W: int = 8,
+        processes: int = 0,
+    ):
+        """Write the sorters consisting of the first i stages of the network
+        for i from first to last, equivalent to include_stages_range 0 i
+        followed by replace_ff and write for each i. The network is generated
+        only once, each sorter is written from a view of its stages. Rows of
+        the sorters are added to build/report.csv.
+
+        Parameters:
+            first: int
+                Number of stages of the smallest sorter.
+            last: int
+                Number of stages of the largest sorter. Defaults to the depth
+                of the network.
+            step: int
+                Increment of the number of stages.
+            entity: str
+                Name of the entity to replace FF with. FF are not replaced if
+                empty.
+            limit: int
+                Maximum number of replacements to use in each sorter.
+            entity_ff: int
+                Maximum number of FF to be replaced with one instance of the
+                replacement.
+            shared_ff: bool
+                Allocate FF replacements only once on the full network and
+                restrict them to the stages of each sorter instead of
+                allocating them for each sorter. Faster, but each sorter only
+                gets the share of the replacements allocated to its stages.
+            cs: str
+                Name of the CS element instantiated in the code.
+            W: int
+                Width or length of the words to be sorted.
+            processes: int
+                Number of processes writing sorters. Defaults to the number of
+                CPUs.
+        """
+        depth = self.__network.get_depth()
+        last = min(last or depth, depth)
+        ff_replacements = list(self.__ffreplacements)
+        allocation = None
+        if entity and shared_ff:
+            print_timestamp("Replacing FF with {} resource...".format(entity))
+            ralloc = StageAllocator() if self.__stagewise else BlockAllocator()
+            ff_replacements.append(
+                ralloc.reallocate_ff(
+                    self.__network,
+                    entity=self.__entities[entity],
+                    max_entities=limit,
+                    ff_per_entity=entity_ff,
+                )
+            )
+            print(" done.")
+        elif entity:
+            allocation = (entity, limit, entity_ff)
+        state = (
+            self.__network,
+            ff_replacements,
+            allocation,
+            self.__entities,
+            self.__templates,
+            cs,
+            W,
+            self.__stagewise,
+        )
+        ends = list(range(max(first, 1), last + 1, step))
+        print_timestamp("Writing {} stage slices...".format(len(ends)))
+        processes = processes or os.cpu_count()
+        if processes > 1 and len(ends) > 1:
+            with ProcessPoolExecutor(
+                max_workers=processes, initializer=_init_sweep, initargs=(state,)
+            ) as pool:
+                results = list(pool.map(_write_stage_slice, ends))
+        else:
+            _init_sweep(state)
+            results = [_write_stage_slice(end) for end in ends]
+            _init_sweep(None)
+        print(" done.")
+        if results:
+            print(
+                "Wrote {} sorters to build/{} to build/{}".format(
+                    len(results), results[0][0], results[-1][0]
+                )
+            )
+            # Report each sorter in order, as separate calls of write would.
+            print_timestamp("Writing reports ...")
+            for name, replacements in results:
+                if replacements:
+                    self.__reporter.report_ff_replacement(replacements[-1])
+                self.__reporter.commit_report()
+            self.__reporter.write_report("build/report.csv")
+            print(" done.")
         return self
 
     def replace_ff(self, entity: str, limit=1500, entity_ff=48):
@@ -322,11 +752,260 @@ class Interface:
         print(" done.")
         return self
 
+    def verify(
+        self,
+        num_vectors: int = 1 << 16,
+        exhaustive_N: int = 20,
+        processes: int = 0,
+        seed: int = None,
+    ):
+        """Verify that the network sorts, or for reshaped and pruned networks
+        produces the elements of its output set, using the 0-1 principle.
+
+        Parameters:
+            num_vectors: int
+                Number of random 0-1 test vectors for networks with more than
+                exhaustive_N inputs.
+            exhaustive_N: int
+                Networks up to this number of inputs are checked against all
+                possible 0-1 vectors.
+            processes: int
+                Number of processes to distribute the test vectors on.
+                Defaults to the number of CPUs.
+            seed: int
+                Seed of the random test vectors.
+        """
+        print_timestamp("Verifying network...")
+        verifier = Verifier(exhaustive_N=exhaustive_N, num_vectors=num_vectors)
+        result = verifier.verify(
+            self.__network, processes=processes or os.cpu_count(), seed=seed
+        )
+        print(" done.")
+        print("Verification: " + str(result))
+        return self
+
+    def simulate(
+        self,
+        num_rows: int = 1 << 16,
+        W: int = 8,
+        processes: int = 1,
+        seed: int = None,
+    ):
+        """Sort rows of random W-bit keys with the network in software.
+        Compares the outputs and the throughput against numpy.sort.
+
+        Parameters:
+            num_rows: int
+                Number of rows of N keys to sort.
+            W: int
+                Width of the keys in bits.
+            processes: int
+                Number of processes to distribute the rows on.
+            seed: int
+                Seed of the random keys.
+        """
+        N = self.__network.get_N()
+        dtype = np.min_scalar_type((1 << W) - 1)
+        data = np.random.default_rng(seed).integers(
+            0, 1 << W, (num_rows, N), dtype=dtype
+        )
+        outputs = sorted(self.__network.get_output_set())
+        print_timestamp("Simulating network...")
+        start = time.perf_counter()
+        result = simulate(self.__network, data, processes=processes)
+        network_time = time.perf_counter() - start
+        print(" done.")
+        start = time.perf_counter()
+        reference = np.sort(data, axis=1)[:, ::-1]
+        sort_time = time.perf_counter() - start
+        matches = np.array_equal(result, reference[:, outputs])
+        print("Outputs match numpy.sort: {}".format(matches))
+        for name, t in [("Network", network_time), ("numpy.sort", sort_time)]:
+            print(
+                "{}: {:.3f}s, {:.0f} rows/s".format(name, t, num_rows / max(t, 1e-9))
+            )
+        return self
+
+    def simulate_cycles(
+        self,
+        num_sets: int = 1024,
+        W: int = 8,
+        sets_per_lane: int = 4,
+        seed: int = None,
+    ):
+        """Simulate the sorter at cycle level with bit-serial CS on sets of
+        random W-bit keys. Reports latency and initiation interval, CS
+        receiving misaligned START pulses and undriven points of the network.
+
+        Parameters:
+            num_sets: int
+                Number of sets of N keys to sort.
+            W: int
+                Width of the keys in bits.
+            sets_per_lane: int
+                Number of sets fed back-to-back into the sorter per lane.
+            seed: int
+                Seed of the random keys.
+        """
+        N = self.__network.get_N()
+        data = np.random.default_rng(seed).integers(0, 1 << W, (num_sets, N))
+        print_timestamp("Simulating cycles...")
+        report = simulate_cycles(self.__network, data, W, sets_per_lane)
+        print(" done.")
+        print(report)
+        return self
+
+    def model(self, W: int = 8, frequency: float = 100e6):
+        """Predict throughput, latency and resource usage of the sorter
+        generated from the network without running synthesis.
+
+        Parameters:
+            W: int
+                Width or length of the words to be sorted.
+            frequency: float
+                Clock frequency in Hz.
+        """
+        estimate = SorterModel().estimate(
+            self.__network, W, frequency, self.__ffreplacements
+        )
+        print(estimate)
+        return self
+
+    def explore(
+        self,
+        N: int,
+        W: int = 8,
+        luts: int = 1182000,
+        ffs: int = 2364000,
+        dsps: int = 6840,
+        throughput: float = 0.0,
+        frequency: float = 100e6,
+        entity: str = "REGISTER_DSP",
+        entity_ff: int = 48,
+        processes: int = 0,
+        write: bool = True,
+        path: str = "",
+        cs: str = "SWCS",
+    ):
+        """Search the configurations of generate, distribute_signal and
+        replace_ff for a sorter of N inputs. Prints the Pareto front of
+        throughput versus resource usage predicted by the model, picks the
+        configuration reaching the throughput with the least resources and
+        writes its VHDL code.
+
+        Parameters:
+            N: int
+                Number of inputs.
+            W: int
+                Width or length of the words to be sorted.
+            luts, ffs, dsps: int
+                Resources available on the target device. Defaults to a VU9P.
+            throughput: float
+                Targeted number of sorted items per second.
+            frequency: float
+                Clock frequency in Hz.
+            entity: str
+                Entity to replace FF with. Use "" to not replace FF.
+            entity_ff: int
+                Maximum number of FF to be replaced with one instance of the
+                replacement.
+            processes: int
+                Number of processes to evaluate configurations on. Defaults to
+                the number of CPUs.
+            write: bool
+                Generate and write the chosen configuration. Use --nowrite to
+                only print the results.
+            path: str
+                Path to write the generated files to.
+            cs: str
+                Name of the CS element instantiated in the code.
+        """
+        print_timestamp("Exploring configurations...")
+        explorer = Explorer(N, W, Budget(luts, ffs, dsps), frequency)
+        candidates = explorer.explore(
+            self.__entities.get(entity) if entity else None,
+            entity_ff,
+            processes or os.cpu_count(),
+        )
+        print(" done.")
+        front = pareto_front(candidates)
+        columns = [
+            "algorithm",
+            "SW",
+            "stagewise",
+            "fanout",
+            "entity_ff",
+            "items_per_second",
+            "latency",
+            "luts",
+            "ffs",
+            "dsps",
+            "utilization",
+        ]
+        print(
+            "Pareto front of {} configurations:\n".format(len(candidates))
+            + pd.DataFrame([c.as_dict() for c in front], columns=columns).to_string()
+        )
+        chosen = Explorer.choose(candidates, throughput)
+        if chosen is None:
+            print("No configuration fits the budget.")
+            return self
+        if chosen.estimate.items_per_second < throughput:
+            print("No configuration reaches the throughput, choosing the fastest.")
+        config = chosen.configuration
+        print("Chosen configuration: {}".format(config))
+        if write:
+            self.generate(config.algorithm, N, config.SW, config.stagewise)
+            if config.fanout:
+                self.distribute_signal("START", config.fanout)
+            if config.entity_ff:
+                self.replace_ff(entity, config.limit, config.entity_ff)
+            self.write(path, cs, W)
+        return self
+
+    def batch(self, jobs: str, processes: int = 0, make: bool = True, state: str = ""):
+        """Run the jobs described by a YAML or JSON file. Every combination
+        of the parameter grid is one job, consisting of a chain of netgen.py
+        commands and optionally the implementation of the written sorter
+        through make. The status of each job is kept in a state file, so a
+        rerun of an interrupted batch continues where it stopped. Jobs whose
+        outputs are up to date are skipped.
+
+        Parameters:
+            jobs: str
+                Path to the batch specification, see ReadMe.org.
+            processes: int
+                Number of processes generating sorters. Defaults to the
+                number of CPUs.
+            make: bool
+                Implement the sorters if the specification contains make
+                options. Use --nomake to only generate them.
+            state: str
+                Path of the state file. Defaults to
+                build/batch/*SpecificationName*.json.
+        """
+        if not state:
+            state = "build/batch/{}.json".format(Path(jobs).stem)
+        runner = BatchRunner(load_spec(jobs), type(self), Path(state))
+        failures = runner.run(processes or os.cpu_count(), make)
+        print("Batch finished with {} failed jobs.".format(failures))
+        return self
+
+    def __is_complete(self) -> bool:
+        """Whether the network still contains all stages and is expected to
+        sort its output set."""
+        return self.__generator is not None and not any(
+            name in ["exclude_stages", "include_stages"]
+            for name, args in self.__transforms
+        )
+
     def write(
         self,
         path: str = "",
         cs: str = "SWCS",
         W: int = 8,
+        verify: bool = True,
+        processes: int = 1,
     ):
         """Generate and write VHDL code from the network. Produces
         "Network.vhd" containing the Sorting Network, "Sorter.vhd"
@@ -341,67 +1020,38 @@ class Interface:
                 Name of the CS element instantiated in the code.
             W:
                 Width or length of the words to be sorted.
+            verify:
+                Run a quick 0-1 principle check of the network before writing.
+                Skipped for networks with excluded stages. Use --noverify to
+                disable.
+            processes:
+                Number of processes generating the CS of the network. Use 0
+                for the number of CPUs.
         """
-        # Templates: Network.vhd, Sorter.vhd, Test_Sorter.vhd
-        template_names = ["Sorter.vhd", "Test_Sorter.vhd"]
+        if verify and self.__is_complete():
+            result = Verifier(exhaustive_N=16, num_vectors=4096).verify(self.__network)
+            if not result.passed():
+                print("Warning: network failed verification, " + str(result))
         print_timestamp(
             "Writing templates ...",
         )
-        cs_entity = self.__entities[cs]
+        name = network_name(self.__network, self.__stagewise, self.__stage_set)
         if not path:
-            name = self.__network.algorithm
-            name += "_" + str(self.__network.get_N())
-            name += "X" + str(len(self.__network.output_set))
-            if self.__stagewise:
-                name += "_STAGEWISE"
-
-            logp = int(math.ceil((math.log2(self.__network.get_N()))))
-            if self.__network.get_depth() < logp * (logp + 1) // 2:
-                if len(self.__stage_set) == 1:
-                    s = self.__stage_set.copy()
-                    elem = s.pop()
-                    name += "_STAGE" + str(elem)
-                else:
-                    name += "_S" + str(len(self.__stage_set))
-            if self.__network.output_config:
-                name += "_" + self.__network.output_config.upper()
             path = "build/{}/".format(name)
-        path_obj = Path(path)
-        path_obj.mkdir(parents=True, exist_ok=True)
-        template_processor = None
-        if self.__stagewise:
-            template_processor = VHDLTemplateProcessorStagewise()
-        else:
-            template_processor = VHDLTemplateProcessor()
-
-        entities = {
-            "CS": cs_entity,
-            "Signal_Distributor": self.__entities["SIGNAL_DISTRIBUTOR"],
-            "Stage": self.__entities["Stage"],
-        }
-        kwargs = {"W": W, "ff_replacements": self.__ffreplacements}
-        template_processor.process_network_template(
-            path_obj / "Network.vhd",
+        files = write_vhdl(
+            Path(path),
             self.__network,
             name,
-            self.__templates["Network.vhd"],
-            entities,
-            **kwargs,
+            self.__entities,
+            self.__templates,
+            cs,
+            W,
+            self.__ffreplacements,
+            self.__stagewise,
+            processes or os.cpu_count(),
         )
-        for temp in template_names:
-            template_processor.process_template(
-                path_obj / temp,
-                self.__network,
-                name,
-                self.__templates[temp],
-                **kwargs,
-            )
         print(" done.")
-        print(
-            "Wrote Network.vhd, "
-            + ", ".join(template_names)
-            + " to {}".format(str(path_obj))
-        )
+        print("Wrote " + ", ".join(files) + " to {}".format(str(Path(path))))
         print_timestamp("Writing reports ...")
         self.__reporter.commit_report()
         path = "build/report.csv"
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+import hashlib
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass
+from pathlib import Path
+
+import fire
+import yaml
+
+# Files and directories the generated sorters depend on. Outputs older than
+# any file in them are out of date.
+SOURCES = ["netgen.py", "scripts", "src", "templates"]
+# Bitstream produced by make relative to the SORTER directory.
+BITSTREAM = "work_dir/TEST_SORTER_TOP.bit"
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(size) -> int:
+    """Number of bytes of a size given as int or string such as "16G"."""
+    if isinstance(size, (int, float)):
+        return int(size)
+    size = str(size).strip().upper().rstrip("B")
+    unit = size[-1:] if size[-1:] in SIZE_UNITS else ""
+    return int(float(size[: len(size) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def physical_memory() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def newest_mtime(paths) -> float:
+    """Latest modification time of the given files and all files below the
+    given directories."""
+    newest = 0.0
+    for path in map(Path, paths):
+        if path.is_dir():
+            files = (f for f in path.rglob("*") if f.is_file())
+        else:
+            files = [path] if path.exists() else []
+        for f in files:
+            newest = max(newest, f.stat().st_mtime)
+    return newest
+
+
+def expand_grid(grid) -> list[dict]:
+    """All combinations of the parameter grid. Values which are not lists are
+    used for all combinations. A list of grids yields the union of their
+    combinations."""
+    params = []
+    for g in grid if isinstance(grid, list) else [grid]:
+        values = [v if isinstance(v, list) else [v] for v in g.values()]
+        for combination in itertools.product(*values):
+            params.append(dict(zip(g.keys(), combination)))
+    return params
+
+
+@dataclass
+class Job:
+    """Chain of netgen.py commands generating one sorter."""
+
+    name: str
+    command: list[str]
+    # Directory the sorter is written to, used by make and up to date checks.
+    output: str = ""
+
+    def key(self) -> str:
+        return hashlib.sha256(json.dumps(self.command).encode()).hexdigest()
+
+    def is_up_to_date(self, sources_mtime: float) -> bool:
+        """Whether the sorter has been written after the last change of the
+        sources."""
+        files = list(Path(self.output).glob("*.vhd")) if self.output else []
+        return bool(files) and min(f.stat().st_mtime for f in files) >= sources_mtime
+
+    def bitstream(self) -> Path:
+        return Path(self.output) / BITSTREAM
+
+    def is_implemented(self) -> bool:
+        """Whether the bitstream has been built from the current sorter."""
+        bit = self.bitstream()
+        return bit.exists() and bit.stat().st_mtime >= newest_mtime(
+            Path(self.output).glob("*.vhd")
+        )
+
+
+def load_jobs(spec: dict) -> list[Job]:
+    """Jobs of a batch specification. Each step is a netgen.py command whose
+    arguments may refer to parameters of the grid, e.g. "generate
+    {algorithm} {N}". The output directory and job name may do so as well.
+    """
+    jobs = []
+    for params in expand_grid(spec.get("grid", {})):
+        output = spec.get("output", "").format(**params)
+        params["output"] = output
+        command = []
+        for step in spec["steps"]:
+            if command:
+                command.append("-")
+            command += shlex.split(step.format(**params))
+        default = output.rstrip("/").split("/")[-1] if output else "_".join(
+            str(v) for k, v in params.items() if k != "output"
+        )
+        name = spec.get("name", default).format(**params)
+        jobs.append(Job(name, command, output))
+    names = [job.name for job in jobs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError("Job names are not unique: {}".format(sorted(duplicates)))
+    return jobs
+
+
+def load_spec(file) -> dict:
+    """Read a batch specification from a YAML or JSON file."""
+    with open(file) as f:
+        if Path(file).suffix == ".json":
+            return json.load(f)
+        return yaml.safe_load(f)
+
+
+class JobState:
+    """Status of the jobs of a batch, kept in a JSON file so interrupted
+    batches resume where they stopped. The file is replaced atomically after
+    every update.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.jobs = dict()
+        if self.path.exists():
+            with open(self.path) as f:
+                self.jobs = json.load(f)
+
+    def get(self, job: Job, stage: str) -> str:
+        entry = self.jobs.get(job.name, {})
+        if entry.get("key") != job.key():
+            return "pending"
+        return entry.get(stage, "pending")
+
+    def set(self, job: Job, stage: str, status: str, seconds: float = 0.0):
+        entry = self.jobs.setdefault(job.name, {})
+        if entry.get("key") != job.key():
+            entry.clear()
+            entry["key"] = job.key()
+        entry[stage] = status
+        entry[stage + "_seconds"] = round(seconds, 3)
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.jobs, f, indent=2)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# State shared with the worker processes.
+_interface = None
+_log_dir = None
+
+
+def _init_worker(interface, log_dir):
+    global _interface, _log_dir
+    _interface = interface
+    _log_dir = log_dir
+
+
+def _run_job(job: Job) -> tuple[bool, float]:
+    """Run the command chain of job, logging its output to a file."""
+    start = time.perf_counter()
+    with open(_log_dir / (job.name + ".log"), "w") as log:
+        with redirect_stdout(log), redirect_stderr(log):
+            try:
+                fire.Fire(_interface, command=job.command)
+                success = True
+            except (Exception, SystemExit):
+                traceback.print_exc()
+                success = False
+    return success, time.perf_counter() - start
+
+
+class BatchRunner:
+    """Runs the jobs of a batch specification. Sorters are generated in a
+    process pool, followed by the implementation of each sorter through make
+    if requested. Jobs are skipped if their state file entry is done and their
+    outputs are up to date.
+
+    Parameters:
+        spec: dict
+            Batch specification, see ReadMe.org.
+        interface: type
+            Class whose commands make up the steps of the jobs.
+        state_file: Path
+            File the status of the jobs is kept in.
+    """
+
+    def __init__(self, spec: dict, interface, state_file: Path):
+        self.spec = spec
+        self.interface = interface
+        self.jobs = load_jobs(spec)
+        self.state = JobState(state_file)
+        self.log_dir = Path(state_file).with_suffix("")
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+
+    def pending(self) -> list[Job]:
+        """Jobs whose sorter has to be generated."""
+        sources_mtime = newest_mtime(SOURCES)
+        return [
+            job
+            for job in self.jobs
+            if self.state.get(job, "generate") != "done"
+            or (job.output and not job.is_up_to_date(sources_mtime))
+        ]
+
+    def generate(self, processes: int = 1) -> int:
+        """Generate pending sorters. Returns the number of failed jobs."""
+        jobs = self.pending()
+        print(
+            "Generating {} of {} sorters, logs in {}".format(
+                len(jobs), len(self.jobs), self.log_dir
+            )
+        )
+        failures = 0
+
+        def record(job, success, seconds):
+            self.state.set(job, "generate", "done" if success else "failed", seconds)
+            print(
+                "  {}: {} after {:.1f}s".format(
+                    job.name, "done" if success else "failed", seconds
+                )
+            )
+            return int(not success)
+
+        if processes > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_worker,
+                initargs=(self.interface, self.log_dir),
+            ) as pool:
+                futures = {pool.submit(_run_job, job): job for job in jobs}
+                for future in as_completed(futures):
+                    failures += record(futures[future], *future.result())
+        else:
+            _init_worker(self.interface, self.log_dir)
+            for job in jobs:
+                failures += record(job, *_run_job(job))
+            _init_worker(None, None)
+        return failures
+
+    def implement(self) -> int:
+        """Run make for all generated sorters without an up to date
+        bitstream. At most "jobs" instances run at once and their memory
+        budgets must fit the memory of the machine. Returns the number of
+        failed jobs."""
+        options = self.spec["make"]
+        concurrency = int(options.get("jobs", 1))
+        memory = parse_size(options.get("memory", 0))
+        total_memory = parse_size(options.get("total_memory", 0)) or physical_memory()
+        queue = [
+            job
+            for job in self.jobs
+            if job.output
+            and self.state.get(job, "generate") == "done"
+            and not (self.state.get(job, "make") == "done" and job.is_implemented())
+        ]
+        print("Implementing {} sorters".format(len(queue)))
+        failures = 0
+        running = dict()
+        while queue or running:
+            # The first job is always started, even if its budget exceeds the
+            # memory of the machine.
+            while (
+                queue
+                and len(running) < concurrency
+                and (not running or (len(running) + 1) * memory <= total_memory)
+            ):
+                job = queue.pop(0)
+                command = [
+                    "make",
+                    "BOARD={}".format(options.get("board", "nexys4ddr")),
+                    "SORTER={}".format(job.output.rstrip("/")),
+                ] + shlex.split(options.get("args", ""))
+                log = open(self.log_dir / (job.name + ".make.log"), "w")
+                process = subprocess.Popen(command, stdout=log, stderr=log)
+                running[process] = (job, log, time.perf_counter())
+                self.state.set(job, "make", "running")
+            time.sleep(0.1)
+            for process in [p for p in running if p.poll() is not None]:
+                job, log, start = running.pop(process)
+                log.close()
+                seconds = time.perf_counter() - start
+                success = process.returncode == 0
+                self.state.set(job, "make", "done" if success else "failed", seconds)
+                print(
+                    "  {}: make {} after {:.1f}s".format(
+                        job.name, "done" if success else "failed", seconds
+                    )
+                )
+                failures += int(not success)
+        return failures
+
+    def run(self, processes: int = 1, make: bool = True) -> int:
+        """Generate all sorters and implement them if the specification
+        contains make options. Returns the number of failed jobs."""
+        failures = self.generate(processes)
+        if make and "make" in self.spec:
+            failures += self.implement()
+        return failures
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import scripts.network_generators as generators
+from scripts.model import Estimate, SorterModel
+from scripts.resource_allocator import BlockAllocator, StageAllocator
+from scripts.vhdl import VHDLEntity
+
+
+@dataclass
+class Budget:
+    """Resources available on the target device. Defaults to a VU9P."""
+
+    luts: int = 1182000
+    ffs: int = 2364000
+    dsps: int = 6840
+
+
+@dataclass
+class Configuration:
+    """Parameters of generate, distribute_signal and replace_ff describing a
+    sorter."""
+
+    algorithm: str
+    SW: int = 1
+    stagewise: bool = False
+    # Maximum fanout of the START signal, 0 if not distributed.
+    fanout: int = 0
+    # FF per replacement entity and maximum number of entities, 0 if FF are
+    # not replaced.
+    entity_ff: int = 0
+    limit: int = 0
+
+
+@dataclass
+class Candidate:
+    configuration: Configuration
+    estimate: Estimate
+    # Largest fraction of any resource of the budget used by the sorter.
+    utilization: float
+
+    def fits(self) -> bool:
+        return self.utilization <= 1.0
+
+    def as_dict(self) -> dict:
+        a = asdict(self.configuration)
+        a.update(self.estimate.as_dict())
+        a["utilization"] = self.utilization
+        return a
+
+
+def _evaluate(task) -> list[Candidate]:
+    """Evaluate all configurations sharing the network topology of the given
+    task, which only differ in SW and the replacement of FF."""
+    N, W, frequency, budget, entity, configurations = task
+    first = configurations[0]
+    network = generators.build_network(
+        N, first.algorithm, first.stagewise, first.fanout
+    )
+    model = SorterModel()
+    candidates = []
+    for config in configurations:
+        network.signals["STREAM"].bit_width = config.SW
+        replacements = []
+        if config.entity_ff and entity is not None:
+            allocator = StageAllocator() if config.stagewise else BlockAllocator()
+            replacements.append(
+                allocator.reallocate_ff(
+                    network,
+                    entity=entity,
+                    max_entities=config.limit,
+                    ff_per_entity=config.entity_ff,
+                )
+            )
+        estimate = model.estimate(network, W, frequency, replacements)
+        utilization = max(
+            estimate.luts / budget.luts,
+            estimate.ffs / budget.ffs,
+            estimate.dsps / budget.dsps if budget.dsps else float(estimate.dsps > 0),
+        )
+        candidates.append(Candidate(config, estimate, utilization))
+    return candidates
+
+
+def pareto_front(candidates: list[Candidate]) -> list[Candidate]:
+    """Candidates not outperformed by another one using at most the same
+    fraction of the budget, ordered by increasing throughput."""
+    ordered = sorted(
+        candidates, key=lambda c: (-c.estimate.items_per_second, c.utilization)
+    )
+    front = []
+    for candidate in ordered:
+        if not front or candidate.utilization < front[-1].utilization:
+            front.append(candidate)
+    return front[::-1]
+
+
+class Explorer:
+    """Enumerates configurations of a sorter for N inputs of W bits and
+    evaluates them using the analytical model. Each network topology is
+    generated once and shared by all SW and FF replacements.
+    """
+
+    def __init__(
+        self,
+        N: int,
+        W: int = 8,
+        budget: Budget = Budget(),
+        frequency: float = 100e6,
+    ):
+        self.N = N
+        self.W = W
+        self.budget = budget
+        self.frequency = frequency
+
+    def configurations(self, entity_ff: int = 0) -> list[list[Configuration]]:
+        """Candidate configurations, grouped by network topology.
+
+        Parameters:
+            entity_ff: int
+                FF per replacement entity. Replacement of FF is only
+                considered if greater than zero.
+        """
+        sws = [sw for sw in range(1, self.W + 1) if self.W % sw == 0]
+        fanouts = [0] + [f for f in (4, 8, 16, 32, 64) if f < self.N]
+        replacements = [(0, 0)]
+        if entity_ff and self.budget.dsps:
+            replacements.append((entity_ff, self.budget.dsps))
+        groups = []
+        for algorithm in ("oddeven", "bitonic"):
+            for stagewise in (False, True):
+                # Distribution of START replaces the stagewise distribution.
+                for fanout in fanouts if not stagewise else [0]:
+                    groups.append(
+                        [
+                            Configuration(
+                                algorithm, sw, stagewise, fanout, ff, limit
+                            )
+                            for sw in sws
+                            for ff, limit in replacements
+                        ]
+                    )
+        return groups
+
+    def explore(
+        self, entity: VHDLEntity = None, entity_ff: int = 0, processes: int = 1
+    ) -> list[Candidate]:
+        """Evaluate all configurations, distributed over the given number of
+        processes.
+
+        Parameters:
+            entity: VHDLEntity
+                Entity replacing FF, e.g. REGISTER_DSP.
+            entity_ff: int
+                Maximum number of FF replaced by one instance of entity.
+            processes: int
+                Number of processes to evaluate configurations on.
+
+        Returns:
+            candidates : list[Candidate]
+        """
+        if entity is None:
+            entity_ff = 0
+        tasks = [
+            (self.N, self.W, self.frequency, self.budget, entity, group)
+            for group in self.configurations(entity_ff)
+        ]
+        if processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(_evaluate, tasks))
+        else:
+            results = [_evaluate(task) for task in tasks]
+        return [c for result in results for c in result]
+
+    @staticmethod
+    def choose(candidates: list[Candidate], throughput: float = 0.0):
+        """Pick the candidate fitting the budget which reaches the throughput
+        in items/s with the least resources. Falls back to the fastest
+        candidate fitting the budget if none reaches the throughput.
+
+        Returns:
+            candidate : Candidate or None if no candidate fits the budget.
+        """
+        front = [c for c in pareto_front(candidates) if c.fits()]
+        if not front:
+            return None
+        for candidate in front:
+            if candidate.estimate.items_per_second >= throughput:
+                return candidate
+        return front[-1]
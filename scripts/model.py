@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+import math
+import numpy as np
+from dataclasses import asdict, dataclass
+
+from scripts.network_generators import DistributionType, Network
+from scripts.reporter import Report
+from scripts.resource_allocator import FFReplacement
+from scripts.simulator import distributor_delays, distributor_sources
+
+
+# Closed forms for networks with N = 2^p inputs based on Sorting networks on
+# FPGAs, Mueller et al., 2012.
+def num_stages(N):
+    p = np.log2(N)
+    return p * (p + 1.0) / 2.0
+
+
+def num_cs(algorithm: str, N):
+    p = np.log2(N)
+    if algorithm.lower() == "oddeven":
+        return (p * p - p + 4) * np.power(2, p - 2) - 1
+    if algorithm.lower() == "bitonic":
+        return (p * p + p) * np.power(2, p - 2)
+    raise ValueError("Unknown algorithm '{}'".format(algorithm))
+
+
+def bit_serial_luts(algorithm: str, N):
+    """LUTs of a network of bit-serial CS, based on implementation data."""
+    return 2.0 * num_cs(algorithm, N)
+
+
+def bit_serial_ff(algorithm: str, N):
+    """FF of a network of bit-serial CS. Derived from the number of delaying
+    FF in the network (s**2) and the FF of the CS state-machines (2*CS)."""
+    s = num_stages(N)
+    return s * s + 2.0 * num_cs(algorithm, N)
+
+
+@dataclass
+class Estimate:
+    """Predicted performance and resource usage of a sorter."""
+
+    N: int
+    M: int
+    W: int
+    SW: int
+    depth: int
+    num_cs: int
+    num_ff: int
+    # Cycles between two sets entering the sorter, ceil(W / SW).
+    cycles_per_set: int
+    # Cycles from the START pulse of a set until its last output subword.
+    latency: int
+    luts: float
+    ffs: float
+    dsps: int
+    frequency: float
+    sets_per_second: float
+    items_per_second: float
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def __str__(self):
+        return "\n".join("{}: {}".format(k, v) for k, v in self.as_dict().items())
+
+
+class SorterModel:
+    """Analytical model of the throughput, latency and resource usage of a
+    sorter generated from a network. Counts of CS and delay FF are taken from
+    the network; the coefficients below translate them into device resources
+    and may be adjusted to implementation data of other devices.
+    Serializer, deserializer and test infrastructure are not included.
+    """
+
+    # LUTs of a bit-serial CS and additional LUTs per further subword bit.
+    luts_per_cs = 2.0
+    luts_per_cs_bit = 1.0
+    # FF of the CS state-machine. Outputs of CS are registered in addition.
+    ff_per_cs = 2
+
+    def estimate(
+        self,
+        network: Network,
+        W: int = 8,
+        frequency: float = 100e6,
+        ff_replacements: list[FFReplacement] = [],
+    ) -> Estimate:
+        """Estimate performance and resources of the sorter generated from
+        network.
+
+        Parameters:
+            network: Network
+                Network of the sorter.
+            W: int
+                Width of the words to be sorted.
+            frequency: float
+                Clock frequency in Hz.
+            ff_replacements: list[FFReplacement]
+                Replacements of delay FF by other resources such as DSPs.
+
+        Returns:
+            estimate : Estimate
+        """
+        content = Report(network).content
+        SW = network.signals["STREAM"].bit_width
+        P = math.ceil(W / SW)
+        depth = network.get_depth()
+        cs = content["num_cs"]
+        delay_ff = content["num_ff"]
+
+        luts = cs * (self.luts_per_cs + self.luts_per_cs_bit * (SW - 1))
+        # Delay FF and registered CS outputs carry one subword each.
+        ffs = SW * (delay_ff + 2 * cs) + self.ff_per_cs * cs
+        dsps = 0
+        for repl in ff_replacements:
+            # Ranges of assignments count FF bits, not points of the network.
+            ffs -= sum(
+                a.ff_range[1] - a.ff_range[0] for group in repl.groups for a in group
+            )
+            if "DSP" in repl.entity.name:
+                dsps += len(repl.groups)
+        ffs += self.control_ff(network)
+
+        sets_per_second = frequency / P
+        return Estimate(
+            N=network.get_N(),
+            M=content["M"],
+            W=W,
+            SW=SW,
+            depth=depth,
+            num_cs=cs,
+            num_ff=delay_ff,
+            cycles_per_set=P,
+            latency=self.distributor_delay(network) + depth + P - 1,
+            luts=luts,
+            ffs=ffs,
+            dsps=dsps,
+            frequency=frequency,
+            sets_per_second=sets_per_second,
+            items_per_second=sets_per_second * network.get_N(),
+        )
+
+    def distributor_delay(self, network: Network) -> int:
+        """Cycles until START reaches the network through the signal
+        distributor, after which the serializer feeds the first subword."""
+        signal = network.signals["START"]
+        if signal.num_replications <= 1:
+            return 0
+        replicas, feedback = distributor_delays(
+            signal.num_replications, max(signal.max_fanout, 2)
+        )
+        return feedback or 0
+
+    def control_ff(self, network: Network) -> int:
+        """FF of control signals distributed through the network, i.e. the
+        registers of their layers and signal distributors."""
+        ffs = 0
+        for signal in network.signals.values():
+            if signal.layer_index <= 0:
+                continue
+            if signal.distribution == DistributionType.STAGEWISE_FLAT:
+                ffs += signal.num_replications * network.get_depth()
+            else:
+                for y in range(network.get_depth()):
+                    ffs += int(
+                        np.count_nonzero(network.get_ff_stage(signal.layer_index, y))
+                    )
+            if signal.num_replications > 1:
+                ffs += len(
+                    distributor_sources(
+                        signal.num_replications, max(signal.max_fanout, 2)
+                    )
+                )
+        return ffs
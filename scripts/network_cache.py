@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy as np
+from dataclasses import asdict
+from pathlib import Path
+
+from scripts.network_generators import (
+    DistributionType,
+    Network,
+    NetworkSignal,
+)
+
+# Incremented whenever generators, transformations or the file format
+# produce different networks, which invalidates all entries.
+CACHE_VERSION = 1
+
+
+def save_network(file, network: Network):
+    """Write network to file as compressed .npz archive. The format does not
+    depend on the storage backend of the network: CS are stored as lists per
+    stage and FF layers as bit-packed planes."""
+    depth = network.get_depth()
+    comparators = [network.get_comparators(y) for y in range(depth)]
+    counts = np.array([len(low) for low, high, reverse in comparators], np.int64)
+
+    def concat(i, dtype):
+        if not comparators:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([c[i] for c in comparators]).astype(dtype)
+
+    # FF layers are packed stage by stage to avoid unpacking whole layers.
+    ff = np.empty(
+        (network.num_layers(), depth, (network.get_N() + 7) // 8), dtype=np.uint8
+    )
+    for z in range(network.num_layers()):
+        for y in range(depth):
+            flags = network.get_ff_stage(z, y)
+            ff[z, y] = np.packbits(flags, bitorder="little")
+
+    signals = [asdict(s) for s in network.signals.values()]
+    for s in signals:
+        s["distribution"] = s["distribution"].name
+    meta = {
+        "algorithm": network.algorithm,
+        "output_config": network.output_config,
+        "signals": signals,
+    }
+    np.savez_compressed(
+        file,
+        meta=np.array(json.dumps(meta)),
+        shape=np.array([network.get_N(), depth], dtype=np.int64),
+        output_set=np.array(sorted(network.get_output_set()), dtype=np.int64),
+        counts=counts,
+        low=concat(0, np.int32),
+        high=concat(1, np.int32),
+        reverse=concat(2, np.bool_),
+        ff=ff,
+    )
+
+
+def load_network(file, network_type: type = Network) -> Network:
+    """Read network written by save_network using the given storage backend."""
+    with np.load(file) as data:
+        meta = json.loads(str(data["meta"]))
+        N, depth = (int(i) for i in data["shape"])
+        network = network_type()
+        network.allocate(N, depth)
+        network.algorithm = meta["algorithm"]
+        network.output_config = meta["output_config"]
+        network.output_set = set(data["output_set"].tolist())
+        network.signals = {}
+        for s in meta["signals"]:
+            s["distribution"] = DistributionType[s["distribution"]]
+            network.signals[s["name"]] = NetworkSignal(**s)
+        ff = data["ff"]
+        for z in range(1, ff.shape[0]):
+            network.add_layer("")
+        y = np.repeat(np.arange(depth), data["counts"])
+        network.place_cs(y, data["low"], data["high"], data["reverse"])
+        for z in range(ff.shape[0]):
+            for y in range(depth):
+                flags = np.unpackbits(ff[z, y], count=N, bitorder="little")
+                network.set_ff_stage(z, y, flags.view(np.bool_))
+    return network
+
+
+class NetworkCache:
+    """Content-addressed cache of generated networks on disk. Networks are
+    keyed by the generation parameters and the sequence of transformations
+    applied to them. Least recently used entries are evicted once the total
+    size exceeds max_size bytes.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path("build/.netcache"),
+        max_size: int = 1 << 30,
+        enabled: bool = True,
+    ):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.enabled = enabled
+
+    @staticmethod
+    def key(params: dict, transforms: list) -> str:
+        """Returns the cache key of a network created with params and modified
+        by the list of transformations given as [name, arguments] pairs."""
+        content = json.dumps(
+            [CACHE_VERSION, params, transforms], sort_keys=True, default=str
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def __file(self, key: str) -> Path:
+        return self.path / (key + ".npz")
+
+    def load(self, key: str, network_type: type = Network):
+        """Returns the cached network or None if the key is not present."""
+        if not self.enabled:
+            return None
+        file = self.__file(key)
+        try:
+            network = load_network(file, network_type)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            # Truncated or corrupt entry, removed so that it is stored again.
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                pass
+            return None
+        # Access time is tracked through the modification time. The entry may
+        # have been evicted by another process in the meantime.
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            pass
+        return network
+
+    def store(self, key: str, network: Network):
+        if not self.enabled:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see
+        # partial entries.
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                save_network(f, network)
+            os.replace(tmp, self.__file(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_size."""
+        entries = []
+        for file in self.path.glob("*.npz"):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+        entries.sort()
+        size = sum(e[1] for e in entries)
+        for mtime, file_size, file in entries:
+            if size <= self.max_size:
+                break
+            file.unlink(missing_ok=True)
+            size -= file_size
+
+    def clear(self):
+        for file in self.path.glob("*.npz"):
+            file.unlink(missing_ok=True)
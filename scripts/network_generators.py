@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import copy
 import math
+import tempfile
 import numpy as np
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from pathlib import Path
 
 
 def is_in_order(index: int, perm: int):
@@ -32,6 +35,46 @@ class NetworkSignal:
     max_fanout: int = 1
 
 
+def encode_runs(flags: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Run-length encode a boolean row into start and end (exclusive) indices
+    of its runs of set flags."""
+    edges = np.diff(flags.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1).astype(np.int32)
+    ends = np.flatnonzero(edges == -1).astype(np.int32)
+    return starts, ends
+
+
+def decode_runs(runs: tuple[np.ndarray, np.ndarray], N: int) -> np.ndarray:
+    """Inverse of encode_runs. Returns boolean row of length N."""
+    starts, ends = runs
+    edges = np.zeros(N + 1, dtype=np.int32)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, ends, -1)
+    return np.cumsum(edges[:N]) > 0
+
+
+class RowCache:
+    """Keeps the last dense row built for each key, e.g. one stage per FF
+    layer. Rows handed out are read-only."""
+
+    def __init__(self):
+        self.rows: dict = {}
+
+    def get(self, key, y: int, build) -> np.ndarray:
+        if key in self.rows and self.rows[key][0] == y:
+            return self.rows[key][1]
+        row = build()
+        row.flags.writeable = False
+        self.rows[key] = (y, row)
+        return row
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.rows.clear()
+        else:
+            self.rows.pop(key, None)
+
+
 class Network:
     def __init__(self, N: int = 0, depth: int = 0, SW: int = 1):
         # Name of the underlying algorithm
@@ -46,21 +89,49 @@ class Network:
         # direction of the sorting condition , i.e. if CS checks inputs a < b then
         # inverse direction checks a > b.
         self.pmatrix = np.ones((1, 1), dtype=np.int64)
-        # Layers containing FFs. Purpose/usage is derived from the layer_names list.
-        # Contains 2D np arrays
-        self.ff_layers = np.zeros((1, 1), dtype=np.bool_)
+        # Layers containing FFs. Purpose/usage is derived from the signals
+        # referencing the layer index. Each layer is a bit-packed
+        # depth x ceil(N/8) uint8 plane, with bit x % 8 of byte x // 8 holding
+        # the flag of input x.
+        self.ff_planes: list[np.ndarray] = []
         # Signal name associated with each layer
         self.signals: dict[str, NetworkSignal] = {}
+        self.__rows = RowCache()
         self.setup(N, depth, SW)
 
-    def setup(self, N: int, depth: int, SW: int = 1):
-        self.pmatrix = np.empty([depth, N], dtype=np.int64)
+    def allocate(self, N: int, depth: int):
+        """Allocate storage for an empty network of N inputs and given depth.
+        Every stage is the identity with a delay FF on each wire."""
+        self.pmatrix = self.new_array((depth, N), self.index_dtype(N))
         ident_perm = np.arange(0, N)
         for d in range(depth):
-            self.pmatrix[d] = ident_perm.copy()
-        self.output_set = set(range(0, N))
+            self.pmatrix[d] = ident_perm
         # Add the first layer containing delay FF
-        self.ff_layers = np.ones([1, depth, N], dtype=np.bool_)
+        plane = self.new_array((depth, (N + 7) // 8), np.uint8)
+        plane[:] = self.__pack(np.ones(N, dtype=np.bool_))
+        self.ff_planes = [plane]
+        self.__rows = RowCache()
+
+    def index_dtype(self, N: int) -> np.dtype:
+        """Integer type of the permutation matrix for networks of N inputs."""
+        return np.dtype(np.int64)
+
+    def new_array(self, shape: tuple, dtype) -> np.ndarray:
+        """Allocate uninitialized storage for the permutation matrix or a FF
+        plane."""
+        return np.empty(shape, dtype=dtype)
+
+    def __pack(self, flags: np.ndarray) -> np.ndarray:
+        return np.packbits(flags, axis=-1, bitorder="little")
+
+    def __unpack(self, plane: np.ndarray) -> np.ndarray:
+        return np.unpackbits(
+            plane, axis=-1, count=self.get_N(), bitorder="little"
+        ).view(np.bool_)
+
+    def setup(self, N: int, depth: int, SW: int = 1):
+        self.allocate(N, depth)
+        self.output_set = set(range(0, N))
         self.signals["STREAM"] = NetworkSignal(
             name="STREAM",
             layer_index=0,
@@ -76,8 +147,8 @@ class Network:
             num_replications=1,
             max_fanout=1,
         )
-        for y in range(self.ff_layers[index].shape[0]):
-            self.ff_layers[index, y, 0] = True
+        for y in range(self.get_depth()):
+            self.set_ff((0, y, index), True)
         index = self.add_layer("ENABLE")
         self.add_signal(
             signal_name="ENABLE",
@@ -87,8 +158,8 @@ class Network:
             num_replications=1,
             max_fanout=1,
         )
-        for y in range(self.ff_layers[index].shape[0]):
-            self.ff_layers[index, y, 0] = True
+        for y in range(self.get_depth()):
+            self.set_ff((0, y, index), True)
 
         self.add_signal(
             signal_name="CLK",
@@ -129,10 +200,10 @@ class Network:
 
     def add_layer(self, layer_name: str) -> int:
         """Add an additional ff layer with specified purpose/usage through the layer name."""
-        new_layer_index = self.ff_layers.shape[0]
-        self.ff_layers = np.pad(
-            self.ff_layers, ((0, 1), (0, 0), (0, 0)), "constant", constant_values=False
-        )
+        new_layer_index = len(self.ff_planes)
+        plane = self.new_array(self.ff_planes[0].shape, np.uint8)
+        plane[:] = 0
+        self.ff_planes.append(plane)
         return new_layer_index
 
     def get_N(self) -> int:
@@ -141,6 +212,17 @@ class Network:
     def get_depth(self) -> int:
         return np.shape(self.pmatrix)[0]
 
+    def num_layers(self) -> int:
+        return len(self.ff_planes)
+
+    @property
+    def ff_layers(self) -> np.ndarray:
+        """Read-only L x depth x N boolean copy of all FF layers, held in
+        memory. Use get_ff_stage for large networks."""
+        layers = np.stack([self.get_ff_layer(z) for z in range(self.num_layers())])
+        layers.flags.writeable = False
+        return layers
+
     def at(self, point: (int, int)):
         x, y = point
         return self.pmatrix[y][x]
@@ -148,11 +230,98 @@ class Network:
     def num_ff_at(self, point: (int, int)):
         x, y = point
         count = 0
-        for layer in self.ff_layers:
-            if layer[y][x]:
+        for z in range(self.num_layers()):
+            if self.ff_at((x, y, z)):
                 count += 1
         return count
 
+    def ff_at(self, point: (int, int, int)) -> bool:
+        """Returns whether a FF is present in layer z at point (x, y)."""
+        x, y, z = point
+        return bool((self.ff_planes[z][y, x >> 3] >> (x & 7)) & 1)
+
+    def set_ff(self, point: (int, int, int), value: bool):
+        x, y, z = point
+        if value:
+            self.ff_planes[z][y, x >> 3] |= np.uint8(1 << (x & 7))
+        else:
+            self.ff_planes[z][y, x >> 3] &= np.uint8(~(1 << (x & 7)) & 0xFF)
+        self.__rows.invalidate(z % self.num_layers())
+
+    def get_ff_stage(self, z: int, y: int) -> np.ndarray:
+        """Returns FF flags of layer z in stage y as read-only boolean row."""
+        z = z % self.num_layers()
+        y = y % self.get_depth()
+        return self.__rows.get(z, y, lambda: self.__unpack(self.ff_planes[z][y]))
+
+    def set_ff_stage(self, z: int, y: int, flags: np.ndarray):
+        self.ff_planes[z][y] = self.__pack(np.asarray(flags, dtype=np.bool_))
+        self.__rows.invalidate(z % self.num_layers())
+
+    def get_ff_layer(self, z: int) -> np.ndarray:
+        """Returns FF flags of layer z as depth x N boolean matrix held in
+        memory, also for mapped networks."""
+        return self.__unpack(self.ff_planes[z])
+
+    def set_ff_layer(self, z: int, flags: np.ndarray):
+        """Set FF flags of layer z. Flags of shape N are applied to all stages."""
+        flags = np.asarray(flags, dtype=np.bool_)
+        self.ff_planes[z][:] = self.__pack(flags)
+        self.__rows.invalidate(z % self.num_layers())
+
+    def get_comparators(self, y: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the CS of stage y as arrays of lower index, upper index and
+        reverse flag, ordered by lower index."""
+        stage = self.pmatrix[y]
+        low = np.flatnonzero(np.abs(stage) > np.arange(stage.shape[0]))
+        return low, np.abs(stage[low]), stage[low] < 0
+
+    def place_cs(self, y, low: np.ndarray, high: np.ndarray, reverse=False):
+        """Place CS between indices low and high in stage(s) y, replacing the
+        delay FF at both inputs. Reverse CS are encoded by a negative sign."""
+        sign = np.where(reverse, -1, 1)
+        self.pmatrix[y, low] = sign * high
+        self.pmatrix[y, high] = sign * low
+        # Several indices may share a byte, hence the unbuffered operation.
+        for index in (low, high):
+            mask = np.left_shift(1, index & 7).astype(np.uint8)
+            np.bitwise_and.at(self.ff_planes[0], (y, index >> 3), ~mask)
+        self.__rows.invalidate(0)
+
+    def __copy_rows(self, src: np.ndarray, rows, columns: int) -> np.ndarray:
+        """Copy the first columns of the given rows into new storage, one row
+        at a time."""
+        dst = self.new_array((len(rows), columns), src.dtype)
+        for i, y in enumerate(rows):
+            dst[i] = src[y, :columns]
+        return dst
+
+    def delete_stages(self, indices):
+        keep = np.delete(np.arange(self.get_depth()), indices)
+        self.pmatrix = self.__copy_rows(self.pmatrix, keep, self.get_N())
+        self.ff_planes = [
+            self.__copy_rows(plane, keep, plane.shape[1]) for plane in self.ff_planes
+        ]
+        self.__rows.invalidate()
+
+    def truncate_inputs(self, N: int):
+        """Remove all inputs with index N or above. CS connected to a removed
+        input are replaced by bypasses."""
+        rows = range(self.get_depth())
+        pmatrix = self.__copy_rows(self.pmatrix, rows, N)
+        ident = np.arange(N)
+        for y in rows:
+            np.copyto(pmatrix[y], ident, where=np.abs(pmatrix[y]) >= N)
+        self.pmatrix = pmatrix
+        # Keep the bytes covering the remaining inputs and clear the bits
+        # beyond N in the last one.
+        tail = np.uint8((1 << (N & 7)) - 1 if N & 7 else 0xFF)
+        for z, plane in enumerate(self.ff_planes):
+            plane = self.__copy_rows(plane, rows, (N + 7) // 8)
+            plane[:, -1:] &= tail
+            self.ff_planes[z] = plane
+        self.__rows.invalidate()
+
     def get_output_set(self):
         return self.output_set
 
@@ -164,14 +333,14 @@ class Network:
 
     def __str__(self):
         a = "{0}: {1}\n".format(self.algorithm, self.get_N())
-        for stage in self.pmatrix:
-            a += str(stage)
+        for y in range(self.get_depth()):
+            a += str(self[y])
             a += "\n"
         a += str(self.get_output_set())
         a += "\n"
 
-        for i in range(self.ff_layers.shape[0]):
-            layer = self.ff_layers[i]
+        for i in range(self.num_layers()):
+            layer = self.get_ff_layer(i)
             signal = None
             for s in self.signals.values():
                 if i == s.layer_index:
@@ -201,6 +370,356 @@ class Network:
         return a
 
 
+class MappedNetwork(Network):
+    """Network keeping the permutation matrix and FF planes in memory-mapped
+    temporary files, so that only the stages currently accessed need to be
+    resident. The permutation matrix uses the smallest signed integer type
+    holding the indices.
+    """
+
+    # Directory of the backing files. These are removed once the arrays are
+    # released.
+    directory = Path("build/.netmap")
+
+    def index_dtype(self, N: int) -> np.dtype:
+        return np.promote_types(np.int8, np.min_scalar_type(-N))
+
+    def new_array(self, shape: tuple, dtype) -> np.ndarray:
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryFile(dir=self.directory) as f:
+            return np.memmap(f, dtype=dtype, mode="w+", shape=shape)
+
+
+class SparseNetwork(Network):
+    """Network storing each stage as a list of CS instead of a dense
+    permutation matrix. FF layers are stored run-length encoded per stage.
+    The delay FF of the stream layer are implied by all wires not taking part
+    in a CS, only deviations from that are stored. Dense rows are created on
+    demand and the last row accessed per layer is kept.
+    """
+
+    def __init__(self, N: int = 0, depth: int = 0, SW: int = 1):
+        self.algorithm = ""
+        self.output_config = "full"
+        self.output_set: set[int] = set()
+        # Number of inputs.
+        self.N = 0
+        # CS of each stage as tuple of int32 lower indices, int32 upper
+        # indices and reverse flags, ordered by lower index.
+        self.stages: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        # Run-length encoded FF layers as list of (starts, ends) per stage.
+        # The stream layer holds the runs deviating from the implied delays.
+        self.layers: list[list[tuple[np.ndarray, np.ndarray]]] = []
+        self.signals: dict[str, NetworkSignal] = {}
+        self.__rows = RowCache()
+        self.setup(N, depth, SW)
+
+    def allocate(self, N: int, depth: int):
+        self.N = N
+        self.stages = [self.__no_cs() for d in range(depth)]
+        self.layers = [[self.__no_runs() for d in range(depth)]]
+        self.__rows = RowCache()
+
+    def __no_cs(self):
+        return (
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.bool_),
+        )
+
+    def __no_runs(self):
+        return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+    def __delays(self, y: int) -> np.ndarray:
+        """Delay FF implied by the CS placement of stage y."""
+        low, high, reverse = self.stages[y]
+        flags = np.ones(self.N, dtype=np.bool_)
+        flags[low] = False
+        flags[high] = False
+        return flags
+
+    def __perm(self, y: int) -> np.ndarray:
+        low, high, reverse = self.stages[y]
+        stage = np.arange(self.N, dtype=np.int64)
+        sign = np.where(reverse, -1, 1)
+        stage[low] = sign * high
+        stage[high] = sign * low
+        return stage
+
+    def __flags(self, z: int, y: int) -> np.ndarray:
+        flags = decode_runs(self.layers[z][y], self.N)
+        if z == 0:
+            flags ^= self.__delays(y)
+        return flags
+
+    def add_layer(self, layer_name: str) -> int:
+        new_layer_index = len(self.layers)
+        self.layers.append([self.__no_runs() for d in range(self.get_depth())])
+        return new_layer_index
+
+    def get_N(self) -> int:
+        return self.N
+
+    def get_depth(self) -> int:
+        return len(self.stages)
+
+    def num_layers(self) -> int:
+        return len(self.layers)
+
+    def at(self, point: (int, int)):
+        x, y = point
+        return self[y][x]
+
+    def ff_at(self, point: (int, int, int)) -> bool:
+        x, y, z = point
+        return self.get_ff_stage(z, y)[x]
+
+    def set_ff(self, point: (int, int, int), value: bool):
+        x, y, z = point
+        flags = self.get_ff_stage(z, y).copy()
+        flags[x] = value
+        self.set_ff_stage(z, y, flags)
+
+    def get_ff_stage(self, z: int, y: int) -> np.ndarray:
+        z = z % self.num_layers()
+        y = y % self.get_depth()
+        return self.__rows.get(z, y, lambda: self.__flags(z, y))
+
+    def set_ff_stage(self, z: int, y: int, flags: np.ndarray):
+        z = z % self.num_layers()
+        y = y % self.get_depth()
+        flags = np.asarray(flags, dtype=np.bool_)
+        if z == 0:
+            flags = flags ^ self.__delays(y)
+        self.layers[z][y] = encode_runs(flags)
+        self.__rows.invalidate(z)
+
+    def get_ff_layer(self, z: int) -> np.ndarray:
+        layer = np.empty((self.get_depth(), self.N), dtype=np.bool_)
+        for y in range(self.get_depth()):
+            layer[y] = self.get_ff_stage(z, y)
+        return layer
+
+    def set_ff_layer(self, z: int, flags: np.ndarray):
+        z = z % self.num_layers()
+        flags = np.broadcast_to(
+            np.asarray(flags, dtype=np.bool_), (self.get_depth(), self.N)
+        )
+        if z == 0:
+            for y in range(self.get_depth()):
+                self.set_ff_stage(0, y, flags[y])
+            return
+        # Stages sharing the same flags share their encoded runs.
+        runs = None
+        for y in range(self.get_depth()):
+            if runs is None or not np.array_equal(flags[y], flags[y - 1]):
+                runs = encode_runs(flags[y])
+            self.layers[z][y] = runs
+        self.__rows.invalidate(z)
+
+    def get_comparators(self, y: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.stages[y]
+
+    def __set_comparators(self, y: int, low, high, reverse):
+        """Replace CS of stage y while keeping its FF unchanged."""
+        flags = self.get_ff_stage(0, y).copy()
+        order = np.argsort(low, kind="stable")
+        self.stages[y] = (
+            np.asarray(low, dtype=np.int32)[order],
+            np.asarray(high, dtype=np.int32)[order],
+            np.asarray(reverse, dtype=np.bool_)[order],
+        )
+        self.__rows.invalidate()
+        self.set_ff_stage(0, y, flags)
+
+    def place_cs(self, y, low: np.ndarray, high: np.ndarray, reverse=False):
+        low = np.asarray(low)
+        high = np.asarray(high)
+        y = np.broadcast_to(y, low.shape)
+        reverse = np.broadcast_to(reverse, low.shape)
+        for d in np.unique(y):
+            d = int(d)
+            sel = y == d
+            flags = self.get_ff_stage(0, d).copy()
+            flags[low[sel]] = False
+            flags[high[sel]] = False
+            # CS already present on any of the new indices are replaced.
+            old_low, old_high, old_reverse = self.stages[d]
+            used = np.zeros(self.N, dtype=np.bool_)
+            used[low[sel]] = True
+            used[high[sel]] = True
+            keep = ~(used[old_low] | used[old_high])
+            self.__set_comparators(
+                d,
+                np.concatenate((old_low[keep], low[sel])),
+                np.concatenate((old_high[keep], high[sel])),
+                np.concatenate((old_reverse[keep], reverse[sel])),
+            )
+            self.set_ff_stage(0, d, flags)
+
+    def delete_stages(self, indices):
+        keep = np.ones(self.get_depth(), dtype=np.bool_)
+        keep[np.asarray(indices, dtype=np.int64)] = False
+        self.stages = [s for s, k in zip(self.stages, keep) if k]
+        self.layers = [[r for r, k in zip(layer, keep) if k] for layer in self.layers]
+        self.__rows.invalidate()
+
+    def truncate_inputs(self, N: int):
+        for y in range(self.get_depth()):
+            flags = [self.get_ff_stage(z, y)[:N] for z in range(self.num_layers())]
+            low, high, reverse = self.stages[y]
+            keep = high < N
+            low, high, reverse = low[keep], high[keep], reverse[keep]
+            delays = np.ones(N, dtype=np.bool_)
+            delays[low] = False
+            delays[high] = False
+            self.stages[y] = (low, high, reverse)
+            self.layers[0][y] = encode_runs(flags[0] ^ delays)
+            for z in range(1, self.num_layers()):
+                self.layers[z][y] = encode_runs(flags[z])
+            self.__rows.invalidate()
+        self.N = N
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            key = range(self.get_depth())[key]
+            return self.__rows.get("pmatrix", key, lambda: self.__perm(key))
+        raise TypeError("SparseNetwork only supports access to single stages.")
+
+    def __setitem__(self, key, value):
+        key = range(self.get_depth())[key]
+        stage = np.asarray(value)
+        low = np.flatnonzero(np.abs(stage) > np.arange(stage.shape[0]))
+        self.__set_comparators(key, low, np.abs(stage[low]), stage[low] < 0)
+
+
+class NetworkView:
+    """Stages of a base network given as range or list of indices, without
+    copying its storage. Provides the read access of Network used by the
+    allocators, reporter and template processors. FF changed through the view
+    are kept per stage in the view, the base network remains unchanged. Use
+    materialize() to obtain an independent network of the base network type.
+    """
+
+    def __init__(self, base, stages=None):
+        if stages is None:
+            stages = range(base.get_depth())
+        if isinstance(base, NetworkView):
+            # Views of views refer to the stages of the underlying network.
+            if isinstance(stages, range):
+                stages = base.stages[stages.start : stages.stop : stages.step]
+            else:
+                stages = [base.stages[y] for y in stages]
+            base = base.base
+        if not isinstance(stages, range):
+            stages = sorted(set(int(y) for y in stages))
+        self.base = base
+        self.stages = stages
+        self.algorithm = base.algorithm
+        self.output_config = base.output_config
+        self.output_set: set[int] = set(base.output_set)
+        self.signals: dict[str, NetworkSignal] = copy.deepcopy(base.signals)
+        # FF flags changed through the view, keyed by layer and stage.
+        self.__ff: dict[tuple[int, int], np.ndarray] = {}
+
+    def get_N(self) -> int:
+        return self.base.get_N()
+
+    def get_depth(self) -> int:
+        return len(self.stages)
+
+    def num_layers(self) -> int:
+        return self.base.num_layers()
+
+    @property
+    def ff_layers(self) -> np.ndarray:
+        """Read-only L x depth x N boolean copy of all FF layers, held in
+        memory. Use get_ff_stage for large networks."""
+        layers = np.stack([self.get_ff_layer(z) for z in range(self.num_layers())])
+        layers.flags.writeable = False
+        return layers
+
+    def new_array(self, shape: tuple, dtype) -> np.ndarray:
+        """Allocate storage of the kind used by the base network."""
+        return self.base.new_array(shape, dtype)
+
+    def at(self, point: (int, int)):
+        x, y = point
+        return self[y][x]
+
+    def num_ff_at(self, point: (int, int)):
+        x, y = point
+        return sum(self.ff_at((x, y, z)) for z in range(self.num_layers()))
+
+    def ff_at(self, point: (int, int, int)) -> bool:
+        x, y, z = point
+        return bool(self.get_ff_stage(z, y)[x])
+
+    def set_ff(self, point: (int, int, int), value: bool):
+        x, y, z = point
+        flags = self.get_ff_stage(z, y).copy()
+        flags[x] = value
+        self.set_ff_stage(z, y, flags)
+
+    def get_ff_stage(self, z: int, y: int) -> np.ndarray:
+        z = z % self.num_layers()
+        y = y % self.get_depth()
+        flags = self.__ff.get((z, y))
+        if flags is None:
+            return self.base.get_ff_stage(z, self.stages[y])
+        return flags
+
+    def set_ff_stage(self, z: int, y: int, flags: np.ndarray):
+        z = z % self.num_layers()
+        y = y % self.get_depth()
+        flags = np.array(flags, dtype=np.bool_)
+        flags.flags.writeable = False
+        self.__ff[(z, y)] = flags
+
+    def get_ff_layer(self, z: int) -> np.ndarray:
+        """Returns FF flags of layer z as depth x N boolean matrix held in
+        memory."""
+        layer = np.empty((self.get_depth(), self.get_N()), dtype=np.bool_)
+        for y in range(self.get_depth()):
+            layer[y] = self.get_ff_stage(z, y)
+        return layer
+
+    def get_comparators(self, y: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.base.get_comparators(self.stages[y])
+
+    def get_output_set(self):
+        return self.output_set
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            rows = range(self.get_depth())[key]
+            return np.stack([self.base[self.stages[y]] for y in rows])
+        return self.base[self.stages[key]]
+
+    def __str__(self):
+        return Network.__str__(self)
+
+    def materialize(self):
+        """Copy the stages of the view into a new network of the type of the
+        base network."""
+        network = type(self.base)()
+        network.allocate(self.get_N(), self.get_depth())
+        network.algorithm = self.algorithm
+        network.output_config = self.output_config
+        network.output_set = set(self.output_set)
+        network.signals = copy.deepcopy(self.signals)
+        for z in range(1, self.num_layers()):
+            network.add_layer("")
+        for y in range(self.get_depth()):
+            low, high, reverse = self.get_comparators(y)
+            network.place_cs(y, low, high, reverse)
+            for z in range(self.num_layers()):
+                network.set_ff_stage(z, y, self.get_ff_stage(z, y))
+        return network
+
+
 class Generator:
     def __init__(self):
         self.name = ""
@@ -218,8 +737,8 @@ class Generator:
             print(k, v)
         return ""
 
-    def create(self, N):
-        return Network()
+    def create(self, N, network_type: type = Network):
+        return network_type()
 
     def distribute_signal(self, network: Network, signal_name: str, max_fanout: int):
         """Replicate and distribute signal in the network using FF according to
@@ -240,15 +759,13 @@ class Generator:
         if not num_sig:
             num_sig = 1
         # dist_depth = math.ceil(math.log(num_sig, max_fanout))
-        for y in range(network.get_depth()):
-            for x in range(network.get_N()):
-                if (x + (max_fanout + 1) // 2) % max_fanout != 0:
-                    network.ff_layers[index][y][x] = False
-                else:
-                    network.ff_layers[index][y][x] = True
-            # Deal with remainder
-            if max_fanout * num_sig < network.get_N():
-                network.ff_layers[index][y][-1] = True
+        # Every stage receives the same replication pattern.
+        x = np.arange(network.get_N())
+        flags = (x + (max_fanout + 1) // 2) % max_fanout == 0
+        # Deal with remainder
+        if max_fanout * num_sig < network.get_N():
+            flags[-1] = True
+        network.set_ff_layer(index, flags)
         network.signals[signal_name].distribution = DistributionType.PER_STAGE
         network.signals[signal_name].is_replicated = True
         network.signals[signal_name].num_replications = num_sig
@@ -274,69 +791,96 @@ class Generator:
 
         if N == network.get_N():
             return network
-        for s in range(network.get_depth()):
-            for i in range(N):
-                # Look for CS elements whose inputs are outside of the target
-                # size. Replace them with bypass elements.
-                if network.pmatrix[s][i] >= N:
-                    network.pmatrix[s][i] = i
-        # Resize network to target size.
-        diff = range(N, network.get_N())
-        network.pmatrix = np.delete(network.pmatrix, diff, axis=1)
+        # Resize network to target size. CS elements whose inputs are outside
+        # of the target size are replaced with bypass elements.
+        network.truncate_inputs(N)
+        last_stage = network[network.get_depth() - 1]
         network.output_set = set(
-            [
-                i
-                for i, perm in enumerate(network[network.get_depth() - 1])
-                if not is_in_order(i, perm)
-            ]
+            np.flatnonzero(np.abs(last_stage) != np.arange(N)).tolist()
         )
-        num_layers = network.ff_layers.shape[0]
-        network.ff_layers = np.delete(network.ff_layers, diff, axis=2)
         # for i in range(len(network.ff_layers)):
         #     network.ff_layers[i] = np.delete(network.ff_layers[i], range(N, old_N), 1)
         return network
 
-    def prune(self, network, new_output_set: set = set()):
-        """Prunes CS elements not belonging to outputs in output_set.
-        Starting at the end of the network, all CS not relevant for sorting
-        elements of the output are pruned. Each stage of the network, wires
-        connected to the outputs through CS elements are added to the set to
-        ensure correctness.
+    def reachability(self, network, output_sets: list[set]) -> np.ndarray:
+        """Computes which wires are relevant to each of the given output sets.
+        Starting at the end of the network, each stage wires connected to
+        relevant wires through CS elements become relevant as well. All
+        output sets are propagated together.
+
+        Returns:
+            reachable : np.ndarray
+                Boolean array of shape (depth, len(output_sets), N) marking the
+                relevant wires at the input side of each stage.
         """
         N = network.get_N()
-        d = network.get_depth()
-
-        network.output_set = new_output_set.copy()
+        depth = network.get_depth()
+        reachable = np.ones((depth, len(output_sets), N), dtype=np.bool_)
+        # Wires relevant to the outputs at the output side of the current stage.
+        current = np.zeros((len(output_sets), N), dtype=np.bool_)
+        for k, output_set in enumerate(output_sets):
+            current[k, [i for i in output_set if 0 <= i < N]] = True
         # Beginning at the output end of the network...
-        while d >= 0:
-            d -= 1
-            for i in range(N):
-                # ... remove all CS elements not in output_set ...
-                if i in new_output_set:
-                    if not is_in_order(i, network[d][i]):
-                        new_output_set.add(network[d][i])
-                    else:
-                        network.pmatrix[d][i] = i
-                        network.ff_layers[0][d][i] = False
-                elif network[d][i] in new_output_set:
-                    new_output_set.add(i)
-                else:
-                    network.pmatrix[d][i] = i
-                    network.ff_layers[0][d][i] = False
-            # If the output set contains all ports we are done.
-            if len(new_output_set) == N:
+        for d in range(depth - 1, -1, -1):
+            # If all wires are relevant we are done.
+            if current.all():
                 break
+            # ... wires compared with a relevant wire become relevant.
+            current = current | current[:, np.abs(network[d])]
+            reachable[d] = current
+        return reachable
+
+    def apply_reachability(self, network, reachable: np.ndarray):
+        """Removes all CS elements and FF of wires not marked in the
+        (depth, N) reachability mask as well as stages left without CS."""
+        index = np.arange(network.get_N())
+        for d in range(network.get_depth()):
+            if reachable[d].all():
+                continue
+            stage = network[d].copy()
+            stage[~reachable[d]] = index[~reachable[d]]
+            network[d] = stage
+            delays = network.get_ff_stage(0, d).copy()
+            delays[~reachable[d]] = False
+            network.set_ff_stage(0, d, delays)
 
         # Remove stages which only contain delay elements.
-        indices = []
-        for i in range(0, network.pmatrix.shape[0]):
-            stage = network.pmatrix[i]
-            if all(is_in_order(j, p) for j, p in enumerate(stage)):
-                indices.append(i)
-        network.pmatrix = np.delete(network.pmatrix, indices, axis=0)
-        network.ff_layers = np.delete(network.ff_layers, indices, axis=1)
+        indices = [
+            d
+            for d in range(network.get_depth())
+            if not network.get_comparators(d)[0].size
+        ]
+        network.delete_stages(indices)
         return network
 
+    def prune(self, network, new_output_set: set = set()):
+        """Prunes CS elements not belonging to outputs in output_set.
+        Starting at the end of the network, all CS not relevant for sorting
+        elements of the output are pruned. Each stage of the network, wires
+        connected to the outputs through CS elements are added to a
+        reachability mask to ensure correctness.
+        """
+        reachable = self.reachability(network, [new_output_set])
+        network.output_set = new_output_set.copy()
+        return self.apply_reachability(network, reachable[:, 0])
+
+    def prune_batch(self, network, output_sets: list[set]) -> list[Network]:
+        """Prunes copies of the network for each of the output sets. The
+        network itself is left unchanged and the reachability of all sets is
+        computed in a single pass.
+
+        Returns:
+            networks : list[Network]
+                One pruned network per output set, in the same order.
+        """
+        reachable = self.reachability(network, output_sets)
+        networks = []
+        for k, output_set in enumerate(output_sets):
+            pruned = copy.deepcopy(network)
+            pruned.output_set = set(output_set)
+            networks.append(self.apply_reachability(pruned, reachable[:, k]))
+        return networks
+
     def make_stagewise(self, network: Network):
         """Change signal distribution of the ENABLE and START signal to STAGEWISE_FLAT."""
         network.signals["START"].distribution = DistributionType.STAGEWISE_FLAT
@@ -344,15 +888,25 @@ class Generator:
         return network
 
     def exclude_stages(self, network: Network, stage_list: list[int]):
-        """Delete stages with indices given by stage_list."""
-        network.pmatrix = np.delete(network.pmatrix, stage_list, axis=0)
-        network.ff_layers = np.delete(network.ff_layers, stage_list, axis=1)
-        return network
+        """View of the network without the stages with indices given by
+        stage_list."""
+        excluded = set(stage_list)
+        return NetworkView(
+            network, [i for i in range(network.get_depth()) if i not in excluded]
+        )
 
     def include_stages(self, network: Network, stage_list: list[int]):
-        """Remove all but the indices given by stage_list."""
-        stage_list = [i for i in range(network.get_depth()) if i not in stage_list]
-        return self.exclude_stages(network, stage_list)
+        """View of the network containing only the stages with indices given
+        by stage_list."""
+        if isinstance(stage_list, range):
+            stage_list = range(
+                max(stage_list.start, 0),
+                min(stage_list.stop, network.get_depth()),
+                stage_list.step,
+            )
+        else:
+            stage_list = [i for i in stage_list if 0 <= i < network.get_depth()]
+        return NetworkView(network, stage_list)
 
 
 class OddEven(Generator):
@@ -363,13 +917,13 @@ class OddEven(Generator):
             "N": "Number of inputs.",
         }
 
-    def create(self, N):
+    def create(self, N, network_type: type = Network):
         # Adaption of algorithm described at
         # https://en.wikipedia.org/wiki/Batcher_odd%E2%80%93even_mergesort
 
         logp = int(math.ceil((math.log2(N))))
         depth = logp * (logp + 1) // 2
-        network = Network(N, depth)
+        network = network_type(N, depth)
         network.algorithm = self.name
         d = -1  # Current network depth index
         for p_e in range(0, logp):
@@ -377,15 +931,17 @@ class OddEven(Generator):
             for k_e in range(p_e, -1, -1):
                 k = 2**k_e
                 d += 1
-                for j in range(k % p, N - k, 2 * k):
-                    for i in range(0, min(k, N - j - k)):
-                        if math.floor((i + j) / (p * 2)) == math.floor(
-                            (i + j + k) / (p * 2)
-                        ):
-                            network[d][i + j] = i + j + k
-                            network[d][i + j + k] = i + j
-                            network.ff_layers[0][d][i + j] = False
-                            network.ff_layers[0][d][i + j + k] = False
+                # Lower indices of all candidate CS in this stage. Each row
+                # corresponds to a block start j, each column to the offset i
+                # within the block.
+                j = np.arange(k % p, N - k, 2 * k)
+                i = np.arange(0, k)
+                low = (j[:, np.newaxis] + i[np.newaxis, :]).ravel()
+                high = low + k
+                # Only keep CS whose partner is in range and which do not
+                # cross the boundary of a merger of size 2p.
+                valid = (high < N) & (low // (p * 2) == high // (p * 2))
+                network.place_cs(d, low[valid], high[valid])
         return network
 
 
@@ -398,66 +954,96 @@ class Bitonic(Generator):
         }
 
     def max_pow2_less_N(self, N):
-        k = 1
-        while k > 0 and k < N:
-            k = k << 1
-        return k >> 1
-
-    def bitonicSort(self, network, low_bound, N, depth, asc=True):
-        if N > 1:
-            # print("BSort:", low_bound, N, depth)
-            middle = N // 2
-            # print(low_bound, middle, N - middle, depth)
-            d1 = self.bitonicSort(network, low_bound, middle, depth, not asc)
-            d2 = self.bitonicSort(network, low_bound + middle, N - middle, depth, asc)
-            return self.bitonicMerge(network, low_bound, N, max(d1, d2), asc)
-        else:
+        """Largest power of two strictly smaller than N. Accepts scalars as
+        well as integer arrays with all elements greater than one."""
+        N = np.asarray(N, dtype=np.int64)
+        # frexp yields the bit length of N - 1 as exponent.
+        _, exponent = np.frexp(N - 1)
+        return np.left_shift(1, exponent.astype(np.int64) - 1)
+
+    def sort_depth(self, N: int) -> int:
+        """Depth of the bitonic sorter for N inputs, i.e. the stage index
+        following its final merger."""
+        depth = 0
+        while N > 1:
+            depth += int(math.ceil(math.log2(N)))
+            N = N - N // 2
+        return depth
+
+    def bitonicSort(self, network, N):
+        """Determines all mergers of a bitonic sorter over N inputs and
+        places them in the network.
+        The sort tree is unrolled level by level: each node of size n is split
+        into a descending half of n // 2 and an ascending half of n - n // 2
+        inputs. Every node with more than one input ends in a merger, which
+        starts at the depth of its deeper child sorter.
+        """
+        if N < 2:
             return 0
+        low = np.zeros(1, dtype=np.int64)
+        size = np.full(1, N, dtype=np.int64)
+        asc = np.ones(1, dtype=np.bool_)
+        merge_low, merge_size, merge_asc = [], [], []
+        while size.size:
+            merge_low.append(low)
+            merge_size.append(size)
+            merge_asc.append(asc)
+            middle = size // 2
+            low = np.concatenate((low, low + middle))
+            size = np.concatenate((middle, size - middle))
+            asc = np.concatenate((~asc, asc))
+            keep = size > 1
+            low, size, asc = low[keep], size[keep], asc[keep]
 
-    def bitonicMerge(self, network, low_bound, N, depth, asc=True):
-        if N > 1:
-            # middle = math.floor(math.log2(N))
+        merge_low = np.concatenate(merge_low)
+        merge_size = np.concatenate(merge_size)
+        merge_asc = np.concatenate(merge_asc)
+        # Nodes on the same level may differ by one in size and therefore in
+        # depth. Only a handful of distinct sizes exist.
+        sizes, inverse = np.unique(merge_size, return_inverse=True)
+        start_depth = np.array(
+            [self.sort_depth(int(n - n // 2)) for n in sizes], dtype=np.int64
+        )[inverse]
+        self.bitonicMerge(network, merge_low, merge_size, start_depth, merge_asc)
+        return self.sort_depth(N)
+
+    def bitonicMerge(self, network, low_bound, N, depth, asc):
+        """Places the CS of all given bitonic mergers into the network.
+        Parameters are arrays describing one merger per element. Mergers
+        are processed breadth first, with all sub-mergers of one level being
+        placed at once.
+        """
+        while N.size:
             middle = self.max_pow2_less_N(N)
-            # print("BMerge:", low_bound, N, depth)
-            for i in range(low_bound, low_bound + N - middle):
-                if asc:
-                    network[depth][i] = i + middle
-                    network[depth][i + middle] = i
-                else:
-                    network[depth][i] = -1 * (i + middle)
-                    network[depth][i + middle] = -1 * i
-                network.ff_layers[0][depth][i] = False
-                network.ff_layers[0][depth][i + middle] = False
-            # print(
-            #     "\tCalling BMerge({},{},{},{})".format(
-            #         low_bound, middle, depth + 1, asc
-            #     )
-            # )
-            d1 = self.bitonicMerge(network, low_bound, middle, depth + 1, asc)
-            # print(
-            #     "\tCalling BMerge({},{},{},{})".format(
-            #         low_bound + middle, N - middle, depth + 1, asc
-            #     )
-            # )
-            d2 = self.bitonicMerge(
-                network, low_bound + middle, N - middle, depth + 1, asc
-            )
+            # Expand each merger into the lower indices of its CS.
+            count = N - middle
+            offset = np.cumsum(count) - count
+            total = int(count.sum())
+            rank = np.arange(total, dtype=np.int64) - np.repeat(offset, count)
+            low = np.repeat(low_bound, count) + rank
+            high = low + np.repeat(middle, count)
+            stage = np.repeat(depth, count)
+            network.place_cs(stage, low, high, ~np.repeat(asc, count))
 
-            return max(d1, d2)
-        else:
-            return depth
+            low_bound = np.concatenate((low_bound, low_bound + middle))
+            N = np.concatenate((middle, N - middle))
+            depth = np.concatenate((depth, depth)) + 1
+            asc = np.concatenate((asc, asc))
+            keep = N > 1
+            low_bound, N = low_bound[keep], N[keep]
+            depth, asc = depth[keep], asc[keep]
 
     def reduce(self, network, N):
         return network
 
-    def create(self, N):
+    def create(self, N, network_type: type = Network):
         # Adaption of algorithm described at
         # https://courses.cs.duke.edu//fall08/cps196.1/Pthreads/bitonic.c
         logp = int(math.ceil((math.log2(N))))
         depth = logp * (logp + 1) // 2
-        network = Network(N, depth)
+        network = network_type(N, depth)
         network.algorithm = self.name
-        self.bitonicSort(network, 0, N, 0)
+        self.bitonicSort(network, N)
 
         # d = -1  # Current network depth index
         # #
@@ -478,6 +1064,49 @@ class Bitonic(Generator):
         return network
 
 
+ALGORITHMS = ["oddeven", "bitonic", "blank"]
+
+
+def get_generator(algorithm: str) -> Generator:
+    """Generator of the algorithm, one of ALGORITHMS. Blank networks are
+    handled by the base generator."""
+    algorithm = algorithm.lower()
+    if algorithm == "oddeven":
+        return OddEven()
+    if algorithm == "bitonic":
+        return Bitonic()
+    if algorithm == "blank":
+        return Generator()
+    raise ValueError("Options: {}".format(", ".join(ALGORITHMS)))
+
+
+def build_network(
+    N: int,
+    algorithm: str,
+    stagewise: bool = False,
+    fanout: int = 0,
+    network_type: type = Network,
+):
+    """Generate the network of algorithm with N inputs. Odd-Even networks are
+    created for the next power of two and reduced to N, blank networks only
+    consist of delaying elements. Optionally, the signal distribution is made
+    stagewise and START is distributed with the given maximum fanout.
+    """
+    generator = get_generator(algorithm)
+    logp = int(math.ceil(math.log2(N)))
+    if algorithm.lower() == "oddeven":
+        network = generator.reduce(generator.create(2**logp, network_type), N)
+    elif algorithm.lower() == "bitonic":
+        network = generator.reduce(generator.create(N, network_type), N)
+    else:
+        network = network_type(N, logp * (logp + 1) // 2)
+    if stagewise:
+        network = generator.make_stagewise(network)
+    if fanout:
+        network = generator.distribute_signal(network, "START", fanout)
+    return network
+
+
 # Elpy shenanigans
 cond = __name__ == "__main__"
 if cond:
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import tempfile
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from scripts.vhdl import VHDLEntity, VHDLTemplate, parseVHDLEntity, parseVHDLTemplate
+
+# Declaration of an entity at the start of a line. VHDL is case-insensitive.
+ENTITY_DECLARATION = re.compile(
+    rb"^[ \t]*entity\s+(\w+)\s+is\b", re.M | re.IGNORECASE
+)
+
+PARSERS = {"entity": parseVHDLEntity, "template": parseVHDLTemplate}
+
+# Incremented whenever the parsers produce different results, which
+# invalidates all entries.
+PARSER_VERSION = 3
+
+
+def entity_to_dict(entity: VHDLEntity) -> dict:
+    a = {"name": entity.name, "ports": entity.ports, "generics": entity.generics}
+    if isinstance(entity, VHDLTemplate):
+        a["template_string"] = entity.template_string
+        a["tokens"] = entity.tokens
+    return a
+
+
+def entity_from_dict(a: dict) -> VHDLEntity:
+    if "template_string" in a:
+        # Same argument order as in parseVHDLTemplate.
+        return VHDLTemplate(
+            a["name"], a["template_string"], a["ports"], a["generics"], a["tokens"]
+        )
+    return VHDLEntity(a["name"], a["ports"], a["generics"])
+
+
+class ParseCache:
+    """Cache of parsed VHDL entities and templates on disk. Entries are keyed
+    by the path of the source file and only valid as long as its modification
+    time and size are unchanged, so only changed files are parsed again.
+    Files which could not be parsed are cached as well.
+    """
+
+    def __init__(self, path: Path = Path("build/.parsecache.json"), enabled=True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.entries = dict()
+        self.__dirty = False
+        if enabled:
+            try:
+                with open(self.path) as f:
+                    content = json.load(f)
+                if content.get("version") == PARSER_VERSION:
+                    self.entries = content["entries"]
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+
+    def lookup(self, path: Path, kind: str):
+        """Returns whether a valid entry of the file exists and the entity or
+        template stored in it."""
+        if not self.enabled:
+            return False, None
+        stat = path.stat()
+        entry = self.entries.get("{}:{}".format(kind, path))
+        if (
+            entry
+            and entry["mtime"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            if entry["entity"] is None:
+                return True, None
+            return True, entity_from_dict(entry["entity"])
+        return False, None
+
+    def store(self, path: Path, kind: str, entity, stat: os.stat_result):
+        """Store the result of parsing the file, which had the given status
+        before it was parsed."""
+        if not self.enabled:
+            return
+        self.entries["{}:{}".format(kind, path)] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "entity": entity_to_dict(entity) if entity else None,
+        }
+        self.__dirty = True
+
+    def __parse(self, path: Path, kind: str):
+        """Returns the cached result of parsing path or parses it."""
+        found, entity = self.lookup(path, kind)
+        if found:
+            return entity
+        stat = path.stat()
+        entity = PARSERS[kind](path)
+        self.store(path, kind, entity, stat)
+        return entity
+
+    def entity(self, path: Path):
+        """Parsed entity of the file at path or None, see parseVHDLEntity."""
+        return self.__parse(Path(path), "entity")
+
+    def template(self, path: Path):
+        """Parsed template of the file at path or None, see parseVHDLTemplate."""
+        return self.__parse(Path(path), "template")
+
+    def save(self):
+        """Write the cache if entries changed. Entries of removed files are
+        dropped."""
+        if not self.enabled or not self.__dirty:
+            return
+        entries = {
+            key: entry
+            for key, entry in self.entries.items()
+            if Path(key.split(":", 1)[1]).exists()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see
+        # partial content.
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": PARSER_VERSION, "entries": entries}, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.__dirty = False
+
+
+def _parse_file(task):
+    kind, path = task
+    start = time.perf_counter()
+    parsed = PARSERS[kind](path)
+    return parsed, time.perf_counter() - start
+
+
+def parse_files(
+    paths: list[Path], kind: str, cache: ParseCache, processes: int = 1
+) -> tuple[list, dict[Path, float]]:
+    """Parse files as "entity" or "template", distributed over the given
+    number of processes. Files with a valid entry in cache are not parsed
+    again, results of the others are stored in it.
+
+    Returns:
+        parsed : list
+            Entity, template or None for each path, in the order of paths.
+        timings : dict[Path, float]
+            Seconds spent parsing each file which was not cached.
+    """
+    paths = [Path(path) for path in paths]
+    parsed = [None] * len(paths)
+    misses = []
+    for i, path in enumerate(paths):
+        found, parsed[i] = cache.lookup(path, kind)
+        if not found:
+            misses.append((i, path.stat()))
+    tasks = [(kind, paths[i]) for i, stat in misses]
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_parse_file, tasks, chunksize=8))
+    else:
+        results = [_parse_file(task) for task in tasks]
+    timings = dict()
+    for (i, stat), (entity, seconds) in zip(misses, results):
+        parsed[i] = entity
+        timings[paths[i]] = seconds
+        cache.store(paths[i], kind, entity, stat)
+    cache.save()
+    return parsed, timings
+
+
+def timing_summary(timings: dict[Path, float], num_files: int, top: int = 5) -> str:
+    """Summary of the parse times returned by parse_files, listing the top
+    slowest files."""
+    a = "Parsed {} of {} files in {:.3f}s".format(
+        len(timings), num_files, sum(timings.values())
+    )
+    a += ", {} from cache.".format(num_files - len(timings))
+    slowest = sorted(timings.items(), key=lambda item: -item[1])[:top]
+    for path, seconds in slowest:
+        a += "\n  {:8.4f}s {}".format(seconds, path)
+    return a
+
+
+def index_entities(path: Path) -> dict[str, Path]:
+    """Name of the first entity declared in each VHDL file below path, found
+    without parsing the files."""
+    index = dict()
+    for source in Path(path).glob("./**/*.vhd"):
+        with open(source, "rb") as f:
+            match = ENTITY_DECLARATION.search(f.read())
+        if match:
+            index[match.group(1).decode()] = source
+    return index
+
+
+def index_templates(path: Path) -> dict[str, Path]:
+    """Templates are named after their file."""
+    return {source.name: source for source in Path(path).glob("./**/*.vhd")}
+
+
+class LazyVHDLDict(Mapping):
+    """Read-only mapping of names to the entities or templates of an index.
+    Files are parsed on first access of their name, results are memoized and
+    stored in the parse cache, which has to be saved by the owner. Names of
+    files which cannot be parsed are treated as missing.
+
+    Parameters:
+        index: dict[str, Path]
+            Files by entity or template name, see index_entities and
+            index_templates.
+        kind: str
+            Parse files as "entity" or "template".
+        cache: ParseCache
+            Cache of parsed files.
+    """
+
+    def __init__(self, index: dict[str, Path], kind: str, cache: ParseCache):
+        self.index = index
+        self.kind = kind
+        self.cache = cache
+        self.__parsed = dict()
+
+    def __getitem__(self, name: str):
+        if name not in self.__parsed:
+            path = self.index[name]
+            if self.kind == "template":
+                parsed = self.cache.template(path)
+                if parsed:
+                    parsed.name = name
+            else:
+                parsed = self.cache.entity(path)
+            self.__parsed[name] = parsed
+        if self.__parsed[name] is None:
+            raise KeyError(name)
+        return self.__parsed[name]
+
+    def __iter__(self):
+        return (name for name in list(self.index) if name in self)
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+    def parse_all(self, processes: int = 1) -> dict[Path, float]:
+        """Parse all files of the index not parsed so far, distributed over
+        the given number of processes. Returns the timings of parse_files."""
+        names = [name for name in self.index if name not in self.__parsed]
+        parsed, timings = parse_files(
+            [self.index[name] for name in names], self.kind, self.cache, processes
+        )
+        for name, entity in zip(names, parsed):
+            if entity and self.kind == "template":
+                entity.name = name
+            self.__parsed[name] = entity
+        return timings
@@ -4,19 +4,15 @@ import numpy as np
 import pandas as pd
 import ast
 
+from scripts.model import bit_serial_ff, bit_serial_luts
+
 
 def figure_luts(df):
     title = "Network LUTs for Bit-Serial CS"
     print(title)
     x = np.arange(1, 2**15, 1)
-    # Fomulars based on Sorting networks on FPGAs, Mueller et al., 2012.
-    p = np.log2(x)
-    s = p * (p + 1.0) / 2.0
-    oe_cs = (p * p - p + 4) * np.power(2, p - 2) - 1
-    bitonic_cs = (p * p + p) * np.power(2, p - 2)
-    # LUTs based on implemenation data of bit-serial CS.
-    oe_luts = 2.0 * oe_cs
-    bitonic_luts = 2.0 * bitonic_cs
+    oe_luts = bit_serial_luts("oddeven", x)
+    bitonic_luts = bit_serial_luts("bitonic", x)
 
     fig = plt.figure()
     (p1,) = plt.plot(x, oe_luts, label="Odd-Even")
@@ -42,16 +38,8 @@ def figure_ff(df):
     title = "Network FFs for Bit-Serial CS"
     print(title)
     x = np.arange(1, 2**15, 1)
-    # Fomulars based on Sorting networks on FPGAs, Mueller et al., 2012.
-    p = np.log2(x)
-    # Number of stages s.
-    s = p * (p + 1.0) / 2.0
-    oe_cs = (p * p - p + 4) * np.power(2, p - 2) - 1
-    bitonic_cs = (p * p + p) * np.power(2, p - 2)
-    # Number of total FF is derived from the number of delaying FF in the
-    # network (s**2) + the number if FF added by the CS state-machine (2*CS).
-    oe_ff = s * s + 2.0 * oe_cs
-    bitonic_ff = s * s + 2.0 * bitonic_cs
+    oe_ff = bit_serial_ff("oddeven", x)
+    bitonic_ff = bit_serial_ff("bitonic", x)
 
     fig = plt.figure()
     (p1,) = plt.plot(x, oe_ff, label="Odd-Even")
@@ -155,16 +143,6 @@ def figure_avg_ff_lengths(df: pd.DataFrame):
 def figure_luts_single(df):
     title = "CS of Pruned Networks"
     print(title)
-    x = np.arange(1, 2**15, 1)
-    # Fomulars based on Sorting networks on FPGAs, Mueller et al., 2012.
-    p = np.log2(x)
-    s = p * (p + 1.0) / 2.0
-    oe_cs = (p * p - p + 4) * np.power(2, p - 2) - 1
-    bitonic_cs = (p * p + p) * np.power(2, p - 2)
-    # LUTs based on implemenation data of bit-serial CS.
-    oe_luts = 2.0 * oe_cs
-    bitonic_luts = 2.0 * bitonic_cs
-
     ax = df.pivot(columns="output_config", index="N", values=["num_cs"]).plot()
     plt.title(title)
     plt.xlabel("N")
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+import os
+import tempfile
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from scripts.network_generators import Network
 from scripts.resource_allocator import FFReplacement
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 class Report:
     def __init__(self, network: Network):
@@ -22,42 +30,38 @@ class Report:
         # Get number of CS and histograms of FF-chains and compare distances.
         depth = network.get_depth()
         N = network.get_N()
-        num_cs = 0
-        num_ff = 0
-        distance_hist = [0 for i in range(N)]
-        ff_hist = [0 for i in range(depth)]
+        index = np.arange(N)
+        distance_hist = np.zeros(N, dtype=np.int64)
+        ff_hist = np.zeros(depth + 1, dtype=np.int64)
+        # Length of the FF-chain (shift register) currently passing each wire.
+        chain = np.zeros(N, dtype=np.int64)
         for i in range(depth):
-            for j in range(N):
-                # Each out of order value constitutes a cs.
-                if network[i][j] > j:
-                    num_cs += 1
-                    distance_hist[network[i][j] - j] += 1
-        for j in range(N):
-            i = 0
-            while i < depth:
-                # If flag at that point is "+" or "-", a FF is present at that point.
-                if network.ff_layers[0][i][j]:
-                    bypass_beg = i
-                    bypass_end = i
-                    # How long does the FF-chain (shift register) go ?
-                    while bypass_end < depth and network.ff_layers[0][bypass_end][j]:
-                        bypass_end += 1
-                    bypass_end = bypass_end - 1
-                    num_ff += bypass_end - bypass_beg + 1
-                    ff_hist[bypass_end - bypass_beg] += 1
-                    i = bypass_end
-                i += 1
+            # Reverse CS are encoded by a negative partner index.
+            stage = np.abs(network[i])
+            # Each out of order value constitutes a cs.
+            is_cs = stage > index
+            distance_hist += np.bincount(stage[is_cs] - index[is_cs], minlength=N)
+            # If flag at that point is set, a FF is present at that point.
+            ff = network.get_ff_stage(0, i)
+            ended = (chain > 0) & ~ff
+            ff_hist += np.bincount(chain[ended], minlength=depth + 1)
+            chain = np.where(ff, chain + 1, 0)
+        ff_hist += np.bincount(chain[chain > 0], minlength=depth + 1)
+        num_cs = int(distance_hist.sum())
+        num_ff = int(np.dot(ff_hist, np.arange(depth + 1)))
+        # Histogram is indexed by chain length - 1.
+        ff_hist = ff_hist[1:]
 
         self.content["num_cs"] = num_cs
         self.content["distance_hist"] = dict()
         for i in range(N):
             if distance_hist[i]:
-                self.content["distance_hist"][i] = distance_hist[i]
+                self.content["distance_hist"][i] = int(distance_hist[i])
         self.content["num_ff"] = num_ff
         self.content["ff_hist"] = dict()
         for i in range(depth):
             if ff_hist[i]:
-                self.content["ff_hist"][i + 1] = ff_hist[i]
+                self.content["ff_hist"][i + 1] = int(ff_hist[i])
 
         self.content["ffreplacement"] = "None"
         self.content["num_replacements"] = 0
@@ -121,14 +125,28 @@ class Reporter:
         self.current_report.evaluate_ffreplacement(ffreplacement)
 
     def write_report(self, report_file=""):
-        if not self.reports.empty:
-            fpath = Path(report_file)
+        """Add the committed reports to report_file, replacing rows of the
+        same name. Concurrent writers, such as the jobs of a batch, are
+        serialized through a lock file next to it and the file is replaced
+        atomically, so no rows are lost."""
+        if self.reports.empty:
+            return
+        fpath = Path(report_file)
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        with open(fpath.with_name(fpath.name + ".lock"), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            reports = self.reports
             if fpath.exists():
                 reports = pd.read_csv(str(fpath), index_col="name")
                 reports = pd.concat(
-                    [reports[~reports.index.isin(
-                        self.reports.index)], self.reports]
+                    [reports[~reports.index.isin(self.reports.index)], self.reports]
                 )
-                reports.to_csv(report_file)
-            else:
-                self.reports.to_csv(report_file)
+            fd, tmp = tempfile.mkstemp(dir=fpath.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    reports.to_csv(f)
+                os.replace(tmp, fpath)
+            except BaseException:
+                os.unlink(tmp)
+                raise
@@ -23,6 +23,23 @@ def is_inbounds(nw, point):
     return False
 
 
+def count_ff(network: Network, layers: list[int]) -> np.ndarray:
+    """Number of FF at each point of the network in the given layers as depth
+    x N matrix. FF of the stream layer count bit_width times. The matrix is
+    filled stage by stage into storage allocated by the network, which keeps
+    it in a memory-mapped file for mapped networks."""
+    N = network.get_N()
+    depth = network.get_depth()
+    bit_width = network.signals["STREAM"].bit_width
+    counts = network.new_array((depth, N), np.int32)
+    for y in range(depth):
+        row = np.zeros(N, dtype=np.int32)
+        for z in layers:
+            row += network.get_ff_stage(z, y) * (bit_width if z == 0 else 1)
+        counts[y] = row
+    return counts
+
+
 @dataclass
 class FFAssignment:
     """Container marking position and range of FF assigned to replacement
@@ -141,13 +158,11 @@ class BlockAllocator(ResourceAllocator):
         """
 
         self.groups = []
-        # Create 2d matrix containing total number of FFs at a point.
-        self.ff_matrix = np.sum(network.ff_layers[1:], axis=0, dtype=np.int32)
-        # Stream layer is treated differently as bit_width has to be considered.
-        self.ff_matrix += network.ff_layers[0] * network.signals["STREAM"].bit_width
-
         N = network.get_N()
         depth = network.get_depth()
+        # Create 2d matrix containing total number of FFs at a point.
+        self.ff_matrix = count_ff(network, range(network.num_layers()))
+
         # print(N)
         # print(depth)
         # print(self.ff_matrix)
@@ -274,7 +289,7 @@ class BlockAllocator(ResourceAllocator):
 
         Parameters:
             network : Network
-                Network object containing 3d matrix ff_layers.
+                Network object containing the FF layers.
             block : Block
                 Block object containing geometry info.
             total_ff : int
@@ -350,11 +365,11 @@ class BlockAllocator(ResourceAllocator):
                 when the maximum number of FFs of the current group has been
                 reached but unassigned FFs at the point remain.
         """
-        for z in range(network.ff_layers.shape[0]):
+        for z in range(network.num_layers()):
             point = (x, y, z)
             ff_start = 0
             ff_end = 0
-            while ff_end < network.ff_layers[z, y, x]:
+            while ff_end < network.ff_at(point):
                 ff_at_point = 1
                 if z == 0:
                     # First layer is the permutation layer of variable data
@@ -413,7 +428,7 @@ class StageAllocator(ResourceAllocator):
         # Create 2d matrix containing total number of FFs at a point, excluding
         # all but the first stream layer due to stagewise allocation handling
         # the other layers differently.
-        self.ff_matrix = network.ff_layers[0] * network.signals["STREAM"].bit_width
+        self.ff_matrix = count_ff(network, [0])
         # Create list of ff per stage.
         ff_list = np.sum(self.ff_matrix, axis=1)
         # print(self.ff_matrix)
@@ -488,7 +503,7 @@ class StageAllocator(ResourceAllocator):
         point = (x, y, 0)
         ff_start = 0
         ff_end = 0
-        while ff_end < network.ff_layers[0, y, x]:
+        while ff_end < network.ff_at(point):
             ff_at_point = network.signals["STREAM"].bit_width
             # Find the current number of FF assigned to the group.
             cur_group_ff = sum([a.ff_range[1] - a.ff_range[0] for a in groups[grp_i]])
@@ -597,7 +612,8 @@ def print_layer(layer):
 
 
 def print_layers_with_ffgroups(network, groups):
-    for z, layer in enumerate(network.ff_layers):
+    for z in range(network.num_layers()):
+        layer = network.get_ff_layer(z)
         layer_name = ""
         for attrib in network.signals:
             if attrib.index == z:
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from scripts.network_generators import DistributionType, Network
+
+# Number of keys processed at once per chunk of rows.
+CHUNK_ELEMENTS = 1 << 22
+
+
+def apply_stages(stages, values: np.ndarray, larger=np.maximum, smaller=np.minimum):
+    """Apply CS of all stages in place. Row i of values holds the elements
+    at input i. The lower index of a CS receives the larger element unless
+    the CS is reversed.
+
+    Parameters:
+        stages: list
+            CS of each stage as returned by Network.get_comparators.
+        values: np.ndarray
+            N x batch array of elements.
+        larger, smaller:
+            Element-wise functions selecting the larger and smaller element.
+    """
+    for low, high, reverse in stages:
+        a = values[low]
+        b = values[high]
+        upper = larger(a, b)
+        lower = smaller(a, b)
+        if reverse.any():
+            r = reverse[:, np.newaxis]
+            values[low] = np.where(r, lower, upper)
+            values[high] = np.where(r, upper, lower)
+        else:
+            values[low] = upper
+            values[high] = lower
+    return values
+
+
+# Network shared with the worker processes.
+_stages = None
+_outputs = None
+
+
+def _init_worker(stages, outputs):
+    global _stages, _outputs
+    _stages = stages
+    _outputs = outputs
+
+
+def _run_chunk(chunk: np.ndarray) -> np.ndarray:
+    values = np.ascontiguousarray(chunk.T)
+    return apply_stages(_stages, values)[_outputs].T
+
+
+def simulate(
+    network: Network,
+    data: np.ndarray,
+    chunk_size: int = 0,
+    processes: int = 1,
+) -> np.ndarray:
+    """Pass rows of keys through the network, with larger keys moving to
+    lower indices. Rows are processed in chunks to bound the memory required,
+    optionally distributed over multiple processes.
+
+    Parameters:
+        network: Network
+            Network to simulate.
+        data: np.ndarray
+            batch x N array of keys.
+        chunk_size: int
+            Number of rows per chunk. Defaults to a chunk of about 4M keys.
+        processes: int
+            Number of processes the chunks are distributed on.
+
+    Returns:
+        outputs : np.ndarray
+            batch x M array holding the outputs of the output set of the
+            network in ascending index order.
+    """
+    data = np.asarray(data)
+    N = network.get_N()
+    if data.ndim != 2 or data.shape[1] != N:
+        raise ValueError(
+            "Expected data of shape (batch, {}), got {}.".format(N, data.shape)
+        )
+    stages = [network.get_comparators(y) for y in range(network.get_depth())]
+    outputs = np.array(sorted(network.get_output_set()), dtype=np.int64)
+    if not chunk_size:
+        chunk_size = max(1, CHUNK_ELEMENTS // max(1, N))
+    chunks = [data[i : i + chunk_size] for i in range(0, data.shape[0], chunk_size)]
+    if processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(stages, outputs),
+        ) as pool:
+            results = list(pool.map(_run_chunk, chunks))
+    else:
+        _init_worker(stages, outputs)
+        results = [_run_chunk(chunk) for chunk in chunks]
+        _init_worker(None, None)
+    if not results:
+        return np.empty((0, len(outputs)), dtype=data.dtype)
+    return np.concatenate(results)
+
+
+@dataclass
+class CycleReport:
+    """Timing and correctness of a cycle-level simulation."""
+
+    # Cycles from the START pulse of a set until the last subword of its
+    # outputs is available at the network outputs.
+    latency: int
+    # Cycles between consecutive sets, i.e. the number of subwords per word.
+    initiation_interval: int
+    num_sets: int = 0
+    # Number of sets with at least one wrong or undefined output.
+    num_errors: int = 0
+    # CS receiving their START pulse early or late as (x, y, offset) in cycles.
+    # The offset is None for CS without any START pulse.
+    misaligned_start: list[tuple[int, int, int]] = field(default_factory=list)
+    # Points (x, y) of the stream without CS or FF driving their output.
+    undriven: list[tuple[int, int]] = field(default_factory=list)
+    # Outputs whose value is undefined due to undriven points.
+    undefined_outputs: list[int] = field(default_factory=list)
+
+    def __str__(self):
+        a = "latency: {} cycles, initiation interval: {} cycles\n".format(
+            self.latency, self.initiation_interval
+        )
+        a += "{} of {} sets sorted correctly\n".format(
+            self.num_sets - self.num_errors, self.num_sets
+        )
+        a += "misaligned START: {} CS".format(len(self.misaligned_start))
+        if self.misaligned_start:
+            a += ", e.g. (x, y, offset) = {}".format(self.misaligned_start[0])
+        a += "\nundriven points: {}".format(len(self.undriven))
+        if self.undriven:
+            a += ", e.g. (x, y) = {}".format(self.undriven[0])
+        if self.undefined_outputs:
+            a += "\nundefined outputs: {}".format(self.undefined_outputs)
+        return a
+
+
+def distributor_sources(num_signals: int, max_fanout: int) -> dict[int, int]:
+    """Registers of the tree of a SIGNAL_DISTRIBUTOR with the given generics,
+    as map from the index of each register in the tree to the index of the
+    register driving it. Index 0 stands for the SOURCE_I input."""
+    B = max_fanout
+    S = math.ceil(math.log(num_signals) / math.log(B))
+    source_of = {}
+    for i in range(S):
+        for j in range(B**i + 1):
+            source_of[B**i + j] = (B**i - 1 + j) // B
+    return source_of
+
+
+def distributor_delays(num_signals: int, max_fanout: int):
+    """Delays of the replicas and the feedback of a SIGNAL_DISTRIBUTOR with
+    the given generics in cycles. Follows the tree construction of the VHDL
+    entity. Replicas never driven by the tree have a delay of None.
+
+    Returns:
+        replicas : list[int]
+            Delay of each replica.
+        feedback : int
+            Delay of the feedback output.
+    """
+    B = max_fanout
+    S = math.ceil(math.log(num_signals) / math.log(B))
+    source_of = distributor_sources(num_signals, max_fanout)
+
+    def delay(index):
+        if index not in source_of:
+            return None
+        if source_of[index] == 0:
+            return 1
+        d = delay(source_of[index])
+        return None if d is None else d + 1
+
+    first = B ** (S - 1)
+    return [delay(first + i) for i in range(num_signals)], delay(first)
+
+
+def start_delays(network: Network):
+    """Cycles after which the START pulse reaches the CS of each stage and
+    after which data enters the network, relative to the START input.
+
+    Returns:
+        delays : list[np.ndarray]
+            Delay of START at the lower index of each CS of a stage, -1 if the
+            START input of the CS is not driven.
+        data_delay : int
+            Delay of the first subword at the network input, given by the
+            START feedback the serializer waits for.
+    """
+    signal = network.signals["START"]
+    N = network.get_N()
+    depth = network.get_depth()
+    if signal.num_replications > 1:
+        replicas, feedback = distributor_delays(
+            signal.num_replications, max(signal.max_fanout, 2)
+        )
+    else:
+        replicas, feedback = [0], 0
+    replicas = np.array([-1 if d is None else d for d in replicas], dtype=np.int64)
+    fanout = max(signal.max_fanout, 1)
+
+    delays = []
+    # Delay of each replica at the input of the current stage.
+    chain = replicas.copy()
+    for y in range(depth):
+        low, high, reverse = network.get_comparators(y)
+        if signal.distribution == DistributionType.STAGEWISE_FLAT:
+            # Each stage entity registers all replicas.
+            per_cs = max(1, N // len(chain))
+            delays.append(chain[np.minimum(low // per_cs, len(chain) - 1)])
+            chain = np.where(chain < 0, -1, chain + 1)
+            continue
+        flags = network.get_ff_stage(signal.layer_index, y)
+        sources = np.flatnonzero(flags)
+        if len(sources) == 0:
+            delays.append(np.full(len(low), -1, dtype=np.int64))
+        else:
+            # Closest source, preferring the higher index on ties.
+            i = np.searchsorted(sources, low)
+            right = sources[np.minimum(i, len(sources) - 1)]
+            left = sources[np.maximum(i - 1, 0)]
+            nearest = np.where(np.abs(right - low) <= np.abs(low - left), right, left)
+            delays.append(chain[np.minimum(nearest // fanout, len(chain) - 1)])
+        # Registers of the control layer drive the replica at the next stage.
+        registered = np.zeros(len(chain), dtype=np.bool_)
+        registered[np.minimum(sources // fanout, len(chain) - 1)] = True
+        chain = np.where(registered & (chain >= 0), chain + 1, -1)
+    return delays, int(-1 if feedback is None else feedback)
+
+
+def swcs_swaps(a: np.ndarray, b: np.ndarray, phase: np.ndarray, P: int):
+    """Swap decisions of SWCS elements over a window of cycles. After a START
+    pulse, the FSM of a SWCS compares subwords until they differ and keeps
+    that decision until the next pulse. The state at a cycle is therefore the
+    comparison at the first differing subword since the last pulse.
+
+    Parameters:
+        a, b: np.ndarray
+            lanes x C x T subwords at the inputs of C CS over T cycles.
+        phase: np.ndarray
+            Cycle modulo P of the START pulses of each CS, -1 if the CS does
+            not receive any pulse.
+        P: int
+            Period of the START pulses.
+
+    Returns:
+        swap : np.ndarray
+            lanes x C x T flags, set where the CS outputs b at A_O.
+    """
+    lanes, C, T = a.shape
+    swap = np.empty(a.shape, dtype=np.bool_)
+    for p in np.unique(phase):
+        cs = np.flatnonzero(phase == p)
+        # Pad the window with equal subwords such that pulses fall on
+        # multiples of the period. Leading padding does not change the
+        # decision, as the FSM starts out equal at cycle 0.
+        period = T if p < 0 else P
+        pad = 0 if p < 0 else (P - p) % P
+        total = -(-(pad + T) // period) * period
+        a_p = np.zeros((lanes, len(cs), total), dtype=a.dtype)
+        b_p = np.zeros((lanes, len(cs), total), dtype=b.dtype)
+        a_p[..., pad : pad + T] = a[:, cs]
+        b_p[..., pad : pad + T] = b[:, cs]
+        a_p = a_p.reshape(lanes, len(cs), -1, period)
+        b_p = b_p.reshape(lanes, len(cs), -1, period)
+        first = np.argmax(a_p != b_p, axis=-1)[..., np.newaxis]
+        lesser = np.take_along_axis(a_p, first, axis=-1) < np.take_along_axis(
+            b_p, first, axis=-1
+        )
+        decided = np.arange(period) >= first
+        swap[:, cs] = (lesser & decided).reshape(lanes, len(cs), total)[
+            ..., pad : pad + T
+        ]
+    return swap
+
+
+def serialize(words: np.ndarray, W: int, SW: int) -> np.ndarray:
+    """Split W-bit words into subwords of SW bits, most significant first.
+    Words not divisible by SW are padded with zeros at the end."""
+    P = -(-W // SW)
+    shifted = words.astype(np.uint64) << np.uint64(P * SW - W)
+    mask = np.uint64((1 << SW) - 1)
+    subwords = [(shifted >> np.uint64(SW * (P - 1 - p))) & mask for p in range(P)]
+    return np.stack(subwords, axis=-1)
+
+
+def deserialize(subwords: np.ndarray, W: int, SW: int) -> np.ndarray:
+    P = subwords.shape[-1]
+    words = np.zeros(subwords.shape[:-1], dtype=np.uint64)
+    for p in range(P):
+        words = (words << np.uint64(SW)) | subwords[..., p].astype(np.uint64)
+    return words >> np.uint64(P * SW - W)
+
+
+def simulate_cycles(
+    network: Network, data: np.ndarray, W: int = 8, sets_per_lane: int = 4
+) -> CycleReport:
+    """Simulate the generated sorter at cycle level. Words are serialized
+    into subwords of SW bits processed by SWCS elements, which lock their
+    swap decision at the first differing subword after their START pulse.
+    Delay FF, the START distribution through the signal distributor and its
+    control layer registers are derived from the network. ENABLE is assumed
+    to be set and FF replacements behave like the FF they replace.
+
+    Sets of inputs are fed back-to-back into independent pipelines (lanes)
+    of sets_per_lane sets each, which are simulated at once.
+
+    Parameters:
+        network: Network
+            Network to simulate.
+        data: np.ndarray
+            num_sets x N array of W-bit keys.
+        W: int
+            Width of the keys in bits.
+        sets_per_lane: int
+            Number of consecutive sets per lane.
+
+    Returns:
+        report : CycleReport
+    """
+    data = np.asarray(data)
+    N = network.get_N()
+    depth = network.get_depth()
+    SW = network.signals["STREAM"].bit_width
+    P = -(-W // SW)
+    num_sets = data.shape[0]
+    lanes = -(-num_sets // sets_per_lane)
+    # Pad with repetitions of the last set to fill all lanes.
+    padded = np.concatenate(
+        [data, np.repeat(data[-1:], lanes * sets_per_lane - num_sets, axis=0)]
+    )
+    # Stream of each lane and input as window of the cycles carrying data.
+    # The window is shifted by one cycle per stage, following the data.
+    subwords = serialize(padded.reshape(lanes, sets_per_lane, N), W, SW)
+    T = sets_per_lane * P
+    stream = subwords.transpose(0, 2, 1, 3).reshape(lanes, N, T)
+    stream = stream.astype(np.min_scalar_type((1 << SW) - 1))
+    defined = np.ones(N, dtype=np.bool_)
+
+    delays, data_delay = start_delays(network)
+    report = CycleReport(latency=data_delay + depth + P - 1, initiation_interval=P)
+    report.num_sets = num_sets
+    for y in range(depth):
+        low, high, reverse = network.get_comparators(y)
+        # Offset of the START pulses against the first subword of each set.
+        offset = delays[y] - (data_delay + y)
+        for i in np.flatnonzero((offset != 0) | (delays[y] < 0)):
+            o = int(offset[i]) if delays[y][i] >= 0 else None
+            report.misaligned_start.append((int(low[i]), y, o))
+        phase = np.where(delays[y] >= 0, offset % P, -1)
+
+        out = np.zeros_like(stream)
+        delay_ff = network.get_ff_stage(0, y).copy()
+        delay_ff[low] = False
+        delay_ff[high] = False
+        out[:, delay_ff] = stream[:, delay_ff]
+        driven = delay_ff.copy()
+        driven[low] = True
+        driven[high] = True
+        for x in np.flatnonzero(~driven):
+            report.undriven.append((int(x), y))
+        next_defined = defined & driven
+        next_defined[low] = defined[low] & defined[high]
+        next_defined[high] = next_defined[low]
+        defined = next_defined
+
+        a = stream[:, low]
+        b = stream[:, high]
+        swap = swcs_swaps(a, b, phase, P)
+        upper = np.where(swap, b, a)
+        lower = np.where(swap, a, b)
+        r = reverse[np.newaxis, :, np.newaxis]
+        out[:, low] = np.where(r, lower, upper)
+        out[:, high] = np.where(r, upper, lower)
+        stream = out
+
+    outputs = np.array(sorted(network.get_output_set()), dtype=np.int64)
+    report.undefined_outputs = [int(o) for o in outputs if not defined[o]]
+    result = stream[:, outputs].reshape(lanes, len(outputs), sets_per_lane, P)
+    result = deserialize(result.transpose(0, 2, 1, 3), W, SW)
+    result = result.reshape(-1, len(outputs))[:num_sets]
+    expected = simulate(network, data).astype(np.uint64)
+    wrong = np.any(result != expected, axis=1)
+    if report.undefined_outputs:
+        wrong[:] = True
+    report.num_errors = int(np.count_nonzero(wrong))
+    return report
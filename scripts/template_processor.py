@@ -1,4 +1,7 @@
 #!/usr/bin/env python3
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
 
@@ -7,10 +10,53 @@ from scripts.network_generators import Network, NetworkSignal, DistributionType
 from scripts.resource_allocator import FFReplacement, FFAssignment
 
 
+def start_comment(block_title: str, len_line: int = 80) -> str:
+    """Comment block marking the start of a section of generated code."""
+    len_title = 4 + len(block_title)
+    return (
+        "-" * len_line
+        + "\n"
+        + "-- "
+        + block_title
+        + " "
+        + "-" * (len_title - len_line)
+        + "\n"
+        + "-" * len_line
+        + "\n"
+    )
+
+
+def end_comment(len_line: int = 80) -> str:
+    return "-" * len_line + "\n\n"
+
+
+# Number of FF flags read at once when registers are written column by
+# column.
+REG_BLOCK_POINTS = 1 << 22
+
+# Maximum number of blocks written by one os.writev call.
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+
 class VHDLTemplateWriter:
-    """Class encapsulating incremental writing the template to a file."""
+    """Class encapsulating incremental writing the template to a file.
+    Written blocks are collected in memory and written to the file in chunks
+    once flush_threshold characters are pending, optionally with a single
+    os.writev call per chunk instead of joining the blocks first. The file is
+    opened once by write_preamble or write_tokens and closed by close, which
+    is called on leaving the writer as context manager.
+    """
 
-    def __init__(self, template: VHDLTemplate, output_file: Path):
+    def __init__(
+        self,
+        template: VHDLTemplate,
+        output_file: Path,
+        flush_threshold: int = 1 << 20,
+        writev: bool = False,
+    ):
         self.template = template
         self.output_file = output_file
         self.output_fd = None
@@ -19,10 +65,66 @@ class VHDLTemplateWriter:
         self.footer = ""
         self.footer_written = False
         self.len_line = 80
-
-    def __del__(self):
-        if self.output_fd:
-            self.output_fd.close()
+        self.flush_threshold = flush_threshold
+        self.writev = writev and hasattr(os, "writev")
+        self.__buffer = []
+        self.__buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __open(self):
+        if self.output_fd is None:
+            self.output_fd = self.output_file.open("wb", buffering=0)
+
+    def __write_all(self, data: bytes):
+        """Write data to the file, repeating partial writes."""
+        view = memoryview(data)
+        while view:
+            view = view[self.output_fd.write(view) :]
+
+    def __writev_all(self, blocks: list[bytes]):
+        """Write blocks with os.writev, at most IOV_MAX blocks at a time,
+        repeating partial writes."""
+        fd = self.output_fd.fileno()
+        blocks = [memoryview(b) for b in blocks if b]
+        i = 0
+        while i < len(blocks):
+            written = os.writev(fd, blocks[i : i + IOV_MAX])
+            while i < len(blocks) and written >= len(blocks[i]):
+                written -= len(blocks[i])
+                i += 1
+            if written:
+                blocks[i] = blocks[i][written:]
+
+    def flush(self):
+        """Write all pending blocks to the file."""
+        if not self.__buffer or self.output_fd is None:
+            return
+        if self.writev:
+            self.__writev_all([block.encode() for block in self.__buffer])
+        else:
+            self.__write_all("".join(self.__buffer).encode())
+        self.__buffer = []
+        self.__buffered = 0
+
+    def close(self):
+        """Flush pending blocks and close the file."""
+        if self.output_fd is not None:
+            try:
+                self.flush()
+            finally:
+                self.output_fd.close()
+                self.output_fd = None
+
+    def __append(self, block: str):
+        self.__buffer.append(block)
+        self.__buffered += len(block)
+        if self.__buffered >= self.flush_threshold:
+            self.flush()
 
     def write_preamble(self, tokens: dict[str, str]) -> bool:
         """Write template preamble consisting of the tokens for generics and other
@@ -37,12 +139,15 @@ class VHDLTemplateWriter:
                 True if writing was successful.
         """
         self.template.tokens = tokens
-        template_string = self.template.as_template()
-        preamble, self.footer = template_string.split("{body}")
-        with self.output_file.open("w") as file:
-            num_char = file.write(preamble)
-            if num_char != len(preamble):
-                return False
+        # Everything behind the body is written by write_footer.
+        body = self.template.slot_index("body")
+        if body is None:
+            body = len(self.template.slots)
+        else:
+            self.footer = "".join(self.template.chunks(tokens, body + 1))
+        self.__open()
+        for chunk in self.template.chunks(tokens, 0, body):
+            self.__append(chunk)
         self.preamble_written = True
         return self.preamble_written
 
@@ -58,23 +163,16 @@ class VHDLTemplateWriter:
                 True if writing was successful.
         """
         self.template.tokens = tokens
-        template_string = self.template.as_template()
-        with self.output_file.open("w") as file:
-            num_char = file.write(template_string)
-            if num_char != len(template_string):
-                return False
+        self.__open()
+        for chunk in self.template.chunks(tokens):
+            self.__append(chunk)
         return True
 
     def write_start_comment(self, block_title: str):
-        len_title = 4 + len(block_title)
-        self.write_incremental("-" * self.len_line + "\n")
-        self.write_incremental(
-            "-- " + block_title + " " + "-" * (len_title - self.len_line) + "\n"
-        )
-        self.write_incremental("-" * self.len_line + "\n")
+        self.write_incremental(start_comment(block_title, self.len_line))
 
     def write_end_comment(self):
-        self.write_incremental("-" * self.len_line + "\n\n")
+        self.write_incremental(end_comment(self.len_line))
 
     def write_incremental(self, vhdl_block: str) -> bool:
         """Write a block of vhdl code to the output file at the position of
@@ -88,20 +186,30 @@ class VHDLTemplateWriter:
                 Signifies write success. Fails if preamble hasn't been written.
         """
         if self.preamble_written:
-            if not self.output_fd:
-                self.output_fd = self.output_file.open("a")
-            num_char = self.output_fd.write(vhdl_block)
-            if num_char == len(vhdl_block):
-                return True
+            self.__append(vhdl_block)
+            return True
         return False
 
+    def write_chunks(self, chunks) -> bool:
+        """Write the blocks of vhdl code yielded by chunks, e.g. one of the
+        emission stages of VHDLTemplateProcessor, as they are generated.
+
+        Returns
+            write_success: Bool
+                Signifies write success. Fails if preamble hasn't been written.
+        """
+        if not self.preamble_written:
+            return False
+        for chunk in chunks:
+            self.__append(chunk)
+        return True
+
     def write_footer(self) -> bool:
         """Writes footer to file and returns success."""
-        if self.output_fd:
-            num_char = self.output_fd.write(self.footer)
-            if num_char == len(self.footer):
-                self.footer_written = True
-                return True
+        if self.preamble_written:
+            self.__append(self.footer)
+            self.footer_written = True
+            return True
         return False
 
 
@@ -146,6 +254,27 @@ def __list_points_in_distance(
     return points
 
 
+# State shared with the worker processes of connect_cs_network.
+_cs_network = None
+
+
+def _init_cs_worker(processor_type, mdim_order, network, template, entities, tokens):
+    global _cs_network
+    # Workers generate code with a processor of their own, as the one of the
+    # parent holds the open writer.
+    processor = processor_type()
+    processor.mdim_order = mdim_order
+    _cs_network = (processor, network, template, entities, tokens)
+
+
+def _make_cs_stages(stages: range) -> str:
+    processor, network, template, entities, tokens = _cs_network
+    return "".join(
+        processor.make_cs_stage(network, template, entities, tokens, y)
+        for y in stages
+    )
+
+
 class VHDLTemplateProcessor:
     """Handles intepretation and code generation of sorting networks and writes
     generated code into file whose path is provided in init.
@@ -168,8 +297,7 @@ class VHDLTemplateProcessor:
     ) -> tuple[bool, tuple[int, int, int]]:
         """Find signal source point in network signal layers."""
         # Check whether the given point is in bounds of the network.
-        bounds = list(network.ff_layers.shape)
-        bounds.reverse()
+        bounds = [network.get_N(), network.get_depth(), network.num_layers()]
         for coord, bound in zip(point, bounds):
             if coord < 0 or coord >= bound:
                 return False, (-1, -1, -1)
@@ -194,43 +322,42 @@ class VHDLTemplateProcessor:
             return False, (-1, -1, -1)
         if assoc_signal.distribution == DistributionType.ONE_TO_ONE:
             # Signal source must come from the same point in the network.
-            if network.ff_layers[z, y, x]:
+            if network.ff_at(source_point):
                 return True, source_point
             return False, source_point
         if assoc_signal.distribution == DistributionType.PER_STAGE:
             # Find the closest source in the same stage.
-            if network.ff_layers[z, y, x]:
+            flags = network.get_ff_stage(z, y)
+            if flags[x]:
                 # Found source at point given. Nothing to do.
                 return True, source_point
             # Otherwise, search in the x-axis for a source, increasing
             # distance searched.
             dist = 1
-            while x - dist >= 0 or x + dist < network.ff_layers.shape[2]:
-                if x + dist < network.ff_layers.shape[2]:
-                    # print(x + dist, network.ff_layers[z, y, x + dist])
-                    if network.ff_layers[z, y, x + dist]:
+            while x - dist >= 0 or x + dist < flags.shape[0]:
+                if x + dist < flags.shape[0]:
+                    # print(x + dist, flags[x + dist])
+                    if flags[x + dist]:
                         return True, (x + dist, y, z)
                 if x - dist >= 0:
-                    # print(x - dist, network.ff_layers[z, y, x - dist])
-                    if network.ff_layers[z, y, x - dist]:
+                    # print(x - dist, flags[x - dist])
+                    if flags[x - dist]:
                         return True, (x - dist, y, z)
                 dist += 1
             return False, (-1, -1, -1)
 
         if assoc_signal.distribution == DistributionType.PER_LINE:
-            if network.ff_layers[z, y, x]:
+            if network.ff_at(source_point):
                 # Found source at point given. Nothing to do.
                 return True, source_point
             # Find the closest source in the same line.
             dist = 1
-            while y - dist >= 0 or y + dist < network.ff_layers.shape[2]:
-                if y + dist < network.ff_layers.shape[2]:
-                    # print(x + dist, network.ff_layers[z, y, x + dist])
-                    if network.ff_layers[z, y + dist, x]:
+            while y - dist >= 0 or y + dist < network.get_depth():
+                if y + dist < network.get_depth():
+                    if network.ff_at((x, y + dist, z)):
                         return True, (x, y + dist, z)
                 if y - dist >= 0:
-                    # print(x - dist, network.ff_layers[z, y, x - dist])
-                    if network.ff_layers[z, y - dist, x]:
+                    if network.ff_at((x, y - dist, z)):
                         return True, (x, y - dist, z)
                 dist += 1
             return False, (-1, -1, -1)
@@ -243,7 +370,7 @@ class VHDLTemplateProcessor:
             points = __list_points_in_distance((x, y), distance, bounds[:1])
             while points:
                 for p in points:
-                    if network.ff_layers[z, p[1], p[0]]:
+                    if network.ff_at((p[0], p[1], z)):
                         return True, source_point
                 distance += 1
                 points = __list_points_in_distance((x, y), distance, bounds[:1])
@@ -316,8 +443,8 @@ class VHDLTemplateProcessor:
             )
         return "open"
 
-    def __get_permutation_layer_definitions(self, network: Network, **kwargs) -> str:
-        """Generates code containing signal definition for the signal array
+    def __get_permutation_layer_definitions(self, network: Network, **kwargs):
+        """Yields code containing signal definition for the signal array
         based on which the sorting network is created.
         """
         # Constants defined in the beginning of the entity architecture are used
@@ -351,21 +478,20 @@ class VHDLTemplateProcessor:
 """
 
         # return sdef.format_map(fmap)
-        return sdef
+        yield sdef
 
     def __get_control_layer_definitions(
         self, network: Network, reverse_dim=True, **kwargs
-    ) -> str:
-        """Generates code for the control signal definition as an array of
+    ):
+        """Yields code for the control signal definition as an array of
         (replicated) an delayed registers.
         """
-        def_str = ""
         for signal in network.signals.values():
             if signal.name == "STREAM":
                 # Data array creation is handled in another function.
                 continue
             if signal.distribution == DistributionType.GLOBAL:
-                def_str += "signal {}_global : std_logic;\n".format(signal.name.lower())
+                yield "signal {}_global : std_logic;\n".format(signal.name.lower())
             else:
                 x = signal.num_replications - 1
                 y = network.get_depth()
@@ -375,10 +501,9 @@ class VHDLTemplateProcessor:
                     "mx": mx,
                     "my": my,
                 }
-                def_str += "signal {signal_name}_array : SLVArray(0 to {mx})(0 to {my});\n".format_map(
+                yield "signal {signal_name}_array : SLVArray(0 to {mx})(0 to {my});\n".format_map(
                     fmap
                 )
-        return def_str
 
     def get_signal_definitions(
         self, network: Network, entities: dict[str, VHDLEntity], **kwargs
@@ -394,75 +519,76 @@ class VHDLTemplateProcessor:
             signal_definitions : str
                 VHDL code containing all relevant signal definitions.
         """
-        signal_definitions = self.__get_permutation_layer_definitions(network, **kwargs)
-        signal_definitions += self.__get_control_layer_definitions(network, **kwargs)
-        return signal_definitions
+        # Definitions are a token of the preamble, their size does not depend
+        # on the number of inputs.
+        return "".join(
+            [
+                *self.__get_permutation_layer_definitions(network, **kwargs),
+                *self.__get_control_layer_definitions(network, **kwargs),
+            ]
+        )
 
     def make_io_assignments(self, network, template):
-        """Generates code connecting module inputs and outputs to
+        """Yields code connecting module inputs and outputs to
         appropriate internal signals.
         """
+        input_ports = [
+            port.split("_")[0] for port in template.ports if port.split("_")[1] == "I"
+        ]
+        output_ports = [
+            port.split("_")[0] for port in template.ports if port.split("_")[1] == "O"
+        ]
+        yield start_comment("Generated mx/O Assignments")
         # Handle data io from an to the permutation layer first
-        inputs = "\n"
-        outputs = "\n"
+        yield "\n"
         if self.mdim_order == (1, 0, 2):
-            inputs += "stream_array(0) <= STREAM_I;\n"
-            outputs += "STREAM_O <= stream_array({0});\n".format(network.get_depth())
+            yield "stream_array(0) <= STREAM_I;\n"
         else:
             for x in range(network.get_N()):
                 y = 0
                 mx, my = self.__map_dim([x, y])
-                inputs += "stream_array({1})({2}) <= STREAM_I({0});\n".format(x, mx, my)
-            for entry in network.output_set:
-                x = entry
-                y = network.get_depth()
-                mx, my = self.__map_dim([x, y])
-                outputs += "STREAM_O({0}) <= stream_array({1})({2});\n".format(
-                    x, mx, my
-                )
-
-        # Handle output of control signals
+                yield "stream_array({1})({2}) <= STREAM_I({0});\n".format(x, mx, my)
+        # Handle input of control signals
         for signal in network.signals.values():
-            input_ports = [
-                port.split("_")[0]
-                for port in template.ports
-                if port.split("_")[1] == "I"
-            ]
             if signal.name.upper() in input_ports:
                 if signal.distribution == DistributionType.GLOBAL:
                     # Other types of signals should be handled in
                     # make_signal_replicators.
-                    inputs += "{sname}_global <= {pname}_I;\n".format(
+                    yield "{sname}_global <= {pname}_I;\n".format(
                         sname=signal.name.lower(), pname=signal.name.upper()
                     )
-            output_ports = [
-                port.split("_")[0]
-                for port in template.ports
-                if port.split("_")[1] == "O"
-            ]
+        yield "\n"
+        if self.mdim_order == (1, 0, 2):
+            yield "STREAM_O <= stream_array({0});\n".format(network.get_depth())
+        else:
+            for entry in network.output_set:
+                x = entry
+                y = network.get_depth()
+                mx, my = self.__map_dim([x, y])
+                yield "STREAM_O({0}) <= stream_array({1})({2});\n".format(x, mx, my)
+        # Handle output of control signals
+        for signal in network.signals.values():
             if signal.name.upper() in output_ports:
                 for x in range(signal.num_replications):
                     y = network.get_depth()
                     mx, my = self.__map_dim([x, y])
-                    outputs += "{pname}_O({x}) <= {name}_array({mx})({my});\n".format(
+                    yield "{pname}_O({x}) <= {name}_array({mx})({my});\n".format(
                         pname=signal.name.upper(),
                         name=signal.name.lower(),
                         x=x,
                         mx=mx,
                         my=my,
                     )
-        self.writer.write_start_comment("Generated mx/O Assignments")
-        self.writer.write_incremental(inputs + outputs)
-        self.writer.write_end_comment()
+        yield end_comment()
 
     def instantiate_signal_distributors(
         self, network: Network, template: VHDLTemplate, entities: dict[str, VHDLEntity]
     ):
-        """Generates code instantiating signal distributor modules and connects
+        """Yields code instantiating signal distributor modules and connects
         them to designated control signal inputs and control signal arrays.
         """
         entity = entities["Signal_Distributor"]
-        self.writer.write_start_comment("Generated Signal Distribution")
+        yield start_comment("Generated Signal Distribution")
         for signal in network.signals.values():
             if signal.is_replicated:
                 if signal.num_replications > 1:
@@ -476,38 +602,42 @@ class VHDLTemplateProcessor:
                     }
                     ports["SOURCE_I"] = signal.name.upper() + "_I"
                     ports["FEEDBACK_O"] = signal.name.upper() + "_FEEDBACK_O"
-                    for x in range(signal.num_replications):
-                        y = 0
-                        mx, my = self.__map_dim([x, y])
-                        ports[
-                            "REPLIC_O({})".format(x)
-                        ] = "{signal_name}_array({mx})({my})".format(
-                            mx=mx, my=my, signal_name=signal.name.lower()
-                        )
                     for port in ports:
                         if not ports[port]:
                             ports[port] = self.map_signal(
                                 network, template, port, (0, 0)
                             )
-                    self.writer.write_incremental(
-                        entity.as_instance_manual(
-                            signal.name + "_repl", generics, ports
-                        )
+                    yield from entity.iter_instance_manual(
+                        signal.name + "_repl",
+                        generics,
+                        itertools.chain(
+                            ports.items(), self.__replica_ports(signal)
+                        ),
                     )
                 else:
-                    self.writer.write_incremental(
+                    yield (
                         signal.name.lower()
                         + "_array(0)(0) <="
                         + signal.name.upper()
                         + "_I;\n"
                     )
-                    self.writer.write_incremental(
+                    yield (
                         signal.name.upper()
                         + "_FEEDBACK_O <="
                         + signal.name.upper()
                         + "_I;\n"
                     )
-        self.writer.write_end_comment()
+        yield end_comment()
+
+    def __replica_ports(self, signal: NetworkSignal):
+        """Yields the assignments of the outputs of the signal distributor of
+        signal to its control signal array."""
+        for x in range(signal.num_replications):
+            y = 0
+            mx, my = self.__map_dim([x, y])
+            yield "REPLIC_O({})".format(x), "{signal_name}_array({mx})({my})".format(
+                mx=mx, my=my, signal_name=signal.name.lower()
+            )
 
     def __make_cs(
         self,
@@ -515,16 +645,15 @@ class VHDLTemplateProcessor:
         template: VHDLTemplate,
         entities: dict[str, VHDLEntity],
         tokens: dict[str, str],
+        stage: np.ndarray,
         x: int,
         y: int,
     ):
         """Creates CS instance in the network at the point provided. Specific
         CS implementation is provided through the entities dict with port
         mapping and generics derived from the network and the tokens dictionary
-        respectively. Instantiation string is written to file through the
-        writer object.
+        respectively. stage is network[y]. Returns the instantiation code.
         """
-        stage = network.pmatrix[y]
         instance_name = "CS_STAGE{stage}_{a}_TO_{b}".format(
             stage=y, a=x, b=abs(stage[x])
         )
@@ -565,7 +694,28 @@ class VHDLTemplateProcessor:
                     network, template, signal_name.upper(), (x, y)
                 )
 
-        self.writer.write_incremental(cs.as_instance(instance_name, generics, ports))
+        return cs.as_instance(instance_name, generics, ports)
+
+    def make_cs_stage(
+        self,
+        network: Network,
+        template: VHDLTemplate,
+        entities: dict[str, VHDLEntity],
+        tokens: dict[str, str],
+        y: int,
+    ) -> str:
+        """Returns the code of __make_cs for each CS of stage y."""
+        # The value at each index in the stage represents the index
+        # with which the current index has to be compared to.
+        # A CS is only placed when index and value differ.
+        # As a CS handles two indices, only place an element at the
+        # lower index.
+        stage = network[y]
+        low, high, reverse = network.get_comparators(y)
+        return "".join(
+            self.__make_cs(network, template, entities, tokens, stage, int(x), y)
+            for x in low
+        )
 
     def connect_cs_network(
         self,
@@ -573,36 +723,52 @@ class VHDLTemplateProcessor:
         template: VHDLTemplate,
         entities: dict[str, VHDLEntity],
         tokens: dict[str, str],
+        processes: int = 1,
     ):
-        """Iterates over permutation matrix and calls __make_cs for each point
-        containing un-ordered index.
+        """Iterates over the stages of the permutation matrix and yields the
+        code of make_cs_stage for each of them. With more than one process,
+        groups of consecutive stages are rendered in a process pool and
+        yielded in stage order.
         """
-        self.writer.write_start_comment("Generated CS Network")
-        for y in range(network.pmatrix.shape[0]):
-            stage = network.pmatrix[y]
-            for x in range(stage.shape[0]):
-                if abs(stage[x]) > x:
-                    # The value at each index in the stage represents the index
-                    # with which the current index has to be compared to.
-                    # A CS is only placed when index and value differ.
-                    # As a CS handles two indices, only place an element if
-                    # the value is greater than the index.
-                    self.__make_cs(network, template, entities, tokens, x, y)
-        self.writer.write_end_comment()
+        yield start_comment("Generated CS Network")
+        depth = network.get_depth()
+        if processes > 1 and depth > 1:
+            # A few groups per process balance stages of unequal size
+            # without sending each stage back separately.
+            size = -(-depth // (4 * processes))
+            groups = [range(y, min(y + size, depth)) for y in range(0, depth, size)]
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_cs_worker,
+                initargs=(
+                    type(self),
+                    self.mdim_order,
+                    network,
+                    template,
+                    entities,
+                    tokens,
+                ),
+            ) as pool:
+                yield from pool.map(_make_cs_stages, groups)
+        else:
+            for y in range(depth):
+                yield self.make_cs_stage(network, template, entities, tokens, y)
+        yield end_comment()
 
     def __instantiate_ff_replacements(
         self,
         network: Network,
         template: VHDLTemplate,
-        stream_layer_ff: np.ndarray,
+        replaced_ff: dict[tuple[int, int], int],
         ff_replacements: list[FFReplacement],
-    ) -> np.ndarray:
+    ):
         """Replaces points in the network which normally contain FF resources
         with a functionally equivalent replacement of (ideally) another
-        resource like DSPs or BRAMs. Generates code containing instantiations
-        of those replacements.
+        resource like DSPs or BRAMs. Yields code containing instantiations
+        of those replacements and returns the number of FF replaced at each
+        point once exhausted.
         """
-        self.writer.write_start_comment("Generated FF Replacements")
+        yield start_comment("Generated FF Replacements")
         for repl in ff_replacements:
             replacement_id = 0
             # Each group represents one instance of the replacement.
@@ -638,9 +804,9 @@ class VHDLTemplateProcessor:
                             ] = "stream_array({x})({y})({z})".format(
                                 x=mx, y=my + 1, z=mz
                             )
-                        stream_layer_ff[y][x] -= end - start
-                        if stream_layer_ff[y][x] == 0:
-                            network.ff_layers[z, y, x] = False
+                        replaced_ff[(x, y)] = replaced_ff.get((x, y), 0) + end - start
+                        if replaced_ff[(x, y)] == network.signals["STREAM"].bit_width:
+                            network.set_ff((x, y, z), False)
                     else:
                         signal = None
                         for s in network.signals.values():
@@ -654,7 +820,7 @@ class VHDLTemplateProcessor:
                                 )
                             )
                             continue
-                        mx, my, mz = self.__map_dim([x, y, z_i])
+                        mx, my, mz = self.__map_dim([x, y, z])
                         reg_ports_in[
                             "REG_I({})".format(reg_index)
                         ] = "{signal_name}_array({x})({y})".format(
@@ -669,7 +835,7 @@ class VHDLTemplateProcessor:
                             x=mx,
                             y=my + 1,
                         )
-                        network.ff_layers[z, y, x] = False
+                        network.set_ff((x, y, z), False)
                     reg_index += 1
                 # Done with assigning ports in this group.
 
@@ -687,23 +853,22 @@ class VHDLTemplateProcessor:
                 name = "REPL_" + str(replacement_id)
                 replacement_id += 1
                 generics = {"NUM_INPUTS": str(reg_index)}
-                self.writer.write_incremental(
-                    repl.entity.as_instance_manual(
-                        name, generics, ports | reg_ports_in | reg_ports_out
-                    )
+                yield repl.entity.as_instance_manual(
+                    name, generics, ports | reg_ports_in | reg_ports_out
                 )
-        self.writer.write_end_comment()
+        yield end_comment()
 
-        return stream_layer_ff
+        return replaced_ff
 
     def __process_reg_chains(
         self,
         network: Network,
-        stream_layer_ff: np.ndarray,
-        ff_chains: list[list[tuple[int, int, int]]],
+        replaced_ff: dict[tuple[int, int], int],
+        ff_chains,
     ):
-        """Create shift register chains in data flow direction using short notation.
+        """Yields shift register chains in data flow direction using short notation.
         Only works if dimension order is 1,0,2 (y,x,z) due to limitations of vhdl.
+        ff_chains yields the chains of each layer.
         """
         # Format string for register assignment with the following tokens:
         # signal_name: Name of the signal
@@ -722,15 +887,13 @@ class VHDLTemplateProcessor:
                 sw = network.signals["STREAM"].bit_width
                 for x, start, end in group:
                     for y in range(start, end):
-                        self.writer.write_incremental(
-                            reg_assign_sw.format(
-                                signal_name="stream",
-                                x=x,
-                                y_s=y,
-                                y_e=y + 1,
-                                sw_s=sw - stream_layer_ff[y][x],
-                                sw_e=sw - 1,
-                            )
+                        yield reg_assign_sw.format(
+                            signal_name="stream",
+                            x=x,
+                            y_s=y,
+                            y_e=y + 1,
+                            sw_s=replaced_ff.get((x, y), 0),
+                            sw_e=sw - 1,
                         )
             else:
                 signal = None
@@ -745,19 +908,17 @@ class VHDLTemplateProcessor:
                 max_fan_out = signal.max_fanout
                 for x, start, end in group:
                     # print(x, start, end)
-                    self.writer.write_incremental(
-                        reg_assign.format(
-                            signal_name=signal_name.lower(),
-                            x=x // max_fan_out,
-                            y_s=start,
-                            y_e=end,
-                        )
+                    yield reg_assign.format(
+                        signal_name=signal_name.lower(),
+                        x=x // max_fan_out,
+                        y_s=start,
+                        y_e=end,
                     )
 
     def __process_reg(
         self,
         network: Network,
-        stream_layer_ff: np.ndarray,
+        replaced_ff: dict[tuple[int, int], int],
         point: tuple[int, int],
     ):
         # Format string for register assignment in stream layer with the following tokens:
@@ -768,14 +929,12 @@ class VHDLTemplateProcessor:
         x, y, z = point
         if z == 0:
             sw = network.signals["STREAM"].bit_width
-            self.writer.write_incremental(
-                reg_assign_sw.format(
-                    signal_name="stream",
-                    x=x,
-                    y=y,
-                    sw_s=sw - stream_layer_ff[y][x],
-                    sw_e=sw - 1,
-                )
+            yield reg_assign_sw.format(
+                signal_name="stream",
+                x=x,
+                y=y,
+                sw_s=replaced_ff.get((x, y), 0),
+                sw_e=sw - 1,
             )
         else:
             signal = None
@@ -788,54 +947,79 @@ class VHDLTemplateProcessor:
                 return
             s = self.map_signal(network, signal.name, [x, y + 1]) + " <= "
             s += self.map_signal(network, signal.name, [x, y]) + ";"
-            self.writer.write_incremental(s)
+            yield s
+
+    def __find_reg_chains(self, network: Network, z: int):
+        """Find lateral register chains in layer z. Stages are scanned in
+        order while tracking the start of the chain passing each wire.
+
+        Yields:
+            chain : tuple[int, int, int]
+                Chains as (x, start, end) tuples ordered by x and start.
+        """
+        N = network.get_N()
+        start = np.zeros(N, dtype=np.int64)
+        active = np.zeros(N, dtype=np.bool_)
+        chains_x, chains_start, chains_end = [], [], []
+        for y in range(network.get_depth() + 1):
+            if y < network.get_depth():
+                flags = network.get_ff_stage(z, y)
+            else:
+                flags = np.zeros(N, dtype=np.bool_)
+            ended = np.flatnonzero(active & ~flags)
+            chains_x.append(ended)
+            chains_start.append(start[ended])
+            chains_end.append(np.full(ended.shape, y))
+            start[flags & ~active] = y
+            active = flags.copy()
+        chains_x = np.concatenate(chains_x)
+        chains_start = np.concatenate(chains_start)
+        chains_end = np.concatenate(chains_end)
+        order = np.lexsort((chains_start, chains_x))
+        for i in order:
+            yield int(chains_x[i]), int(chains_start[i]), int(chains_end[i])
 
     def __make_registers(
         self,
         network: Network,
-        stream_layer_ff: np.ndarray,
+        replaced_ff: dict[tuple[int, int], int],
         entities: dict[str, VHDLEntity],
     ):
-        self.writer.write_start_comment("Generated FF")
-        ff_chains: list[list[tuple[int, int, int]]] = []
-        self.writer.write_incremental(
-            """
+        yield start_comment("Generated FF")
+        yield """
 DelayRegister: process (CLK_I) is
 begin
 if (rising_edge(CLK_I)) then
 """
-        )
         if self.mdim_order == (0, 1, 2):
-            for z, layer in enumerate(network.ff_layers):
-                # Iterate over the layer stage wise.
-                ff_chains.append([])
-                # print(z)
-                for x in range(layer.shape[1]):
-                    start = 0
-                    end = 0
-                    # Find lateral register chains in the layer.
-                    # print(layer[0:-1, x])
-                    for y in range(layer.shape[0]):
-                        if layer[y, x]:
-                            if start == end:
-                                start = y
-                            end = y + 1
-                        elif start < end:
-                            ff_chains[z].append((x, start, end))
-                            start = end
-                    if start < end:
-                        ff_chains[z].append((x, start, end))
-            # print(ff_chains)
-            self.__process_reg_chains(network, stream_layer_ff, ff_chains)
+            # Chains are found layer by layer while they are written.
+            ff_chains = (
+                self.__find_reg_chains(network, z) for z in range(network.num_layers())
+            )
+            yield from self.__process_reg_chains(network, replaced_ff, ff_chains)
         else:
-            for z, layer in enumerate(network.ff_layers):
-                for x in range(layer.shape[1]):
-                    for y in range(layer.shape[0]):
-                        if layer[y, x]:
-                            self.__process_reg(network, stream_layer_ff, (x, y, z))
+            # Registers are written column by column. Columns are read in
+            # blocks instead of whole layers to bound the memory used for
+            # large networks.
+            N = network.get_N()
+            depth = network.get_depth()
+            block = max(1, REG_BLOCK_POINTS // max(depth, 1))
+            for z in range(network.num_layers()):
+                for x0 in range(0, N if depth else 0, block):
+                    columns = np.stack(
+                        [
+                            network.get_ff_stage(z, y)[x0 : x0 + block]
+                            for y in range(depth)
+                        ],
+                        axis=1,
+                    )
+                    for x, y in np.argwhere(columns):
+                        yield from self.__process_reg(
+                            network, replaced_ff, (x0 + int(x), int(y), z)
+                        )
 
-        self.writer.write_incremental("\nend if;\nend process;\n")
-        self.writer.write_end_comment()
+        yield "\nend if;\nend process;\n"
+        yield end_comment()
 
     def __handle_registers(
         self,
@@ -847,14 +1031,14 @@ if (rising_edge(CLK_I)) then
         # We need to keep track fo the assigned FFs in the permutation layer,
         # the only layer which contains potentially more than one FF.
         # Since the only information provided by the ff_layers is whether
-        # any FF are present at a point, a new matrix has to be created.
-        stream_layer_ff = np.zeros(network.ff_layers[0].shape, dtype=int)
-        stream_layer_ff = network.signals["STREAM"].bit_width * network.ff_layers[0]
+        # any FF are present at a point, the number of FF replaced at each
+        # point is tracked separately.
+        replaced_ff: dict[tuple[int, int], int] = {}
         if "ff_replacements" in kwargs:
-            stream_layer_ff = self.__instantiate_ff_replacements(
-                network, template, stream_layer_ff, kwargs["ff_replacements"]
+            replaced_ff = yield from self.__instantiate_ff_replacements(
+                network, template, replaced_ff, kwargs["ff_replacements"]
             )
-        self.__make_registers(network, stream_layer_ff, entities)
+        yield from self.__make_registers(network, replaced_ff, entities)
 
     def process_network_template(
         self,
@@ -867,7 +1051,6 @@ if (rising_edge(CLK_I)) then
     ):
         """Process the template of the sorting network. Collects tokens and
         handles instantiation and connectivity."""
-        self.writer = VHDLTemplateWriter(template, output_path)
         tokens = template.tokens
         tokens["top_name"] = top_name
         # tokens["top_name"] = "{}_{}X{}".format(
@@ -891,12 +1074,21 @@ if (rising_edge(CLK_I)) then
         tokens["signal_definitions"] = self.get_signal_definitions(
             network, entities, **kwargs
         )
-        self.writer.write_preamble(tokens)
-        self.instantiate_signal_distributors(network, template, entities)
-        self.make_io_assignments(network, template)
-        self.connect_cs_network(network, template, entities, tokens)
-        self.__handle_registers(network, template, entities, **kwargs)
-        self.writer.write_footer()
+        with VHDLTemplateWriter(template, output_path) as self.writer:
+            self.writer.write_preamble(tokens)
+            self.writer.write_chunks(
+                self.instantiate_signal_distributors(network, template, entities)
+            )
+            self.writer.write_chunks(self.make_io_assignments(network, template))
+            self.writer.write_chunks(
+                self.connect_cs_network(
+                    network, template, entities, tokens, kwargs.get("processes", 1)
+                )
+            )
+            self.writer.write_chunks(
+                self.__handle_registers(network, template, entities, **kwargs)
+            )
+            self.writer.write_footer()
         del self.writer
 
     def process_template(
@@ -909,7 +1101,6 @@ if (rising_edge(CLK_I)) then
     ):
         """Processes all other templates which build upon the sorting
         network."""
-        self.writer = VHDLTemplateWriter(template, output_path)
         tokens = template.tokens
         tokens["top_name"] = top_name
         tokens["num_inputs"] = str(network.get_N())
@@ -924,7 +1115,8 @@ if (rising_edge(CLK_I)) then
         for key in tokens.keys():
             if key.split("_")[0] == "num" and tokens[key] == "{" + key + "}":
                 tokens[key] = str(1)
-        self.writer.write_tokens(tokens)
+        with VHDLTemplateWriter(template, output_path) as self.writer:
+            self.writer.write_tokens(tokens)
         del self.writer
 
 
@@ -947,7 +1139,6 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
     ):
         """Process the template of the sorting network. Collects tokens and
         handles instantiation and connectivity."""
-        self.writer = VHDLTemplateWriter(template, output_path)
         tokens = template.tokens
         tokens["top_name"] = top_name
         tokens["num_inputs"] = str(network.get_N())
@@ -967,15 +1158,22 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
             network, entities, **kwargs
         )
 
-        self.writer.write_preamble(tokens)
-        self.instantiate_signal_distributors(network, template, entities)
-        self.make_io_assignments(network, template)
-        ff_replacements = []
-        if "ff_replacements" in kwargs:
-            ff_replacements = kwargs["ff_replacements"]
-        self.connect_cs_network(network, template, entities, tokens, ff_replacements)
-        # self.__handle_registers(network, template, entities, **kwargs)
-        self.writer.write_footer()
+        with VHDLTemplateWriter(template, output_path) as self.writer:
+            self.writer.write_preamble(tokens)
+            self.writer.write_chunks(
+                self.instantiate_signal_distributors(network, template, entities)
+            )
+            self.writer.write_chunks(self.make_io_assignments(network, template))
+            ff_replacements = []
+            if "ff_replacements" in kwargs:
+                ff_replacements = kwargs["ff_replacements"]
+            self.writer.write_chunks(
+                self.connect_cs_network(
+                    network, template, entities, tokens, ff_replacements
+                )
+            )
+            # self.__handle_registers(network, template, entities, **kwargs)
+            self.writer.write_footer()
         del self.writer
 
     def process_template(
@@ -988,7 +1186,6 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
     ):
         """Processes all other templates which build upon the sorting
         network."""
-        self.writer = VHDLTemplateWriter(template, output_path)
         tokens = template.tokens
         tokens["top_name"] = top_name
         tokens["num_inputs"] = str(network.get_N())
@@ -1003,7 +1200,8 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
         for key in tokens.keys():
             if key.split("_")[0] == "num" and tokens[key] == "{" + key + "}":
                 tokens[key] = str(1)
-        self.writer.write_tokens(tokens)
+        with VHDLTemplateWriter(template, output_path) as self.writer:
+            self.writer.write_tokens(tokens)
         del self.writer
 
     def __make_stage(
@@ -1016,10 +1214,11 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
         num_dsp: int,
         num_reg_per_dsp: int,
     ):
-        """Creates Stage instance in the network at the point provided."""
+        """Creates Stage instance in the network at the point provided and
+        returns its instantiation code."""
         instance_name = f"STAGE{y}".format(y)
 
-        stage = network.pmatrix[y]
+        stage = network[y]
         permutation = "(" + ", ".join([str(i) for i in stage]) + ")"
         generics = {
             "N": tokens["num_inputs"],
@@ -1057,7 +1256,7 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
                     network, template, signal_name.upper(), (0, y)
                 )
 
-        self.writer.write_incremental(stage.as_instance(instance_name, generics, ports))
+        return stage.as_instance(instance_name, generics, ports)
 
     def connect_cs_network(
         self,
@@ -1067,10 +1266,10 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
         tokens: dict[str, str],
         ff_replacements: list[FFReplacement],
     ):
-        """Iterates over permutation matrix and calls __make_cs for each point
-        containing un-ordered index.
+        """Iterates over permutation matrix and yields the code of __make_cs
+        for each point containing un-ordered index.
         """
-        self.writer.write_start_comment("Generated CS Network")
+        yield start_comment("Generated CS Network")
         # Compute how many FF-Replacements are assigned to each stage
         # Only FF replacements using DSPs are currently supported.
         dsp_repl = None
@@ -1090,8 +1289,8 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
                     ffassign = group[0]
                     numdsp_stagewise[ffassign.point[1]] += 1
 
-        for y in range(network.pmatrix.shape[0]):
-            self.__make_stage(
+        for y in range(network.get_depth()):
+            yield self.__make_stage(
                 network,
                 template,
                 entities,
@@ -1100,4 +1299,4 @@ class VHDLTemplateProcessorStagewise(VHDLTemplateProcessor):
                 numdsp_stagewise[y],
                 num_reg_per_dsp,
             )
-        self.writer.write_end_comment()
+        yield end_comment()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from scripts.network_generators import Network
+from scripts.simulator import apply_stages
+
+# Bit patterns of the six lowest input bits over the 64 test vectors of a word.
+LOW_PATTERNS = np.array(
+    [
+        0xAAAAAAAAAAAAAAAA,
+        0xCCCCCCCCCCCCCCCC,
+        0xF0F0F0F0F0F0F0F0,
+        0xFF00FF00FF00FF00,
+        0xFFFF0000FFFF0000,
+        0xFFFFFFFF00000000,
+    ],
+    dtype=np.uint64,
+)
+
+# Number of ones of each byte value.
+BYTE_ONES = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(
+    axis=1
+)
+
+# Maximum number of test vectors times inputs processed per batch.
+CHUNK_BITS = 1 << 26
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of the verification of a network using the 0-1 principle."""
+
+    N: int
+    exhaustive: bool
+    num_vectors: int = 0
+    num_failures: int = 0
+    # First 0-1 input vector producing a wrong output, if any.
+    counterexample: list[int] = field(default_factory=list)
+
+    def passed(self) -> bool:
+        return self.num_failures == 0
+
+    def __str__(self):
+        mode = "exhaustive" if self.exhaustive else "random"
+        a = "{} vectors ({}): ".format(self.num_vectors, mode)
+        if self.passed():
+            return a + "passed"
+        a += "{} failed".format(self.num_failures)
+        a += ", e.g. input " + "".join(str(b) for b in self.counterexample)
+        return a
+
+
+def exhaustive_words(N: int, begin: int, end: int):
+    """All 0-1 vectors of N inputs with index 64 * begin to 64 * end. Bit b of
+    word w holds vector 64 * w + b.
+
+    Returns:
+        words : np.ndarray
+            N x (end - begin) bit-sliced test vectors.
+        ones : np.ndarray
+            Number of ones of each test vector.
+    """
+    words = np.empty((N, end - begin), dtype=np.uint64)
+    w = np.arange(begin, end, dtype=np.uint64)
+    for i in range(N):
+        if i < len(LOW_PATTERNS):
+            words[i] = LOW_PATTERNS[i]
+        else:
+            words[i] = np.uint64(0) - ((w >> np.uint64(i - 6)) & np.uint64(1))
+    v = np.arange(64 * begin, 64 * end, dtype=np.uint32) & np.uint32((1 << N) - 1)
+    ones = BYTE_ONES[v.view(np.uint8)].reshape(-1, 4).sum(axis=1)
+    return words, ones
+
+
+def random_words(N: int, num_words: int, seed):
+    """Random 0-1 vectors of N inputs. Each word holds 64 threshold vectors of
+    one random permutation, i.e. the vectors with ones at the positions of its
+    k largest elements. The numbers of ones k are drawn uniformly.
+
+    Returns:
+        words : np.ndarray
+            N x num_words bit-sliced test vectors.
+        ones : np.ndarray
+            Number of ones of each test vector.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.empty((N, num_words), dtype=np.uint64)
+    # Lanes are ordered by decreasing number of ones.
+    ones = -np.sort(-rng.integers(0, N, (num_words, 64), endpoint=True), axis=1)
+    rank = np.arange(N)
+    for w in range(num_words):
+        # The element of rank r is one in all lanes with more than r ones.
+        lanes = 64 - np.searchsorted(ones[w, ::-1], rank, side="right")
+        mask = np.where(
+            lanes == 64,
+            np.uint64(~np.uint64(0)),
+            (np.uint64(1) << lanes.astype(np.uint64)) - np.uint64(1),
+        )
+        words[rng.permutation(N), w] = mask
+    return words, ones.ravel()
+
+
+def check_words(stages, outputs: np.ndarray, words: np.ndarray, ones: np.ndarray):
+    """Sort the test vectors and compare the outputs against the expected
+    ones. Returns the number of failing vectors and the first of them."""
+    # For bit-sliced 0-1 vectors, maximum and minimum are or and and.
+    result = apply_stages(
+        stages, words.copy(), larger=np.bitwise_or, smaller=np.bitwise_and
+    )
+    # Output o of a sorted 0-1 vector is one if more than o inputs are one.
+    expected = np.packbits(
+        ones > outputs[:, np.newaxis], axis=1, bitorder="little"
+    ).view(np.uint64)
+    wrong = np.bitwise_or.reduce(result[outputs] ^ expected, axis=0)
+    failed = np.unpackbits(wrong.view(np.uint8), bitorder="little")
+    num_failures = int(np.count_nonzero(failed))
+    counterexample = []
+    if num_failures:
+        v = int(np.flatnonzero(failed)[0])
+        bits = (words[:, v // 64] >> np.uint64(v % 64)) & np.uint64(1)
+        counterexample = bits.astype(np.int64).tolist()
+    return num_failures, counterexample
+
+
+# Network shared with the worker processes.
+_stages = None
+_outputs = None
+
+
+def _init_worker(stages, outputs):
+    global _stages, _outputs
+    _stages = stages
+    _outputs = outputs
+
+
+def _run_batch(task):
+    N, kind, a, b = task
+    if kind == "exhaustive":
+        words, ones = exhaustive_words(N, a, b)
+    else:
+        words, ones = random_words(N, a, b)
+    return words.shape[1] * 64, *check_words(_stages, _outputs, words, ones)
+
+
+class Verifier:
+    """Checks networks for correctness using the 0-1 principle. Test vectors
+    are bit-sliced, i.e. 64 vectors are packed into an uint64 per input, so
+    each CS is evaluated for all of them at once with bitwise min/max.
+    Networks up to exhaustive_N inputs are checked against all 2^N 0-1
+    vectors, larger ones against num_vectors random vectors. Only the indices
+    of the output set are checked, so pruned networks are verified as well.
+    """
+
+    def __init__(self, exhaustive_N: int = 20, num_vectors: int = 1 << 16):
+        self.exhaustive_N = exhaustive_N
+        self.num_vectors = num_vectors
+
+    def verify(
+        self, network: Network, processes: int = 1, seed=None
+    ) -> VerificationResult:
+        """Verify network. Batches of test vectors are distributed over the
+        given number of processes.
+
+        Returns:
+            result : VerificationResult
+        """
+        N = network.get_N()
+        stages = [network.get_comparators(y) for y in range(network.get_depth())]
+        outputs = np.array(sorted(network.get_output_set()), dtype=np.int64)
+        result = VerificationResult(N=N, exhaustive=N <= self.exhaustive_N)
+        if N == 0:
+            return result
+        # Words per batch such that it holds at most CHUNK_BITS bits.
+        batch = max(1, CHUNK_BITS // (64 * N))
+        tasks = []
+        if result.exhaustive:
+            num_words = max(1, (1 << N) // 64)
+            for begin in range(0, num_words, batch):
+                tasks.append((N, "exhaustive", begin, min(begin + batch, num_words)))
+        else:
+            num_words = max(1, -(-self.num_vectors // 64))
+            seeds = np.random.SeedSequence(seed).spawn(-(-num_words // batch))
+            for i, s in enumerate(seeds):
+                tasks.append((N, "random", min(batch, num_words - i * batch), s))
+
+        if processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_worker,
+                initargs=(stages, outputs),
+            ) as pool:
+                batches = list(pool.map(_run_batch, tasks))
+        else:
+            _init_worker(stages, outputs)
+            batches = [_run_batch(task) for task in tasks]
+            _init_worker(None, None)
+
+        for num_vectors, num_failures, counterexample in batches:
+            result.num_vectors += num_vectors
+            result.num_failures += num_failures
+            if counterexample and not result.counterexample:
+                result.counterexample = counterexample
+        if result.exhaustive and N < 6:
+            # A word holds 64 / 2^N copies of each vector.
+            result.num_vectors = 1 << N
+            result.num_failures //= 64 >> N
+        return result
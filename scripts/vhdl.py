@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from pathlib import Path
+from string import Formatter
 import regex
 
 
@@ -80,25 +81,37 @@ class VHDLEntity:
         Unlike as_instance, this method ignores whether generics or ports
         actually exist in the entity definition.
         """
-        inst = "{} : entity work.{}\n".format(instance_name, self.name)
+        return "".join(self.iter_instance_manual(instance_name, generics, ports))
+
+    def iter_instance_manual(
+        self,
+        instance_name: str,
+        generics: dict[str, str] = {},
+        ports: dict[str, str] = {},
+    ):
+        """Yields the code of as_instance_manual line by line. Ports may also
+        be an iterable of (port, signal) pairs, which is consumed while the
+        port map is generated, e.g. for entities with a very large number of
+        ports.
+        """
+        yield "{} : entity work.{}\n".format(instance_name, self.name)
 
         if generics:
-            inst += "generic map(\n"
+            yield "generic map(\n"
             for i, key in enumerate(generics.keys()):
-                inst += "   {} => {}".format(key, generics[key])
+                line = "   {} => {}".format(key, generics[key])
                 if i + 1 < len(generics):
-                    inst += ","
-                inst += "\n"
-            inst += ")\n"
-        if ports:
-            inst += "port map(\n"
-            for i, key in enumerate(ports.keys()):
-                inst += "   {} => {}".format(key, ports[key])
-                if i + 1 < len(ports):
-                    inst += ","
-                inst += "\n"
-            inst += ");\n"
-        return inst
+                    line += ","
+                yield line + "\n"
+            yield ")\n"
+        items = iter(ports.items() if isinstance(ports, dict) else ports)
+        first = next(items, None)
+        if first is not None:
+            yield "port map(\n"
+            yield "   {} => {}".format(*first)
+            for item in items:
+                yield ",\n   {} => {}".format(*item)
+            yield "\n);\n"
 
     def __str__(self):
         return self.as_entity()
@@ -116,65 +129,183 @@ class VHDLTemplate(VHDLEntity):
         super().__init__(name, generics, ports)
         self.template_string = template_string
         self.tokens = tokens
+        self.compile()
+
+    def compile(self):
+        """Split the template string into literal segments and the token slots
+        between them, so rendering does not parse the template again. Slot i
+        lies between segments i and i + 1 and holds the token name, conversion
+        and format specification as understood by str.format_map.
+        """
+        self.segments = [""]
+        self.slots = []
+        for literal, name, spec, conversion in Formatter().parse(
+            self.template_string
+        ):
+            self.segments[-1] += literal
+            if name is not None:
+                self.slots.append((name, conversion, spec))
+                self.segments.append("")
+
+    def slot_index(self, name: str):
+        """Index of the first slot of token name or None if not present."""
+        for i, slot in enumerate(self.slots):
+            if slot[0] == name:
+                return i
+        return None
+
+    def chunks(self, tokens: dict[str, str] = None, begin: int = 0, end: int = None):
+        """Yields the pieces of the template rendered with tokens, starting at
+        the segment in front of slot begin up to the segment in front of slot
+        end. The whole template is rendered by default.
+        """
+        if tokens is None:
+            tokens = self.tokens
+        if end is None:
+            end = len(self.slots)
+        for i in range(begin, end):
+            yield self.segments[i]
+            name, conversion, spec = self.slots[i]
+            value = tokens[name]
+            if conversion:
+                value = Formatter().convert_field(value, conversion)
+            yield format(value, spec)
+        yield self.segments[end]
 
     def as_template(self):
-        # for key, value in self.tokens.items():
-        #     print(key, value)
-        return self.template_string.format_map(self.tokens)
+        return "".join(self.chunks(self.tokens))
+
+
+# Tokens of VHDL source lines. Placeholders of templates such as {top_name}
+# are treated as identifiers.
+TOKEN = regex.compile(
+    r"""(?P<space>[ \t\r\n\f]+)
+    |(?P<comment>--.*)
+    |(?P<string>"(?:[^"\n]|"")*")
+    |(?P<char>'.'(?!\w))
+    |(?P<word>\w+|\{[^}\n]*\})
+    |(?P<symbol>:=|<=|=>|\*\*|/=|>=|.)""",
+    regex.X,
+)
+
+
+def tokenize(lines):
+    """Split VHDL source lines into tokens, skipping whitespace and comments.
+    Yields (kind, text, gap) tuples, where gap is the whitespace in front of
+    the token if it follows another token on the same line and a single
+    space otherwise.
+    """
+    for line in lines:
+        gap = " "
+        first = True
+        for match in TOKEN.finditer(line):
+            kind = match.lastgroup
+            if kind == "space":
+                if not first and "\n" not in match.group():
+                    gap = match.group()
+            elif kind != "comment":
+                yield kind, match.group(), gap
+                gap = ""
+                first = False
+
+
+def entity_header(tokens):
+    """Tokens between "entity <name> is" and the "end" of the first entity
+    declaration. Stops consuming tokens once the end is reached.
+
+    Returns:
+        name : str or None if no entity is declared.
+        header : list of tokens
+    """
+    name = None
+    previous = []
+    for token in tokens:
+        if name is None:
+            previous = (previous + [token])[-3:]
+            words = [t[1].lower() if t[0] == "word" else None for t in previous]
+            if len(words) == 3 and words[0] == "entity" and words[2] == "is":
+                name = previous[1][1]
+                header = []
+                depth = 0
+            continue
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        elif depth == 0 and token[0] == "word" and token[1].lower() == "end":
+            return name, header
+        header.append(token)
+    return name, None
+
+
+def split_clause(header, keyword: str):
+    """Declarations of the generic or port clause of an entity header, each
+    a list of tokens. Returns None if the clause is missing."""
+    for i in range(len(header) - 1):
+        if header[i][1].lower() == keyword and header[i + 1][1] == "(":
+            break
+    else:
+        return None
+    declarations = [[]]
+    depth = 0
+    for token in header[i + 2 :]:
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            if depth == 0:
+                break
+            depth -= 1
+        elif token[1] == ";" and depth == 0:
+            declarations.append([])
+            continue
+        declarations[-1].append(token)
+    return [d for d in declarations if d]
+
+
+def parse_declarations(declarations, types_only: bool = False) -> dict[str, str]:
+    """Map the names of interface declarations "a, b : in std_logic" to
+    their mode and type as written. Only the type name is kept if
+    types_only."""
+    result = dict()
+    for declaration in declarations:
+        texts = [t[1] for t in declaration]
+        if ":" not in texts:
+            continue
+        colon = texts.index(":")
+        # Placeholders of templates standing in for whole declarations
+        # precede the names.
+        names = [t for t in texts[:colon] if t != "," and not t.startswith("{")]
+        # Object classes preceding the names are not part of them.
+        if names and names[0].lower() in ("signal", "constant", "variable"):
+            names = names[1:]
+        rest = declaration[colon + 1 :]
+        if types_only:
+            value = rest[0][1] if rest and rest[0][0] == "word" else ""
+        else:
+            value = "".join(gap + text for kind, text, gap in rest).strip()
+        for name in names:
+            result[name] = value
+    return result
 
 
 def parseVHDLEntity(path=Path()):
-    """Parse entity definition of vhdl file at path.
+    """Parse entity definition of vhdl file at path. The file is tokenized
+    line by line and only read up to the end of the first entity declaration,
+    so large generated files are parsed in linear time and bounded memory.
 
     Returns Entity object or None, entity couldn't be parsed.
     """
-    content = ""
-    # Read vhdl file and remove comments.
     with open(str(path), "r") as fd:
-        for line in fd:
-            content += line.split("--")[0]
-    # Find entity name.
-    name = regex.findall(r"entity\s*(\w+)\s*is", content, regex.S | regex.M)
-    if name:
-        name = name[0]
-    else:
-        # Attempt to find entity name placeholder.
-        name = regex.findall(r"entity\s*(\{.*?\})\s*is", content, regex.S | regex.M)
-        if not name:
-            return None
-        else:
-            name = name[0]
-    # Using entity name, find entity definition.
-    entity_def = regex.findall(
-        r"entity\s*{0}\sis.*end\sentity\s{0};".format(name), content, regex.S | regex.M
+        name, header = entity_header(tokenize(fd))
+    if header is None:
+        return None
+    ports = split_clause(header, "port")
+    if ports is None:
+        return None
+    generics = split_clause(header, "generic") or []
+    return VHDLEntity(
+        name, parse_declarations(ports), parse_declarations(generics, True)
     )
-    if entity_def:
-        entity_def = entity_def[0]
-        ports = dict()
-        generics = dict()
-
-        # Attempt to find generic clause.
-        generic_clause = regex.findall(
-            r"generic\s*\((.*)\);\s*port", entity_def, regex.M | regex.S
-        )
-        if generic_clause:
-            # Extract generics.
-            generic_matcher = regex.compile(r"\s*?(\w+)\s*?:\s*(\w*)")
-            for pair in regex.findall(generic_matcher, generic_clause[0]):
-                generics[pair[0]] = pair[1]
-
-        # Attempt to find port clause
-        port_clause = regex.findall(r"port\s\((.*)\);", entity_def, regex.M | regex.S)
-
-        # Extract port definitions.
-        if port_clause:
-            port_matcher = regex.compile(r"\s*?(\w+)\s*?:\s*(\w*?\s+\w+[^;\n]*)")
-            for pair in regex.findall(port_matcher, port_clause[0]):
-                ports[pair[0]] = pair[1]
-        else:
-            return None
-        return VHDLEntity(name, ports, generics)
-    return None
 
 
 def parseVHDLTemplate(path=Path()):
@@ -182,11 +313,9 @@ def parseVHDLTemplate(path=Path()):
 
     Returns a template object or None if template couldn't be parsed.
     """
-    content = ""
     # Read lines of file and remove comments.
     with open(str(path), "r") as fd:
-        for line in fd:
-            content += line.split("--")[0]
+        content = "".join(line.split("--")[0] for line in fd)
 
     # Create dictionary of tokens replaceable by string.format
     tokens = dict()
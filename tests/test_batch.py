@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import json
+from pathlib import Path
+
+import pytest
+
+import scripts.batch
+from scripts.batch import BatchRunner, JobState, expand_grid, load_jobs, load_spec
+
+SPEC = """
+grid:
+  algorithm: [oddeven, bitonic]
+  N: [4, 8]
+  W: 8
+output: "{directory}/{algorithm}_{N}"
+steps:
+  - generate {algorithm} {N}
+  - write {output}
+"""
+
+
+class StubInterface:
+    """Stand-in for the netgen.py interface recording the commands run."""
+
+    # (algorithm, N) of generate commands which fail.
+    failing = set()
+    calls = []
+
+    def generate(self, algorithm, N):
+        StubInterface.calls.append((algorithm, N))
+        if (algorithm, N) in StubInterface.failing:
+            raise ValueError("generate failed")
+        return self
+
+    def write(self, path):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        (Path(path) / "Sorter.vhd").write_text("")
+        return self
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(StubInterface, "failing", set())
+    monkeypatch.setattr(StubInterface, "calls", [])
+    # Sorters are never out of date against the sources.
+    monkeypatch.setattr(scripts.batch, "SOURCES", [])
+    return StubInterface
+
+
+def make_spec(tmp_path, **make) -> dict:
+    file = tmp_path / "jobs.yaml"
+    file.write_text(SPEC.replace("{directory}", str(tmp_path / "out")))
+    spec = load_spec(file)
+    if make:
+        spec["make"] = make
+    return spec
+
+
+def test_expand_grid():
+    assert expand_grid({"a": [1, 2], "b": "x"}) == [
+        {"a": 1, "b": "x"},
+        {"a": 2, "b": "x"},
+    ]
+    assert expand_grid([{"a": [1, 2]}, {"a": 3, "b": [4, 5]}]) == [
+        {"a": 1},
+        {"a": 2},
+        {"a": 3, "b": 4},
+        {"a": 3, "b": 5},
+    ]
+    assert expand_grid({}) == [{}]
+
+
+def test_load_jobs(tmp_path):
+    jobs = load_jobs(make_spec(tmp_path))
+    assert [job.name for job in jobs] == [
+        "oddeven_4",
+        "oddeven_8",
+        "bitonic_4",
+        "bitonic_8",
+    ]
+    output = str(tmp_path / "out" / "bitonic_8")
+    assert jobs[3].output == output
+    assert jobs[3].command == ["generate", "bitonic", "8", "-", "write", output]
+
+    spec = make_spec(tmp_path)
+    spec["name"] = "{algorithm}"
+    with pytest.raises(ValueError):
+        load_jobs(spec)
+
+
+def test_job_state(tmp_path):
+    job, other = load_jobs(make_spec(tmp_path))[:2]
+    state = JobState(tmp_path / "state.json")
+    state.set(job, "generate", "done", 1.5)
+    assert json.loads((tmp_path / "state.json").read_text())[job.name] == {
+        "key": job.key(),
+        "generate": "done",
+        "generate_seconds": 1.5,
+    }
+    state = JobState(tmp_path / "state.json")
+    assert state.get(job, "generate") == "done"
+    assert state.get(other, "generate") == "pending"
+    # Changed commands invalidate the entry.
+    job.command = job.command + ["--W=16"]
+    assert state.get(job, "generate") == "pending"
+
+
+def test_resume(tmp_path, stub):
+    spec = make_spec(tmp_path)
+    stub.failing = {("bitonic", 8)}
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run() == 1
+    assert len(stub.calls) == 4
+    assert "ValueError" in (tmp_path / "state" / "bitonic_8.log").read_text()
+
+    # Only the failed job is run again.
+    stub.failing = set()
+    stub.calls.clear()
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run() == 0
+    assert stub.calls == [("bitonic", 8)]
+
+    stub.calls.clear()
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run() == 0
+    assert stub.calls == []
+
+    # Sorters whose outputs were removed are generated again.
+    (tmp_path / "out" / "oddeven_4" / "Sorter.vhd").unlink()
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run() == 0
+    assert stub.calls == [("oddeven", 4)]
+
+
+class FakeProcess:
+    """Stand-in for make which finishes after a few polls and fails for the
+    bitonic sorters."""
+
+    running = 0
+    max_running = 0
+    commands = []
+
+    def __init__(self, command, stdout=None, stderr=None):
+        FakeProcess.commands.append(command)
+        FakeProcess.running += 1
+        FakeProcess.max_running = max(FakeProcess.max_running, FakeProcess.running)
+        self.polls = 3
+        self.returncode = None
+        self.fails = any("bitonic" in arg for arg in command)
+
+    def poll(self):
+        if self.returncode is None:
+            self.polls -= 1
+            if self.polls == 0:
+                self.returncode = int(self.fails)
+                FakeProcess.running -= 1
+        return self.returncode
+
+
+@pytest.fixture
+def make(monkeypatch):
+    monkeypatch.setattr(FakeProcess, "running", 0)
+    monkeypatch.setattr(FakeProcess, "max_running", 0)
+    monkeypatch.setattr(FakeProcess, "commands", [])
+    monkeypatch.setattr(scripts.batch.subprocess, "Popen", FakeProcess)
+    monkeypatch.setattr(scripts.batch.time, "sleep", lambda seconds: None)
+    return FakeProcess
+
+
+@pytest.mark.parametrize(
+    "options, expected",
+    [
+        ({"jobs": 1}, 1),
+        ({"jobs": 3}, 3),
+        ({"jobs": 4, "memory": "3G", "total_memory": "8G"}, 2),
+        # The first job is started even if it exceeds the memory.
+        ({"jobs": 4, "memory": "16G", "total_memory": "8G"}, 1),
+    ],
+)
+def test_implement_limits(tmp_path, stub, make, options, expected):
+    spec = make_spec(tmp_path, board="arty", **options)
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run() == 2
+    assert make.max_running == expected
+    assert len(make.commands) == 4
+    assert make.commands[0] == [
+        "make",
+        "BOARD=arty",
+        "SORTER={}".format(tmp_path / "out" / "oddeven_4"),
+    ]
+    state = JobState(tmp_path / "state.json")
+    assert [state.get(job, "make") for job in runner.jobs] == [
+        "done",
+        "done",
+        "failed",
+        "failed",
+    ]
+
+
+def test_implement_skips_failed_generation(tmp_path, stub, make):
+    stub.failing = {("oddeven", 8)}
+    spec = make_spec(tmp_path, jobs=2)
+    runner = BatchRunner(spec, stub, tmp_path / "state.json")
+    assert runner.run(make=False) == 1
+    assert make.commands == []
+    assert runner.implement() == 2
+    assert len(make.commands) == 3
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import pytest
+
+from scripts.model import SorterModel, num_cs
+from scripts.network_generators import build_network
+from scripts.reporter import Report
+
+
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+@pytest.mark.parametrize("N", [4, 16, 64, 256, 1024])
+def test_num_cs(algorithm, N):
+    network = build_network(N, algorithm)
+    comparators = sum(
+        len(network.get_comparators(y)[0]) for y in range(network.get_depth())
+    )
+    assert comparators == num_cs(algorithm, N)
+    assert Report(network).content["num_cs"] == comparators
+    assert SorterModel().estimate(network).num_cs == comparators
+
+
+def test_bitonic_reverse_cs():
+    """Reverse CS are counted as well. Counting only CS with stage > index
+    reported 160 CS for 32 inputs."""
+    content = Report(build_network(32, "bitonic")).content
+    assert content["num_cs"] == 240
+    assert sum(content["distance_hist"].values()) == 240
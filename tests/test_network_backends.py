@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+from scripts.network_generators import (
+    MappedNetwork,
+    Network,
+    NetworkView,
+    SparseNetwork,
+    build_network,
+    get_generator,
+)
+from scripts.resource_allocator import BlockAllocator, StageAllocator, count_ff
+from scripts.vhdl import VHDLEntity
+
+def build(algorithm: str, N: int, network_type: type, steps: list[str]):
+    """Network of N inputs created the same way as netgen.py generate,
+    followed by the given transformations."""
+    generator = get_generator(algorithm)
+    network = build_network(N, algorithm, network_type=network_type)
+    for step in steps:
+        if step == "distribute_signal":
+            network = generator.distribute_signal(network, "START", 4)
+        elif step == "stagewise":
+            network = generator.make_stagewise(network)
+        elif step == "prune":
+            network = generator.prune(network, {0, N // 2, N - 1})
+    return network
+
+
+def assert_same_network(network: Network, reference: Network):
+    """Compare CS, all FF layers, signals and output set stage by stage."""
+    assert network.get_N() == reference.get_N()
+    assert network.get_depth() == reference.get_depth()
+    assert network.num_layers() == reference.num_layers()
+    assert network.get_output_set() == reference.get_output_set()
+    assert network.signals == reference.signals
+    for y in range(reference.get_depth()):
+        np.testing.assert_array_equal(network[y], reference[y])
+        for a, b in zip(network.get_comparators(y), reference.get_comparators(y)):
+            np.testing.assert_array_equal(a, b)
+        for z in range(reference.num_layers()):
+            np.testing.assert_array_equal(
+                network.get_ff_stage(z, y), reference.get_ff_stage(z, y)
+            )
+
+
+@pytest.mark.parametrize(
+    "steps",
+    [
+        [],
+        ["distribute_signal"],
+        ["prune"],
+        ["distribute_signal", "prune"],
+        ["stagewise", "prune"],
+    ],
+)
+@pytest.mark.parametrize("N", [16, 100, 256])
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+def test_sparse_matches_dense(algorithm, N, steps):
+    assert_same_network(
+        build(algorithm, N, SparseNetwork, steps), build(algorithm, N, Network, steps)
+    )
+
+
+def test_sparse_set_ff():
+    """Delay FF removed from and added to the run-length encoded layers."""
+    networks = [build("oddeven", 32, t, []) for t in (Network, SparseNetwork)]
+    for network in networks:
+        network.set_ff((3, 2, 0), False)
+        network.set_ff((4, 2, 0), True)
+        network.set_ff_stage(0, 5, np.arange(32) % 3 == 0)
+    assert_same_network(*networks)
+
+
+@pytest.fixture
+def mapped_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(MappedNetwork, "directory", tmp_path / "netmap")
+    return tmp_path / "netmap"
+
+
+@pytest.mark.parametrize(
+    "steps", [[], ["distribute_signal", "prune"], ["stagewise", "prune"]]
+)
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+def test_mapped_matches_dense(mapped_directory, algorithm, steps):
+    network = build(algorithm, 100, MappedNetwork, steps)
+    assert isinstance(network.pmatrix, np.memmap)
+    assert_same_network(network, build(algorithm, 100, Network, steps))
+
+
+@pytest.mark.parametrize("stagewise", [False, True])
+def test_mapped_ff_replacement(mapped_directory, stagewise):
+    """FF are counted stage by stage into a mapped file and allocated the
+    same way as for the dense backend."""
+    steps = ["distribute_signal"] + (["stagewise"] if stagewise else [])
+    entity = VHDLEntity("REGISTER_DSP", {}, {})
+    groups = []
+    for network_type in (Network, MappedNetwork):
+        network = build("oddeven", 64, network_type, steps)
+        allocator = StageAllocator() if stagewise else BlockAllocator()
+        replacement = allocator.reallocate_ff(
+            network, entity=entity, max_entities=16, ff_per_entity=48
+        )
+        groups.append(replacement.groups)
+        layers = range(1 if stagewise else network.num_layers())
+        counts = count_ff(network, layers)
+        expected = sum(
+            network.get_ff_layer(z).astype(np.int32) for z in layers
+        ) + network.get_ff_layer(0) * (network.signals["STREAM"].bit_width - 1)
+        np.testing.assert_array_equal(counts, expected)
+        assert isinstance(counts, np.memmap) == (network_type is MappedNetwork)
+        view = NetworkView(network, range(2, 5))
+        assert isinstance(count_ff(view, [0]), np.memmap) == (
+            network_type is MappedNetwork
+        )
+    assert groups[0] == groups[1]
+    assert groups[0]
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import pytest
+
+from scripts.network_cache import NetworkCache
+from scripts.network_generators import build_network
+from tests.test_network_backends import assert_same_network
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NetworkCache(tmp_path / "netcache")
+
+
+def test_round_trip(cache):
+    network = build_network(64, "oddeven", fanout=8)
+    key = cache.key({"N": 64}, [])
+    assert cache.load(key) is None
+    cache.store(key, network)
+    assert_same_network(cache.load(key), network)
+
+
+@pytest.mark.parametrize("size", [0.5, 0.0])
+def test_corrupt_entry(cache, size):
+    network = build_network(16, "bitonic")
+    key = cache.key({"N": 16}, [])
+    cache.store(key, network)
+    file = cache.path / (key + ".npz")
+    data = file.read_bytes()
+    file.write_bytes(data[: int(len(data) * size)])
+    assert cache.load(key) is None
+    assert not file.exists()
+    cache.store(key, network)
+    assert_same_network(cache.load(key), network)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import math
+
+import numpy as np
+import pytest
+
+from netgen import get_output_set
+from scripts.network_generators import (
+    Bitonic,
+    Network,
+    OddEven,
+    SparseNetwork,
+    build_network,
+    get_generator,
+)
+from scripts.reporter import Report
+
+
+def reference_oddeven(N: int) -> Network:
+    """OddEven network built with the element-wise loop OddEven.create was
+    originally implemented with. FF are cleared through set_ff as FF layers
+    are stored bit-packed."""
+    logp = int(math.ceil((math.log2(N))))
+    depth = logp * (logp + 1) // 2
+    network = Network(N, depth)
+    network.algorithm = "ODDEVEN"
+    d = -1
+    for p_e in range(0, logp):
+        p = 2**p_e
+        for k_e in range(p_e, -1, -1):
+            k = 2**k_e
+            d += 1
+            for j in range(k % p, N - k, 2 * k):
+                for i in range(0, min(k, N - j - k)):
+                    if math.floor((i + j) / (p * 2)) == math.floor(
+                        (i + j + k) / (p * 2)
+                    ):
+                        network[d][i + j] = i + j + k
+                        network[d][i + j + k] = i + j
+                        network.set_ff((i + j, d, 0), False)
+                        network.set_ff((i + j + k, d, 0), False)
+    return network
+
+
+def reference_bitonic_sort(network, low_bound, N, depth, asc=True):
+    """Recursion Bitonic.create was originally implemented with. Returns the
+    depth of the last stage used."""
+    if N > 1:
+        middle = N // 2
+        d1 = reference_bitonic_sort(network, low_bound, middle, depth, not asc)
+        d2 = reference_bitonic_sort(
+            network, low_bound + middle, N - middle, depth, asc
+        )
+        return reference_bitonic_merge(network, low_bound, N, max(d1, d2), asc)
+    return 0
+
+
+def reference_bitonic_merge(network, low_bound, N, depth, asc=True):
+    if N > 1:
+        middle = 1
+        while middle < N:
+            middle <<= 1
+        middle >>= 1
+        for i in range(low_bound, low_bound + N - middle):
+            if asc:
+                network[depth][i] = i + middle
+                network[depth][i + middle] = i
+            else:
+                network[depth][i] = -1 * (i + middle)
+                network[depth][i + middle] = -1 * i
+            network.set_ff((i, depth, 0), False)
+            network.set_ff((i + middle, depth, 0), False)
+        d1 = reference_bitonic_merge(network, low_bound, middle, depth + 1, asc)
+        d2 = reference_bitonic_merge(
+            network, low_bound + middle, N - middle, depth + 1, asc
+        )
+        return max(d1, d2)
+    return depth
+
+
+def reference_bitonic(N: int) -> Network:
+    logp = int(math.ceil((math.log2(N))))
+    depth = logp * (logp + 1) // 2
+    network = Network(N, depth)
+    network.algorithm = "BITONIC"
+    reference_bitonic_sort(network, 0, N, 0)
+    return network
+
+
+def assert_same_network(network: Network, reference: Network):
+    assert network.get_N() == reference.get_N()
+    assert network.get_depth() == reference.get_depth()
+    assert network.get_output_set() == reference.get_output_set()
+    for y in range(reference.get_depth()):
+        np.testing.assert_array_equal(network[y], reference[y])
+        np.testing.assert_array_equal(
+            network.get_ff_stage(0, y), reference.get_ff_stage(0, y)
+        )
+
+
+@pytest.mark.parametrize("network_type", [Network, SparseNetwork])
+@pytest.mark.parametrize("pruned", [False, True])
+@pytest.mark.parametrize("N", [2**p for p in range(1, 13)])
+def test_oddeven_create(N, pruned, network_type):
+    generator = OddEven()
+    network = generator.create(N, network_type)
+    reference = reference_oddeven(N)
+    if pruned:
+        output_set = {0, N // 2, N - 1}
+        generator.prune(network, set(output_set))
+        generator.prune(reference, set(output_set))
+    assert_same_network(network, reference)
+
+
+@pytest.mark.parametrize("network_type", [Network, SparseNetwork])
+@pytest.mark.parametrize("N", [2**p for p in range(1, 13)] + [3, 5, 6, 12, 100])
+def test_bitonic_create(N, network_type):
+    network = Bitonic().create(N, network_type)
+    assert network.algorithm == "BITONIC"
+    assert_same_network(network, reference_bitonic(N))
+
+
+def test_prune_keeps_delay_ff():
+    """Pruning keeps the delay FF of wires leading to the outputs. The
+    element-wise prune removed them, leaving 136 FF in this network."""
+    network = build_network(64, "oddeven", fanout=8)
+    OddEven().prune(network, get_output_set("min", 4, 64))
+    content = Report(network).content
+    assert content["num_cs"] == 368
+    assert content["num_ff"] == 189
+
+
+@pytest.mark.parametrize("N", [5, 16, 37])
+@pytest.mark.parametrize("algorithm", ["OddEven", "bitonic", "blank"])
+def test_build_network(algorithm, N):
+    network = build_network(N, algorithm, stagewise=True, fanout=4)
+    generator = get_generator(algorithm)
+    logp = int(math.ceil(math.log2(N)))
+    if algorithm == "blank":
+        reference = Network(N, logp * (logp + 1) // 2)
+    else:
+        size = 2**logp if algorithm == "OddEven" else N
+        reference = generator.reduce(generator.create(size), N)
+    reference = generator.make_stagewise(reference)
+    reference = generator.distribute_signal(reference, "START", 4)
+    assert_same_network(network, reference)
+    assert network.signals == reference.signals
+
+    with pytest.raises(ValueError):
+        get_generator("bubble")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import os
+from pathlib import Path
+
+import pytest
+
+import scripts.parse_cache
+from scripts.parse_cache import (
+    LazyVHDLDict,
+    ParseCache,
+    entity_to_dict,
+    index_entities,
+    index_templates,
+    parse_files,
+)
+
+ENTITY = """library ieee;
+use ieee.std_logic_1164.all;
+
+entity {name} is
+  generic (
+    W : integer := 8
+  );
+  port (
+    A_I : in  std_logic_vector(W-1 downto 0);
+    B_O : out std_logic_vector(W-1 downto 0)
+  );
+end entity {name};
+"""
+
+
+def write_entity(path: Path, name: str, text: str = ENTITY) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text.format(name=name))
+    return path
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Paths passed to the entity parser, in order."""
+    paths = []
+    parse = scripts.parse_cache.PARSERS["entity"]
+
+    def counting(path):
+        paths.append(Path(path))
+        return parse(path)
+
+    monkeypatch.setitem(scripts.parse_cache.PARSERS, "entity", counting)
+    return paths
+
+
+def test_cache_hits(tmp_path, parsed):
+    path = write_entity(tmp_path / "a.vhd", "A")
+    cache = ParseCache(tmp_path / "cache.json")
+    assert cache.entity(path).name == "A"
+    assert cache.entity(path).ports == {
+        "A_I": "in  std_logic_vector(W-1 downto 0)",
+        "B_O": "out std_logic_vector(W-1 downto 0)",
+    }
+    assert parsed == [path]
+    cache.save()
+
+    # Entries are read back from disk.
+    cache = ParseCache(tmp_path / "cache.json")
+    assert entity_to_dict(cache.entity(path)) == entity_to_dict(
+        scripts.parse_cache.parseVHDLEntity(path)
+    )
+    assert parsed == [path]
+
+    # Disabled caches always parse.
+    cache = ParseCache(tmp_path / "cache.json", enabled=False)
+    cache.entity(path)
+    assert parsed == [path, path]
+
+
+def test_invalidation(tmp_path, parsed):
+    path = write_entity(tmp_path / "a.vhd", "A")
+    cache = ParseCache(tmp_path / "cache.json")
+    cache.entity(path)
+
+    # Same size, different modification time.
+    write_entity(path, "B")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.entity(path).name == "B"
+    assert len(parsed) == 2
+
+    # Different size, same modification time.
+    stat = path.stat()
+    write_entity(path, "LONGER")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.entity(path).name == "LONGER"
+    assert len(parsed) == 3
+    assert cache.entity(path).name == "LONGER"
+    assert len(parsed) == 3
+
+
+def test_invalid_files(tmp_path, parsed):
+    path = tmp_path / "a.vhd"
+    path.write_text("-- No entity in here.\n")
+    cache = ParseCache(tmp_path / "cache.json")
+    assert cache.entity(path) is None
+    assert cache.entity(path) is None
+    assert parsed == [path]
+
+
+def test_version(tmp_path, parsed, monkeypatch):
+    path = write_entity(tmp_path / "a.vhd", "A")
+    cache = ParseCache(tmp_path / "cache.json")
+    cache.entity(path)
+    cache.save()
+    monkeypatch.setattr(
+        scripts.parse_cache, "PARSER_VERSION", scripts.parse_cache.PARSER_VERSION + 1
+    )
+    ParseCache(tmp_path / "cache.json").entity(path)
+    assert parsed == [path, path]
+
+
+def test_index_uppercase(tmp_path):
+    write_entity(tmp_path / "lower.vhd", "lower_case")
+    upper = ENTITY.upper().replace("{NAME}", "{name}")
+    write_entity(tmp_path / "sub" / "upper.vhd", "Upper_Case", upper)
+    write_entity(tmp_path / "mixed.vhd", "Mixed", "  Entity {name} Is\nend;\n")
+    (tmp_path / "package.vhd").write_text("package P is\nend package P;\n")
+    index = index_entities(tmp_path)
+    assert index == {
+        "lower_case": tmp_path / "lower.vhd",
+        "Upper_Case": tmp_path / "sub" / "upper.vhd",
+        "Mixed": tmp_path / "mixed.vhd",
+    }
+    entities = LazyVHDLDict(index, "entity", ParseCache(enabled=False))
+    assert entities["Upper_Case"].name == "Upper_Case"
+    assert list(entities["Upper_Case"].ports) == ["A_I", "B_O"]
+
+
+def test_lazy(tmp_path, parsed):
+    paths = [write_entity(tmp_path / "{}.vhd".format(n), n) for n in "ABC"]
+    (tmp_path / "D.vhd").write_text("entity D is\n")
+    index = index_entities(tmp_path)
+    assert set(index) == {"A", "B", "C", "D"}
+    entities = LazyVHDLDict(index, "entity", ParseCache(tmp_path / "cache.json"))
+    assert parsed == []
+
+    assert entities["B"].name == "B"
+    assert entities["B"] is entities["B"]
+    assert parsed == [paths[1]]
+    assert "D" not in entities
+    with pytest.raises(KeyError):
+        entities["E"]
+
+    entities.parse_all()
+    assert sorted(p.name for p in parsed) == ["A.vhd", "B.vhd", "C.vhd", "D.vhd"]
+    assert sorted(entities) == ["A", "B", "C"]
+    assert len(entities) == 3
+    assert len(parsed) == 4
+
+
+def test_lazy_templates(tmp_path):
+    index = index_templates(Path("templates"))
+    templates = LazyVHDLDict(index, "template", ParseCache(enabled=False))
+    assert templates["Network.vhd"].name == "Network.vhd"
+    assert sorted(templates) == sorted(index)
+
+
+@pytest.mark.parametrize(
+    "kind, directory", [("entity", Path("src")), ("template", Path("templates"))]
+)
+def test_parallel_matches_serial(tmp_path, kind, directory):
+    paths = sorted(directory.glob("./**/*.vhd"))
+    serial, timings = parse_files(paths, kind, ParseCache(enabled=False))
+    assert set(timings) == set(paths)
+    cache = ParseCache(tmp_path / "cache.json")
+    parallel, timings = parse_files(paths, kind, cache, processes=2)
+    assert set(timings) == set(paths)
+    assert [p and entity_to_dict(p) for p in parallel] == [
+        s and entity_to_dict(s) for s in serial
+    ]
+
+    # All results are taken from the cache afterwards.
+    cached, timings = parse_files(paths, kind, ParseCache(tmp_path / "cache.json"))
+    assert timings == {}
+    assert [c and entity_to_dict(c) for c in cached] == [
+        s and entity_to_dict(s) for s in serial
+    ]
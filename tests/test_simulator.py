@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+from scripts.network_generators import build_network
+from scripts.simulator import apply_stages, simulate, simulate_cycles
+
+
+def stages(network):
+    return [network.get_comparators(y) for y in range(network.get_depth())]
+
+
+@pytest.mark.parametrize("N", [2, 7, 16, 33, 64])
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+def test_apply_stages_sorts(algorithm, N):
+    network = build_network(N, algorithm)
+    values = np.random.default_rng(N).integers(0, 1 << 16, (N, 256))
+    expected = -np.sort(-values, axis=0)
+    assert np.array_equal(apply_stages(stages(network), values.copy()), expected)
+
+
+def test_simulate_matches_apply_stages():
+    network = build_network(32, "bitonic")
+    data = np.random.default_rng(0).integers(0, 1 << 16, (100, 32))
+    expected = apply_stages(stages(network), data.T.copy()).T
+    assert np.array_equal(simulate(network, data, chunk_size=7), expected)
+
+
+@pytest.mark.parametrize("N", [4, 16, 64])
+def test_plain_latency(N):
+    network = build_network(N, "oddeven")
+    data = np.random.default_rng(N).integers(0, 2, (8, N))
+    # With keys as wide as the stream, a set is processed in a single cycle.
+    report = simulate_cycles(network, data, W=1)
+    assert report.latency == network.get_depth()
+    assert report.initiation_interval == 1
+    assert report.num_errors == 0
+    assert not report.misaligned_start and not report.undriven
+
+    report = simulate_cycles(network, data * 255, W=8)
+    assert report.latency == network.get_depth() + 7
+    assert report.num_errors == 0
+
+
+def test_distributed_start():
+    network = build_network(16, "oddeven", fanout=4)
+    data = np.random.default_rng(0).integers(0, 256, (8, 16))
+    report = simulate_cycles(network, data)
+    assert report.misaligned_start
+    assert not report.undriven
+    assert "misaligned START: {} CS".format(len(report.misaligned_start)) in str(
+        report
+    )
+
+    # Dropping a delay FF leaves its point undriven and the output undefined.
+    y = next(y for y in range(network.get_depth()) if network.get_ff_stage(0, y).any())
+    x = int(np.flatnonzero(network.get_ff_stage(0, y))[0])
+    network.set_ff((x, y, 0), False)
+    report = simulate_cycles(network, data)
+    assert (x, y) in report.undriven
+    assert report.undefined_outputs
+    assert report.num_errors == report.num_sets
+    assert "undriven points: {}".format(len(report.undriven)) in str(report)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import os
+from pathlib import Path
+
+import pytest
+
+import scripts.template_processor
+from netgen import get_sources, get_templates, write_vhdl
+from scripts.network_generators import build_network
+from scripts.resource_allocator import BlockAllocator, StageAllocator
+from scripts.template_processor import VHDLTemplateWriter
+from scripts.vhdl import VHDLTemplate
+
+TEMPLATE = """entity {top_name} is
+  generic (W : integer := {word_width:>4});
+end entity {top_name};
+
+architecture behavioral of {top_name} is
+  -- {{literal braces}} and {name!r}
+{body}
+end architecture behavioral;
+"""
+
+TOKENS = {"top_name": "SORTER", "word_width": 8, "name": "x", "body": "BODY"}
+
+
+@pytest.fixture(scope="module")
+def templates():
+    return get_templates(Path("templates"))
+
+
+def test_chunks(templates):
+    template = VHDLTemplate("test", TEMPLATE, tokens=TOKENS)
+    assert [slot[0] for slot in template.slots] == [
+        "top_name",
+        "word_width",
+        "top_name",
+        "top_name",
+        "name",
+        "body",
+    ]
+    assert template.slot_index("top_name") == 0
+    assert template.slot_index("body") == 5
+    assert template.slot_index("missing") is None
+    assert template.as_template() == TEMPLATE.format_map(TOKENS)
+    # Template parts in front of and behind a slot.
+    assert "".join(template.chunks(TOKENS, 0, 5)) + "BODY" + "".join(
+        template.chunks(TOKENS, 6)
+    ) == TEMPLATE.format_map(TOKENS)
+
+    for template in templates.values():
+        tokens = {name: "<{}>".format(name) for name in template.tokens}
+        assert "".join(template.chunks(tokens)) == template.template_string.format_map(
+            tokens
+        )
+
+
+def write(path: Path, blocks: list[str], **kwargs) -> str:
+    template = VHDLTemplate("test", TEMPLATE)
+    with VHDLTemplateWriter(template, path, **kwargs) as writer:
+        assert not writer.write_incremental("before preamble")
+        writer.write_preamble(TOKENS)
+        writer.write_start_comment("Blocks")
+        writer.write_chunks(iter(blocks))
+        for block in blocks:
+            writer.write_incremental(block)
+        writer.write_end_comment()
+        writer.write_footer()
+    assert writer.output_fd is None
+    return path.read_text()
+
+
+@pytest.mark.parametrize("writev", [False, True])
+@pytest.mark.parametrize("flush_threshold", [1, 100, 1 << 20])
+def test_writer(tmp_path, flush_threshold, writev):
+    blocks = ["block {}\n".format(i) * (i % 7) for i in range(500)]
+    expected = write(tmp_path / "reference.vhd", blocks, flush_threshold=0)
+    before, after = TEMPLATE.format_map(TOKENS).split("BODY")
+    assert expected.startswith(before + "-" * 80 + "\n-- Blocks ")
+    assert expected.endswith("".join(blocks) + "-" * 80 + "\n\n" + after)
+    output = write(
+        tmp_path / "output.vhd", blocks, flush_threshold=flush_threshold, writev=writev
+    )
+    assert output == expected
+
+
+def test_writer_flush(tmp_path):
+    path = tmp_path / "output.vhd"
+    template = VHDLTemplate("test", TEMPLATE)
+    with VHDLTemplateWriter(template, path, flush_threshold=1000) as writer:
+        writer.write_preamble(TOKENS)
+        writer.write_incremental("-- short\n")
+        # Blocks are kept in memory until the threshold is reached.
+        assert path.read_text() == ""
+        writer.write_incremental("-" * 1000 + "\n")
+        size = len(path.read_text())
+        assert size > 1000
+        writer.write_incremental("-- short\n")
+        assert len(path.read_text()) == size
+        writer.flush()
+        assert len(path.read_text()) == size + len("-- short\n")
+        writer.write_footer()
+    assert path.read_text().endswith("end architecture behavioral;\n")
+
+
+def test_writev_partial(tmp_path, monkeypatch):
+    """Blocks are written completely with few blocks per call and partial
+    writes of os.writev."""
+    writev = os.writev
+    calls = []
+
+    def partial(fd, buffers):
+        calls.append(len(buffers))
+        # Only the first few bytes of all buffers are written.
+        return writev(fd, [b"".join(buffers)[:13]])
+
+    monkeypatch.setattr(scripts.template_processor, "IOV_MAX", 3)
+    monkeypatch.setattr(scripts.template_processor.os, "writev", partial)
+    blocks = ["block {}\n".format(i) for i in range(50)]
+    output = write(tmp_path / "output.vhd", blocks, flush_threshold=64, writev=True)
+    monkeypatch.undo()
+    assert output == write(tmp_path / "reference.vhd", blocks)
+    assert calls and max(calls) == 3
+
+
+def sorter(entities, algorithm, N, stagewise, entity_ff):
+    network = build_network(N, algorithm, stagewise, fanout=4)
+    ff_replacements = []
+    if entity_ff:
+        allocator = StageAllocator() if stagewise else BlockAllocator()
+        ff_replacements.append(
+            allocator.reallocate_ff(
+                network,
+                entity=entities["REGISTER_DSP"],
+                max_entities=8,
+                ff_per_entity=entity_ff,
+            )
+        )
+    return network, ff_replacements
+
+
+@pytest.mark.parametrize(
+    "algorithm, N, stagewise, entity_ff",
+    [
+        ("oddeven", 64, False, 0),
+        ("oddeven", 37, False, 16),
+        ("bitonic", 32, True, 8),
+    ],
+)
+def test_parallel_matches_serial(
+    tmp_path, templates, algorithm, N, stagewise, entity_ff
+):
+    entities = get_sources(Path("src"))
+    outputs = dict()
+    for processes in [1, 2, 3]:
+        # Writing clears the replaced FF, so each sorter is written from a
+        # network of its own.
+        network, ff_replacements = sorter(entities, algorithm, N, stagewise, entity_ff)
+        path = tmp_path / str(processes)
+        files = write_vhdl(
+            path,
+            network,
+            "TEST",
+            entities,
+            templates,
+            "SWCS",
+            8,
+            ff_replacements,
+            stagewise,
+            processes,
+        )
+        outputs[processes] = {name: (path / name).read_bytes() for name in files}
+    assert outputs[2] == outputs[1]
+    assert outputs[3] == outputs[1]
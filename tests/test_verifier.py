@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+from scripts.network_generators import OddEven, build_network
+from scripts.verifier import Verifier
+
+# Small networks are checked exhaustively, larger ones with random vectors.
+SIZES = [2, 5, 8, 13, 16, 37, 64]
+
+
+def remove_cs(network, y: int, i: int = 0):
+    """Remove the i-th CS of stage y."""
+    low, high = network.get_comparators(y)[:2]
+    stage = np.array(network[y])
+    stage[low[i]], stage[high[i]] = low[i], high[i]
+    network[y] = stage
+
+
+def flip_cs(network, y: int, i: int = 0):
+    """Reverse the direction of the i-th CS of stage y."""
+    low, high, reverse = network.get_comparators(y)
+    stage = np.array(network[y])
+    sign = 1 if reverse[i] else -1
+    stage[low[i]], stage[high[i]] = sign * high[i], sign * low[i]
+    network[y] = stage
+
+
+def verify(network, **kwargs):
+    return Verifier(exhaustive_N=16, num_vectors=1 << 14).verify(
+        network, seed=1, **kwargs
+    )
+
+
+@pytest.mark.parametrize("N", SIZES)
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+def test_accepts_sorting_networks(algorithm, N):
+    result = verify(build_network(N, algorithm, fanout=4))
+    assert result.passed(), str(result)
+    assert result.exhaustive == (N <= 16)
+    if result.exhaustive:
+        assert result.num_vectors == 1 << N
+
+
+@pytest.mark.parametrize("modify", [remove_cs, flip_cs])
+@pytest.mark.parametrize("N", [8, 16, 64])
+@pytest.mark.parametrize("algorithm", ["oddeven", "bitonic"])
+def test_rejects_modified_networks(algorithm, N, modify):
+    network = build_network(N, algorithm)
+    modify(network, network.get_depth() - 1)
+    result = verify(network)
+    assert not result.passed()
+    assert len(result.counterexample) == N
+    assert set(result.counterexample) <= {0, 1}
+
+
+@pytest.mark.parametrize("N", [5, 13, 37])
+def test_output_set(N):
+    """Only the outputs of the output set are checked, so reduced and pruned
+    networks pass, while the pruned network does not sort all outputs."""
+    network = build_network(N, "oddeven")
+    OddEven().prune(network, {N - 1})
+    assert verify(network).passed()
+    network.output_set = set(range(N))
+    assert not verify(network).passed()
+
+
+def test_processes():
+    network = build_network(64, "bitonic")
+    remove_cs(network, 3)
+    serial = verify(network)
+    parallel = verify(network, processes=2)
+    assert not serial.passed()
+    assert (parallel.num_vectors, parallel.num_failures) == (
+        serial.num_vectors,
+        serial.num_failures,
+    )
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+from pathlib import Path
+
+import pytest
+import regex
+
+from scripts.vhdl import VHDLEntity, parseVHDLEntity, parseVHDLTemplate
+
+
+def regex_parse_entity(path=Path()):
+    """Regular expression based parser replaced by the tokenizer, kept as
+    reference. Only handles lower case keywords and "end entity <name>;"."""
+    content = ""
+    # Read vhdl file and remove comments.
+    with open(str(path), "r") as fd:
+        for line in fd:
+            content += line.split("--")[0]
+    # Find entity name.
+    name = regex.findall(r"entity\s*(\w+)\s*is", content, regex.S | regex.M)
+    if name:
+        name = name[0]
+    else:
+        # Attempt to find entity name placeholder.
+        name = regex.findall(r"entity\s*(\{.*?\})\s*is", content, regex.S | regex.M)
+        if not name:
+            return None
+        else:
+            name = name[0]
+    # Using entity name, find entity definition.
+    entity_def = regex.findall(
+        r"entity\s*{0}\sis.*end\sentity\s{0};".format(name), content, regex.S | regex.M
+    )
+    if entity_def:
+        entity_def = entity_def[0]
+        ports = dict()
+        generics = dict()
+
+        # Attempt to find generic clause.
+        generic_clause = regex.findall(
+            r"generic\s*\((.*)\);\s*port", entity_def, regex.M | regex.S
+        )
+        if generic_clause:
+            # Extract generics.
+            generic_matcher = regex.compile(r"\s*?(\w+)\s*?:\s*(\w*)")
+            for pair in regex.findall(generic_matcher, generic_clause[0]):
+                generics[pair[0]] = pair[1]
+
+        # Attempt to find port clause
+        port_clause = regex.findall(r"port\s\((.*)\);", entity_def, regex.M | regex.S)
+
+        # Extract port definitions.
+        if port_clause:
+            port_matcher = regex.compile(r"\s*?(\w+)\s*?:\s*(\w*?\s+\w+[^;\n]*)")
+            for pair in regex.findall(port_matcher, port_clause[0]):
+                ports[pair[0]] = pair[1]
+        else:
+            return None
+        return VHDLEntity(name, ports, generics)
+    return None
+
+
+def normalized(entity):
+    """Name, ports and generics of entity with runs of whitespace collapsed.
+    The regular expressions kept trailing whitespace and line breaks of
+    declarations."""
+    if entity is None:
+        return None
+    ports = {k: " ".join(v.split()) for k, v in entity.ports.items()}
+    return entity.name, ports, entity.generics
+
+
+HEADER = """library ieee;
+use ieee.std_logic_1164.all;
+
+"""
+
+COMMENTS = """-- entity Commented is
+entity Sorter is -- entity Other is
+  -- generic (X : integer);
+  generic (
+    W  : integer := 8;  -- Width of keys.
+    SW : integer := 1   -- port (A : in bit);
+  );
+  port (
+    CLK : in std_logic;  -- Clock; rising edge.
+    -- RST : in std_logic;
+    DATA_I : in std_logic_vector(W-1 downto 0); --(
+    DATA_O : out std_logic_vector(W-1 downto 0) -- );
+  );
+end entity Sorter;
+-- end entity Sorter;
+"""
+
+MULTILINE = """entity Shift_Register
+is
+  generic
+  (
+    W :
+      integer := 8;
+    DEPTH : natural
+      := 4
+  );
+  port (
+    CLK_I : in
+      std_logic;
+    D_I : in std_logic_vector(
+      W-1 downto 0);
+    Q_O : out   std_logic_vector(W-1
+      downto 0)
+  );
+end entity Shift_Register;
+
+architecture behavioral of Shift_Register is
+  signal entity_is : std_logic;
+begin
+end architecture behavioral;
+"""
+
+# MULTILINE with each declaration on a single line, as required by the
+# regular expressions.
+SINGLE_LINE = """entity Shift_Register is
+  generic (
+    W : integer := 8;
+    DEPTH : natural := 4
+  );
+  port (
+    CLK_I : in std_logic;
+    D_I : in std_logic_vector( W-1 downto 0);
+    Q_O : out   std_logic_vector(W-1 downto 0)
+  );
+end entity Shift_Register;
+"""
+
+LOWER = """entity MixedCase is
+  generic (
+    W : integer := 8
+  );
+  port (
+    Clk : in std_logic;
+    Q_O : out std_logic_vector(W-1 downto 0)
+  );
+end entity MixedCase;
+"""
+
+UPPER = """ENTITY MixedCase IS
+  GENERIC (
+    W : integer := 8
+  );
+  PORT (
+    Clk : in std_logic;
+    Q_O : out std_logic_vector(W-1 downto 0)
+  );
+END ENTITY MixedCase;
+"""
+
+TEMPLATE = """entity {top_name} is
+  generic (
+    W : integer := {W}
+  );
+  port (
+    CLK : in std_logic;
+    {ports}
+    DATA_O : out std_logic_vector(W-1 downto 0)
+  );
+end entity {top_name};
+"""
+
+
+def write(tmp_path, text: str, name: str = "entity.vhd") -> Path:
+    path = tmp_path / name
+    path.write_text(HEADER + text)
+    return path
+
+
+@pytest.mark.parametrize(
+    "text", [COMMENTS, SINGLE_LINE, LOWER, TEMPLATE], ids=lambda t: t.split()[1]
+)
+def test_matches_regex_parser(tmp_path, text):
+    path = write(tmp_path, text)
+    reference = regex_parse_entity(path)
+    assert reference is not None
+    assert normalized(parseVHDLEntity(path)) == normalized(reference)
+
+
+def test_comments(tmp_path):
+    entity = parseVHDLEntity(write(tmp_path, COMMENTS))
+    assert entity.name == "Sorter"
+    assert entity.generics == {"W": "integer", "SW": "integer"}
+    assert list(entity.ports) == ["CLK", "DATA_I", "DATA_O"]
+
+
+def test_multiline(tmp_path):
+    entity = parseVHDLEntity(write(tmp_path, MULTILINE))
+    reference = regex_parse_entity(write(tmp_path, SINGLE_LINE, "single.vhd"))
+    assert normalized(entity) == normalized(reference)
+    assert entity.generics == {"W": "integer", "DEPTH": "natural"}
+    assert entity.ports == {
+        "CLK_I": "in std_logic",
+        "D_I": "in std_logic_vector( W-1 downto 0)",
+        "Q_O": "out   std_logic_vector(W-1 downto 0)",
+    }
+
+
+@pytest.mark.parametrize(
+    "replacements",
+    [
+        {},
+        {"ENTITY": "Entity", "IS": "Is", "END": "End"},
+        {"GENERIC": "Generic", "PORT": "Port"},
+    ],
+)
+def test_uppercase(tmp_path, replacements):
+    text = UPPER
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    reference = regex_parse_entity(write(tmp_path, LOWER, "lower.vhd"))
+    assert normalized(parseVHDLEntity(write(tmp_path, text))) == normalized(
+        reference
+    )
+
+
+@pytest.mark.parametrize(
+    "end", ["end;", "end MixedCase;", "end entity;", "end entity MixedCase;"]
+)
+def test_end_entity(tmp_path, end):
+    text = LOWER.replace("end entity MixedCase;", end)
+    reference = regex_parse_entity(write(tmp_path, LOWER, "lower.vhd"))
+    entity = parseVHDLEntity(write(tmp_path, text + "architecture a of x is\n"))
+    assert normalized(entity) == normalized(reference)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "package P is\nend package P;\n",
+        "entity Unterminated is\n  port (\n    A : in std_logic\n",
+        "entity NoPorts is\nend entity NoPorts;\n",
+    ],
+)
+def test_invalid(tmp_path, text):
+    assert parseVHDLEntity(write(tmp_path, text)) is None
+
+
+@pytest.mark.parametrize(
+    "path",
+    sorted(Path("src").glob("./**/*.vhd")) + sorted(Path("templates").glob("*.vhd")),
+    ids=str,
+)
+def test_sources(path):
+    reference = regex_parse_entity(path)
+    entity = parseVHDLEntity(path)
+    if reference is None:
+        # Only declarations the regular expressions could not handle.
+        assert entity is not None
+    else:
+        assert normalized(entity) == normalized(reference)
+
+
+def test_template(tmp_path):
+    template = parseVHDLTemplate(write(tmp_path, TEMPLATE))
+    assert template.name == "{top_name}"
+    assert template.tokens == {
+        "top_name": "{top_name}",
+        "W": "{W}",
+        "ports": "{ports}",
+    }
+    assert list(template.ports) == ["CLK", "DATA_O"]